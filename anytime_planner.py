@@ -0,0 +1,326 @@
+import heapq
+import numpy as np
+from timeit import default_timer as timer
+from errors import NoValidPathError, PlanningTimeoutError
+from pathfinding import neighbour_offsets, path_from_indices
+
+INFINITY = float("inf")
+
+class AnytimePlanner:
+    """A planner that answers within a time budget, returning a quickly found route first and improving it towards the shortest one for as long as the budget allows
+
+    The planner implements Anytime D* (AD*). Like D* Lite it searches backwards from the goal, so the distance of every expanded node to the goal survives while the rover moves, and only the nodes affected by cells that change are re-expanded. Nodes are searched in order of their distance to the goal plus `inflation` times an admissible estimate of their distance from the rover, which finds a route at most `inflation` times as long as the shortest with few expansions. Once a route is found the inflation is lowered by `inflation_step` and the same search carries on, only re-expanding the nodes whose distances the smaller inflation can improve, until it reaches 1 and the route is the shortest. Whenever the grid changes the inflation goes back to `initial_inflation`, so that the repair is quick, and is lowered again from there.
+
+    Each call stops as soon as its time budget runs out. If a route has been found by then it is returned, even when the search is part way through improving or repairing it; otherwise PlanningTimeoutError is raised, and the next call carries on from where this one stopped. Calls therefore never run past their budget by more than a few expansions.
+
+    Attributes
+    ----------
+    grid : Grid or ChunkedGrid
+        the grid on which paths are planned. The search starts again whenever a ChunkedGrid's window changes size
+    goal : GridNode
+        the node every path leads to
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    initial_inflation : float
+        the factor the estimate is multiplied by when a search starts or the grid changes
+    inflation_step : float
+        the amount by which the inflation is lowered each time a route is found
+    inflation : float
+        the factor the estimate is currently multiplied by
+    bound : float
+        the most times longer than the shortest route the last route returned can be. 1 means it is a shortest route, and infinity that the route was read off a search the budget cut short
+    time_budget : float
+        the number of milliseconds each call may spend, or None to always find the shortest route
+    expansions : int
+        the number of nodes expanded over the lifetime of the planner
+    peak_open_set : int
+        the largest number of nodes the open set has held over the lifetime of the planner
+
+    Methods
+    -------
+    quickest_path(start_node, verbose=False, time_budget=None)
+        Finds the best path from a node to the goal that the time budget allows
+    """
+
+    def __init__(self, grid, goal, include_diagonals=True, initial_inflation=3.0, inflation_step=0.5, time_budget=None, clock=timer):
+        """Initializes a new AnytimePlanner instance.
+
+        Parameters
+        ----------
+        grid : Grid or ChunkedGrid
+            the grid on which paths are planned
+        goal : GridNode
+            the node every path leads to
+        include_diagonals : bool
+            whether or not the rover should be able to move diagonally between nodes
+        initial_inflation : float
+            the factor the estimate is multiplied by when a search starts or the grid changes. It must be at least 1
+        inflation_step : float
+            the amount by which the inflation is lowered each time a route is found
+        time_budget : float
+            the number of milliseconds each call may spend, or None to always find the shortest route
+        clock : function
+            returns the current time in seconds, against which the time budget is measured
+        """
+        if initial_inflation < 1:
+            raise ValueError("The initial inflation must be at least 1, not {}".format(initial_inflation))
+        if inflation_step <= 0:
+            raise ValueError("The inflation step must be positive, not {}".format(inflation_step))
+        self.grid = grid
+        self.goal = goal
+        self.include_diagonals = include_diagonals
+        self.initial_inflation = float(initial_inflation)
+        self.inflation_step = float(inflation_step)
+        self.inflation = self.initial_inflation
+        self.bound = INFINITY
+        self.time_budget = time_budget
+        self.expansions = 0
+        self.peak_open_set = 0
+
+        self._clock = clock
+        self._offsets = neighbour_offsets(include_diagonals)
+        # The goal and grid size the current search belongs to, so that it is only continued while neither changes
+        self._query = None
+        # The route found by the last search to finish since the start or the grid last changed
+        self._route = None
+
+    def _heuristic(self, index):
+        """An admissible and consistent estimate of the distance between the start and a node, in steps"""
+        row, column = divmod(index, self.grid.width)
+        if self.include_diagonals:
+            # Diagonal moves cost the same as straight ones, so the Chebyshev distance is exact on an empty grid
+            return max(abs(self._start_row - row), abs(self._start_column - column))
+        return abs(self._start_row - row) + abs(self._start_column - column)
+
+    def _neighbours(self, index):
+        """Lists the flat indices of the nodes adjacent to a node"""
+        width = self.grid.width
+        row, column = divmod(index, width)
+        return [(row + row_offset) * width + column + column_offset for row_offset, column_offset in self._offsets
+                if 0 <= row + row_offset < self.grid.height and 0 <= column + column_offset < width]
+
+    def _restart(self, goal, blocked):
+        """Discards the current search and begins a new one from `goal` at the initial inflation"""
+        self._query = (goal, self.grid.width, self.grid.height)
+        self._goal_index = goal
+        self._blocked = blocked
+        self._blocked_bytes = blocked.tobytes()
+        self.inflation = self.initial_inflation
+        self.bound = INFINITY
+        self._route = None
+
+        # Distances are counted in steps rather than meters, so that they are exact and keys that should tie always do
+        self._g = {}
+        self._rhs = { goal: 0 }
+        self._open = {}
+        self._heap = []
+        # Nodes expanded since the inflation last changed, and nodes left inconsistent after their expansion, which wait for the next inflation
+        self._closed = set()
+        self._inconsistent = set()
+
+    def _key(self, index):
+        g_value = self._g.get(index, INFINITY)
+        rhs = self._rhs.get(index, INFINITY)
+        # Overconsistent nodes are ordered with the inflated estimate, which is what makes the search quick. Underconsistent ones are not, so that the nodes depending on them are corrected first
+        if g_value > rhs:
+            return (rhs + self.inflation * self._heuristic(index), rhs)
+        return (g_value + self._heuristic(index), g_value)
+
+    def _push(self, index):
+        key = self._key(index)
+        self._open[index] = key
+        heapq.heappush(self._heap, (key, index))
+
+    def _top(self):
+        """Discards stale heap entries and returns the smallest live one, if there is one"""
+        while self._heap:
+            key, index = self._heap[0]
+            if self._open.get(index) == key:
+                return key, index
+            heapq.heappop(self._heap)
+        return (INFINITY, INFINITY), None
+
+    def _update_state(self, index):
+        g = self._g
+        if index != self._goal_index:
+            # Every step costs the same, so the best successor is simply the free neighbour closest to the goal
+            blocked = self._blocked_bytes
+            width = self.grid.width
+            height = self.grid.height
+            row, column = divmod(index, width)
+            best = INFINITY
+            for row_offset, column_offset in self._offsets:
+                neighbour_row = row + row_offset
+                neighbour_column = column + column_offset
+                if 0 <= neighbour_row < height and 0 <= neighbour_column < width:
+                    neighbour = neighbour_row * width + neighbour_column
+                    if not blocked[neighbour]:
+                        distance = g.get(neighbour, INFINITY)
+                        if distance < best:
+                            best = distance
+            rhs = best + 1
+            self._rhs[index] = rhs
+        else:
+            rhs = 0
+        self._open.pop(index, None)
+        if g.get(index, INFINITY) != rhs:
+            # A node already expanded at this inflation is not reopened until the next one, which is what keeps each search from repeating the last
+            if index in self._closed:
+                self._inconsistent.add(index)
+            else:
+                self._push(index)
+        else:
+            self._inconsistent.discard(index)
+
+    def _begin_search(self):
+        """Returns the waiting nodes to the open set and recomputes every key for the current start and inflation"""
+        for index in self._inconsistent:
+            self._open[index] = None
+        self._inconsistent = set()
+        self._closed = set()
+        for index in self._open:
+            self._open[index] = self._key(index)
+        self._heap = [(key, index) for index, key in self._open.items()]
+        heapq.heapify(self._heap)
+
+    def _improve_path(self, deadline):
+        """Expands nodes until the route from the start is at most `inflation` times as long as the shortest, or the deadline passes
+
+        Returns
+        -------
+        bool
+            whether the search finished before the deadline
+        """
+        start = self._start
+        expanded = 0
+        while True:
+            top_key, index = self._top()
+            start_g = self._g.get(start, INFINITY)
+            start_rhs = self._rhs.get(start, INFINITY)
+            if index is None or (top_key >= self._key(start) and start_rhs == start_g):
+                return True
+            # Reading the clock costs more than an expansion, so it is only read every few of them
+            if deadline is not None and expanded % 32 == 0 and self._clock() >= deadline:
+                return False
+
+            if len(self._open) > self.peak_open_set:
+                self.peak_open_set = len(self._open)
+            heapq.heappop(self._heap)
+            del self._open[index]
+            self.expansions += 1
+            expanded += 1
+
+            if self._g.get(index, INFINITY) > self._rhs[index]:
+                self._g[index] = self._rhs[index]
+                self._closed.add(index)
+                for neighbour in self._neighbours(index):
+                    self._update_state(neighbour)
+            else:
+                self._g[index] = INFINITY
+                self._update_state(index)
+                for neighbour in self._neighbours(index):
+                    self._update_state(neighbour)
+
+    def _apply_grid_changes(self, blocked):
+        """Repairs the distances that depend on cells whose state has changed since the last search, returning whether there were any"""
+        changed = np.flatnonzero(blocked != self._blocked)
+        self._blocked = blocked
+        self._blocked_bytes = blocked.tobytes()
+
+        # Only the cost of edges leading into a changed cell is affected, so only its neighbours need updating
+        for index in changed.tolist():
+            for neighbour in self._neighbours(index):
+                self._update_state(neighbour)
+        return len(changed) > 0
+
+    def _read_route(self):
+        """Follows the steepest descent of the distance to the goal from the start, returning the flat indices along it or None if it does not reach the goal"""
+        g = self._g
+        blocked = self._blocked_bytes
+        index = self._start
+        indices = [index]
+        # Distances part way through a repair can lead in circles, so a route stops counting as soon as it comes back on itself
+        visited = set(indices)
+        while index != self._goal_index:
+            next_index = None
+            best = INFINITY
+            for neighbour in self._neighbours(index):
+                if not blocked[neighbour] and g.get(neighbour, INFINITY) < best:
+                    next_index = neighbour
+                    best = g[neighbour]
+            if next_index is None or next_index in visited:
+                return None
+            indices.append(next_index)
+            visited.add(next_index)
+            index = next_index
+        return indices
+
+    def quickest_path(self, start_node, verbose=False, time_budget=None):
+        """Finds the best path from a node to the goal that the time budget allows
+
+        Parameters
+        ----------
+        start_node : GridNode
+            the node from which the rover begins
+        verbose : bool
+            whether or not to log when a path is found
+        time_budget : float
+            the number of milliseconds this call may spend, overriding the planner's `time_budget`
+
+        Returns
+        -------
+        list
+            A list of nodes that forms a path at most `bound` times as long as the shortest, excluding `start_node`
+
+        Raises
+        ------
+        NoValidPathError
+            If no viable path is found
+        PlanningTimeoutError
+            If the time budget runs out before any path is found. Calling again carries on with the same search
+        """
+        if time_budget is None:
+            time_budget = self.time_budget
+        deadline = None if time_budget is None else self._clock() + time_budget / 1000.0
+
+        start = self.grid.flat_index(*start_node.coords)
+        goal = self.grid.flat_index(*self.goal.coords)
+        blocked = self.grid.blocked_layer().ravel()
+        if self._query != (goal, self.grid.width, self.grid.height):
+            self._restart(goal, blocked.copy())
+            self._start = start
+            self._start_row, self._start_column = divmod(start, self.grid.width)
+            self._push(goal)
+        else:
+            if start != self._start:
+                self._start = start
+                self._start_row, self._start_column = divmod(start, self.grid.width)
+                self._route = None
+            if self._apply_grid_changes(blocked.copy()):
+                # A quick repair at the initial inflation gets the rover a route sooner than a careful one
+                self.inflation = self.initial_inflation
+                self._route = None
+        self._begin_search()
+
+        while True:
+            if not self._improve_path(deadline):
+                if self._route is None:
+                    self._route = self._read_route()
+                    self.bound = INFINITY
+                if self._route is None:
+                    raise PlanningTimeoutError
+                break
+            if self._rhs.get(start, INFINITY) == INFINITY:
+                print("Viable path was not found\n" + repr(self.grid))
+                raise NoValidPathError
+            self._route = self._read_route()
+            self.bound = self.inflation
+            if self.inflation == 1:
+                break
+            self.inflation = max(1.0, self.inflation - self.inflation_step)
+            self._begin_search()
+
+        if verbose:
+            print("Found a valid path at most {} times as long as the shortest".format(self.bound))
+
+        return path_from_indices(self.grid, self._route)
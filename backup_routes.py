@@ -0,0 +1,205 @@
+import threading
+import numpy as np
+from pathfinding import quickest_indices, line_of_sight
+
+class _Snapshot:
+    """The dimensions of a grid's pathfinding window at the moment its blocked layer was copied, which is all `quickest_indices` needs besides the layer"""
+
+    def __init__(self, grid):
+        self.width = grid.width
+        self.height = grid.height
+        self.node_spacing = grid.node_spacing
+
+class BackupRoutes:
+    """Keeps a few alternative routes to the destination, planned in a background thread while the rover drives, to fall back on when new obstacles block the main route
+
+    Each time a main route is given, a snapshot of the grid is taken and the alternatives are planned on it one after another, with every node of the main route and of the alternatives found so far blocked off. Each alternative therefore takes a genuinely different way to the destination. Routes are stored as rows and columns rather than nodes, so they stay valid on a ChunkedGrid whose pathfinding window moves.
+
+    Attributes
+    ----------
+    grid : Grid or ChunkedGrid
+        the grid on which the rover navigates
+    end_node : GridNode
+        the node every route leads to
+    count : int
+        the number of alternative routes to keep
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+
+    Methods
+    -------
+    plan(start_node, path)
+        Starts planning alternatives to a new main route in the background, discarding the previous ones
+    routes()
+        Lists the alternatives that have been planned so far
+    wait()
+        Waits until every alternative to the current main route has been planned
+    close()
+        Abandons any alternatives still being planned and waits for the background threads to finish
+    """
+
+    def __init__(self, grid, end_node, count=2, include_diagonals=True):
+        """Initializes a new BackupRoutes instance.
+
+        Parameters
+        ----------
+        grid : Grid or ChunkedGrid
+            the grid on which the rover navigates
+        end_node : GridNode
+            the node every route leads to
+        count : int
+            the number of alternative routes to keep
+        include_diagonals : bool
+            whether or not the rover should be able to move diagonally between nodes
+        """
+        self.grid = grid
+        self.end_node = end_node
+        self.count = count
+        self.include_diagonals = include_diagonals
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._routes = []
+        self._workers = []
+
+    def plan(self, start_node, path):
+        """Starts planning alternatives to a new main route in the background, discarding the previous ones
+
+        Parameters
+        ----------
+        start_node : GridNode
+            the node the main route starts from
+        path : list of GridNode
+            the main route, excluding `start_node`
+        """
+        rows, columns = route_coords(path)
+        snapshot = _Snapshot(self.grid)
+        blocked = self.grid.blocked_layer().ravel().copy()
+        # The node at the start of the window gives the offset between window indices and node coordinates
+        origin = self.grid.node_from_index(0).coords
+        start = self.grid.flat_index(*start_node.coords)
+        goal = self.grid.flat_index(*self.end_node.coords)
+
+        with self._lock:
+            self._generation += 1
+            self._routes = []
+            generation = self._generation
+
+        worker = threading.Thread(target=self._plan_alternatives, args=(generation, snapshot, blocked, origin, start, goal, rows - origin[0], columns - origin[1]))
+        worker.daemon = True
+        worker.start()
+        # Threads planning for an older route stop after their current search, so only those still running are kept
+        self._workers = [thread for thread in self._workers if thread.is_alive()] + [worker]
+
+    def _plan_alternatives(self, generation, snapshot, blocked, origin, start, goal, rows, columns):
+        planned = [(rows, columns)]
+        for _ in range(self.count):
+            # The first and last couple of nodes stay open, so that the alternatives can still leave the start and reach the goal
+            in_window = (rows >= 0) & (rows < snapshot.height) & (columns >= 0) & (columns < snapshot.width)
+            in_window[:2] = False
+            in_window[-2:] = False
+            if not in_window.any():
+                # A route this short blocks nothing, so the search would only find it again
+                return
+            blocked[rows[in_window] * snapshot.width + columns[in_window]] = True
+
+            indices = quickest_indices(start, goal, blocked, snapshot, self.include_diagonals)
+            if indices is None:
+                return
+            alternative_rows, alternative_columns = np.divmod(np.array(indices[1:], dtype=np.intp), snapshot.width)
+            if any(np.array_equal(alternative_rows, planned_rows) and np.array_equal(alternative_columns, planned_columns) for planned_rows, planned_columns in planned):
+                return
+            planned.append((alternative_rows, alternative_columns))
+
+            with self._lock:
+                if generation != self._generation:
+                    return
+                self._routes.append((alternative_rows + origin[0], alternative_columns + origin[1]))
+            rows, columns = alternative_rows, alternative_columns
+
+    def routes(self):
+        """Lists the alternatives that have been planned so far
+
+        Returns
+        -------
+        A list of (rows, columns) tuples of arrays, each giving the nodes of a route in order
+        """
+        with self._lock:
+            return list(self._routes)
+
+    def wait(self):
+        """Waits until every alternative to the current main route has been planned"""
+        for worker in self._workers:
+            worker.join()
+        self._workers = []
+
+    def close(self):
+        """Abandons any alternatives still being planned and waits for the background threads to finish. Each thread stops as soon as its current search does"""
+        with self._lock:
+            self._generation += 1
+            self._routes = []
+        self.wait()
+
+def route_coords(path):
+    """Converts a list of nodes into arrays of their rows and columns"""
+    if len(path) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    rows, columns = zip(*[node.coords for node in path])
+    return np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)
+
+def resume_route(grid, rover_node, rows, columns, candidates=8):
+    """Rejoins a previously planned route from wherever the rover is now, if the rest of the route is still clear
+
+    Parameters
+    ----------
+    grid : Grid or ChunkedGrid
+        the grid whose obstacle and padding layers the route is checked against
+    rover_node : GridNode
+        the node the rover is on
+    rows : nparray
+        the rows of the route's nodes, in order
+    columns : nparray
+        the columns of the route's nodes, in order
+    candidates : int
+        the number of the route's nodes nearest the rover that are tried as places to rejoin it
+
+    Returns
+    -------
+    A list of nodes leading from the rover to the end of the route, or None if the route cannot be rejoined in a straight line or is blocked beyond the point where it is rejoined
+    """
+    if len(rows) == 0:
+        return None
+    blocked = grid.obstacle_layer[rows, columns] | grid.padding_layer[rows, columns]
+    # Anything blocked after this point cuts the route off from the destination, whichever node it is rejoined at
+    last_blocked = np.flatnonzero(blocked)[-1] if blocked.any() else -1
+
+    row, column = rover_node.coords
+    distances = np.maximum(np.abs(rows - row), np.abs(columns - column))
+    # Prefers the nearest nodes, and among those the furthest along the route
+    order = np.lexsort((-np.arange(len(rows)), distances))
+    for i in order[:candidates]:
+        if i <= last_blocked:
+            continue
+        if distances[i] == 0 or line_of_sight(grid, rover_node.coords, (rows[i], columns[i])):
+            first = i + 1 if distances[i] == 0 else i
+            return [grid[rows[j], columns[j]] for j in range(first, len(rows))]
+    return None
+
+def route_length(start_coords, rows, columns):
+    """Measures the length of a route from a point, in units of node spacing
+
+    Parameters
+    ----------
+    start_coords : (int, int)
+        the row and column of the node the route is measured from
+    rows : nparray
+        the rows of the route's nodes, in order
+    columns : nparray
+        the columns of the route's nodes, in order
+
+    Returns
+    -------
+    The sum of the straight-line distances between consecutive nodes, starting from `start_coords`
+    """
+    rows = np.concatenate(([start_coords[0]], rows))
+    columns = np.concatenate(([start_coords[1]], columns))
+    return float(np.sum(np.hypot(np.diff(rows), np.diff(columns))))
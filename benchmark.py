@@ -0,0 +1,352 @@
+"""Benchmarks for the rover's planners
+
+Run this module directly to print the results, e.g. `python benchmark.py`
+"""
+import random
+from timeit import default_timer as timer
+import io
+import contextlib
+import tracemalloc
+from grid import Grid
+from pathfinding import quickest_path
+from incremental_planner import DStarLite
+from hierarchical_planner import HierarchicalPlanner
+from errors import NoValidPathError, SimulationTimeoutError, ReplayFinishedError
+from run_course import run_course, PLANNERS
+from simulated_rover import SimulatedRover, WORLDS
+from instrumentation import RunStats
+from sensor_log import ReplayRover, read_frames
+
+def _add_rock(grid, row, column, padding_layers, keep_clear):
+    """Marks an obstacle and its padding directly on the grid's layers, leaving the nodes in `keep_clear` free"""
+    grid.padding_layer[max(row - padding_layers, 0):row + padding_layers + 1, max(column - padding_layers, 0):column + padding_layers + 1] = True
+    grid.obstacle_layer[row, column] = True
+    for coords in keep_clear:
+        grid.obstacle_layer[coords] = False
+        grid.padding_layer[coords] = False
+
+def _summarize(latencies):
+    """Reduces a list of latencies in seconds to their mean and maximum in milliseconds"""
+    if not latencies:
+        return (0.0, 0.0)
+    return (1000 * sum(latencies) / len(latencies), 1000 * max(latencies))
+
+def benchmark_replanning(size=200, rock_density=0.02, sensing_range=15, padding_layers=1, step_length=3, max_replans=200, seed=0):
+    """Measures how long it takes to recalculate a route after new obstacles are seen, for each planner
+
+    The rover drives across a boulder field towards the far corner of a square grid. The rocks are hidden until the rover comes within sensing range of them, and the route is recalculated every time new rocks are revealed. Every planner is asked for a route on the same grid after every reveal, so they always see identical input. Besides the A* used by default and the incremental D* Lite, a D* Lite that is rebuilt before every replan is measured, which shows how much of the search the incremental planner manages to reuse.
+
+    Parameters
+    ----------
+    size : int
+        the number of nodes along each side of the grid
+    rock_density : float
+        the fraction of nodes that contain a rock
+    sensing_range : int
+        the distance, in nodes, within which rocks are revealed
+    padding_layers : int
+        the number of nodes of padding placed around each obstacle
+    step_length : int
+        the number of nodes the rover advances along its route between recalculations
+    max_replans : int
+        the maximum number of times the route is recalculated
+    seed : int
+        the seed used to place the rocks
+
+    Returns
+    -------
+    A dictionary mapping the name of each planner ("astar", "dstar_lite_scratch" and "dstar_lite") to a (mean, max) tuple of its replan latencies in milliseconds
+    """
+    generator = random.Random(seed)
+    grid = Grid((0, 0), (size, size), node_spacing=1.0)
+    end_node = grid[size - 1, size - 1]
+    rover_node = grid[0, 0]
+
+    hidden_rocks = set()
+    for _ in range(int(rock_density * size * size)):
+        hidden_rocks.add((generator.randrange(size), generator.randrange(size)))
+
+    incremental_planner = DStarLite(grid, end_node)
+    incremental_planner.quickest_path(rover_node)
+    latencies = { "astar": [], "dstar_lite_scratch": [], "dstar_lite": [] }
+
+    while rover_node != end_node and len(latencies["astar"]) < max_replans:
+        row, column = rover_node.coords
+        revealed = [(rock_row, rock_column) for rock_row, rock_column in hidden_rocks
+                    if abs(rock_row - row) <= sensing_range and abs(rock_column - column) <= sensing_range]
+        for rock_row, rock_column in revealed:
+            hidden_rocks.discard((rock_row, rock_column))
+            _add_rock(grid, rock_row, rock_column, padding_layers, [rover_node.coords, end_node.coords])
+
+        try:
+            # Silences the grid dump printed on failure
+            with contextlib.redirect_stdout(io.StringIO()):
+                start_time = timer()
+                path = quickest_path(rover_node, end_node, grid)
+                latencies["astar"].append(timer() - start_time)
+
+                start_time = timer()
+                DStarLite(grid, end_node).quickest_path(rover_node)
+                latencies["dstar_lite_scratch"].append(timer() - start_time)
+
+                start_time = timer()
+                path = incremental_planner.quickest_path(rover_node)
+                latencies["dstar_lite"].append(timer() - start_time)
+        except NoValidPathError:
+            break
+
+        rover_node = path[min(step_length, len(path)) - 1]
+
+    return dict((planner, _summarize(values)) for planner, values in latencies.items())
+
+def benchmark_expansions(size=200, rock_density=0.002, padding_layers=1, trials=10, seed=0):
+    """Compares the number of nodes A* and Jump Point Search expand on open ground with scattered rocks
+
+    Parameters
+    ----------
+    size : int
+        the number of nodes along each side of the grid
+    rock_density : float
+        the fraction of nodes that contain a rock
+    padding_layers : int
+        the number of nodes of padding placed around each obstacle
+    trials : int
+        the number of random start and end points to plan between
+    seed : int
+        the seed used to place the rocks and the start and end points
+
+    Returns
+    -------
+    A dictionary mapping "astar" and "jps" to a (mean expansions, mean latency in milliseconds, mean route length in nodes) tuple
+    """
+    generator = random.Random(seed)
+    grid = Grid((0, 0), (size, size), node_spacing=1.0)
+    for _ in range(int(rock_density * size * size)):
+        _add_rock(grid, generator.randrange(size), generator.randrange(size), padding_layers, [])
+
+    results = {}
+    for algorithm in ("astar", "jps"):
+        trial_generator = random.Random(seed)
+        expansions = []
+        latencies = []
+        route_lengths = []
+        for _ in range(trials):
+            # Picks free start and end points in opposite corners of the grid
+            while True:
+                start = grid[trial_generator.randrange(size // 4), trial_generator.randrange(size // 4)]
+                end = grid[size - 1 - trial_generator.randrange(size // 4), size - 1 - trial_generator.randrange(size // 4)]
+                if not (start.is_obstacle or start.is_padding or end.is_obstacle or end.is_padding):
+                    break
+
+            stats = {}
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start_time = timer()
+                    path = quickest_path(start, end, grid, algorithm=algorithm, stats=stats)
+                    latencies.append(timer() - start_time)
+            except NoValidPathError:
+                continue
+            expansions.append(stats["expansions"])
+            route_lengths.append(len(path))
+
+        count = max(len(expansions), 1)
+        results[algorithm] = (float(sum(expansions)) / count, _summarize(latencies)[0], float(sum(route_lengths)) / count)
+    return results
+
+def benchmark_course_length(length=400, width=60, rock_density=0.02, sensing_range=15, padding_layers=1, step_length=3, replans=30, seed=0):
+    """Measures how replan latency depends on the distance still to be driven, for A* and the hierarchical planner
+
+    The rover starts at one end of a long strip of boulder field and is driven towards the far end, recalculating its route each time rocks come within sensing range. Only the first `replans` recalculations are timed, so the goal is always roughly `length` nodes away and longer strips mean longer routes.
+
+    Parameters
+    ----------
+    length : int
+        the number of nodes between the start and the end of the strip
+    width : int
+        the number of nodes across the strip
+    rock_density : float
+        the fraction of nodes that contain a rock
+    sensing_range : int
+        the distance, in nodes, within which rocks are revealed
+    padding_layers : int
+        the number of nodes of padding placed around each obstacle
+    step_length : int
+        the number of nodes the rover advances along its route between recalculations
+    replans : int
+        the number of recalculations that are timed
+    seed : int
+        the seed used to place the rocks
+
+    Returns
+    -------
+    A dictionary mapping "astar" and "hpa" to a (mean, max) tuple of their replan latencies in milliseconds
+    """
+    generator = random.Random(seed)
+    grid = Grid((0, 0), (length, width), node_spacing=1.0)
+    end_node = grid[width // 2, length - 1]
+    rover_node = grid[width // 2, 0]
+
+    hidden_rocks = set()
+    for _ in range(int(rock_density * width * length)):
+        hidden_rocks.add((generator.randrange(width), generator.randrange(length)))
+
+    hierarchical_planner = HierarchicalPlanner(grid, end_node)
+    hierarchical_planner.quickest_path(rover_node)
+    latencies = { "astar": [], "hpa": [] }
+
+    while rover_node != end_node and len(latencies["astar"]) < replans:
+        row, column = rover_node.coords
+        revealed = [(rock_row, rock_column) for rock_row, rock_column in hidden_rocks
+                    if abs(rock_row - row) <= sensing_range and abs(rock_column - column) <= sensing_range]
+        for rock_row, rock_column in revealed:
+            hidden_rocks.discard((rock_row, rock_column))
+            _add_rock(grid, rock_row, rock_column, padding_layers, [rover_node.coords, end_node.coords])
+
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start_time = timer()
+                quickest_path(rover_node, end_node, grid)
+                latencies["astar"].append(timer() - start_time)
+
+                start_time = timer()
+                path = hierarchical_planner.quickest_path(rover_node)
+                latencies["hpa"].append(timer() - start_time)
+        except NoValidPathError:
+            break
+
+        rover_node = path[min(step_length, len(path)) - 1]
+
+    return dict((planner, _summarize(values)) for planner, values in latencies.items())
+
+def benchmark_scenarios(worlds=("rocks", "maze", "corridor"), sizes=(10, 20), planners=PLANNERS, seed=0, time_limit=2000.0):
+    """Drives a SimulatedRover through generated worlds with `run_course`, once for each planner
+
+    Every run is repeated twice on identical worlds: once to measure time, and once under tracemalloc to measure the peak memory allocated, since tracing slows everything else down.
+
+    Parameters
+    ----------
+    worlds : tuple of str
+        the kinds of world to generate, from the keys of `simulated_rover.WORLDS`
+    sizes : tuple of float
+        the sizes of the worlds, in meters
+    planners : list of str
+        the planners passed to `run_course`
+    seed : int
+        the seed used to generate the worlds
+    time_limit : float
+        the simulated time, in seconds, after which a run is abandoned
+
+    Returns
+    -------
+    A dictionary mapping each (world, size, planner) tuple to a dictionary of results: "grid_build_ms", the mean and max replan latency "replan_ms" in milliseconds, the total "expansions", the largest open set held ("peak_open_set"), "peak_memory_kb", the simulated "course_time" in seconds, the number of "replans" and "finished", which is False if the run timed out or ended away from the destination
+    """
+    results = {}
+    for world_name in worlds:
+        for size in sizes:
+            world = WORLDS[world_name](size, seed=seed)
+            for planner in planners:
+                stats = RunStats()
+                rover = SimulatedRover(world, time_limit=time_limit)
+                finished = True
+                with contextlib.redirect_stdout(io.StringIO()):
+                    try:
+                        run_course(rover, world.end, planner=planner, realtime=False, stats=stats)
+                    except SimulationTimeoutError:
+                        finished = False
+
+                    tracemalloc.start()
+                    try:
+                        run_course(SimulatedRover(world, time_limit=time_limit), world.end, planner=planner, realtime=False)
+                    except SimulationTimeoutError:
+                        pass
+                    peak_memory = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+
+                distance_to_end = ((rover.x - world.end[0]) ** 2 + (rover.y - world.end[1]) ** 2) ** 0.5
+                results[(world_name, size, planner)] = {
+                    "grid_build_ms": 1000 * stats.phase_times("build")[0],
+                    "replan_ms": _summarize(stats.phase_times("plan")),
+                    "expansions": stats.counters["expansions"],
+                    "peak_open_set": stats.counters["peak_open_set"],
+                    "peak_memory_kb": peak_memory / 1024.0,
+                    "course_time": rover.time,
+                    "replans": stats.counters["replans"],
+                    "finished": finished and distance_to_end < 1.0,
+                }
+    return results
+
+def benchmark_replay(path, end_point, planners=PLANNERS, **course_options):
+    """Replays a recorded run through `run_course` once for each planner, so that they are compared on exactly the input the rover saw
+
+    The recording sets the rover's movement, so a planner whose route differs from the one driven at the time still sees every LiDAR frame in the same place. A replay ends when `run_course` finishes or the recording runs out, whichever comes first.
+
+    Parameters
+    ----------
+    path : str
+        the location of a sensor log written by `SensorRecorder`
+    end_point : tuple
+        the destination the recorded run was driving to
+    planners : list of str
+        the planners passed to `run_course`
+    course_options
+        any further keyword arguments of `run_course`, which apply to every replay
+
+    Returns
+    -------
+    A dictionary mapping each planner to a dictionary of results: the mean and max "plan_ms" in milliseconds, the total "expansions", the number of "replans", the wall-clock "replay_ms" of the whole replay, the number of "frames" played back and "finished", which is False if the recording ran out before `run_course` returned
+    """
+    frames = read_frames(path)
+    course_options.setdefault("realtime", False)
+    results = {}
+    for planner in planners:
+        stats = RunStats()
+        rover = ReplayRover(frames)
+        finished = True
+        start_time = timer()
+        with contextlib.redirect_stdout(io.StringIO()):
+            try:
+                run_course(rover, end_point, planner=planner, stats=stats, **course_options)
+            except ReplayFinishedError:
+                stats.finish()
+                finished = False
+        results[planner] = {
+            "plan_ms": _summarize(stats.phase_times("plan")),
+            "expansions": stats.counters["expansions"],
+            "replans": stats.counters["replans"],
+            "replay_ms": 1000 * (timer() - start_time),
+            "frames": rover.commands,
+            "finished": finished,
+        }
+    return results
+
+if __name__ == "__main__":
+    print("Replan latency in a boulder field, mean / max (ms)")
+    print("{:>6} {:>16} {:>22} {:>22}".format("size", "A*", "D* Lite from scratch", "D* Lite incremental"))
+    for size in (100, 200, 400):
+        results = benchmark_replanning(size=size)
+        print("{:>6} {:>16} {:>22} {:>22}".format(size, *["{:.2f} / {:.2f}".format(*results[planner]) for planner in ("astar", "dstar_lite_scratch", "dstar_lite")]))
+
+    print("")
+    print("Node expansions on open ground with scattered rocks, mean")
+    print("{:>6} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10} {:>10}".format("size", "A*", "JPS", "reduction", "A* ms", "JPS ms", "A* route", "JPS route"))
+    for size in (100, 200, 400):
+        results = benchmark_expansions(size=size)
+        astar_expansions, astar_latency, astar_length = results["astar"]
+        jps_expansions, jps_latency, jps_length = results["jps"]
+        print("{:>6} {:>10.0f} {:>10.0f} {:>9.1f}x {:>10.2f} {:>10.2f} {:>10.0f} {:>10.0f}".format(size, astar_expansions, jps_expansions, astar_expansions / max(jps_expansions, 1), astar_latency, jps_latency, astar_length, jps_length))
+
+    print("")
+    print("Replan latency against course length, mean / max (ms)")
+    print("{:>6} {:>16} {:>16}".format("length", "A*", "HPA*"))
+    for length in (200, 400, 800, 1600):
+        results = benchmark_course_length(length=length)
+        print("{:>6} {:>16} {:>16}".format(length, *["{:.2f} / {:.2f}".format(*results[planner]) for planner in ("astar", "hpa")]))
+
+    print("")
+    print("Simulated courses with run_course")
+    print("{:>8} {:>5} {:>10} {:>9} {:>16} {:>8} {:>11} {:>9} {:>8} {:>8}".format("world", "size", "planner", "build ms", "replan ms", "replans", "expansions", "peak KB", "course s", "finished"))
+    results = benchmark_scenarios()
+    for (world_name, size, planner), result in sorted(results.items()):
+        print("{:>8} {:>5} {:>10} {:>9.2f} {:>16} {:>8} {:>11} {:>9.0f} {:>8.1f} {:>8}".format(
+            world_name, size, planner, result["grid_build_ms"], "{:.2f} / {:.2f}".format(*result["replan_ms"]), result["replans"],
+            result["expansions"], result["peak_memory_kb"], result["course_time"], str(result["finished"])))
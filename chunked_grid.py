@@ -0,0 +1,423 @@
+from grid_node import GridNode
+from pathfinding import neighbour_offsets
+import numpy as np
+
+# Parents are stored per node as 1 + the index of the step leading from the node to its parent, with 0 meaning no parent
+_PARENT_STEPS = neighbour_offsets(include_diagonals=True)
+
+class ChunkedGrid:
+    """
+    A grid with no fixed bounds, which stores its contents in square tiles that are only allocated once something is recorded in them.
+
+    Nodes are addressed by a row and column relative to `origin`, and either may be negative. Memory grows with the area the rover has actually seen rather than with the area between it and its destination. For pathfinding the grid exposes a window: the bounding box of every allocated tile, extended by `search_margin` tiles in each direction. Within that window `width`, `height`, `flat_index` and `blocked_layer` behave as they do on a `Grid`, so `quickest_path` can search it unchanged. Anything outside the window is treated as open ground, and the window grows as more tiles are allocated. Since no tile in the margin is allocated, the window is always ringed by at least a tile of open ground, so a route that leaves the seen area to go around something is never cut off by the edge of the window, however long the detour.
+
+    Attributes
+    ----------
+    origin : (float, float)
+        the physical location of the node at row 0 and column 0
+    node_spacing : float
+        the length of each grid square in meters
+    tile_size : int
+        the number of nodes along each side of a tile
+    search_margin : int
+        the number of tiles by which the pathfinding window extends beyond the allocated tiles, at least 1
+    obstacle_layer : _ChunkedLayer
+        marks the nodes that contain an obstacle; it can be indexed with rows and columns like a numpy array
+    padding_layer : _ChunkedLayer
+        marks the nodes that are padding around an obstacle
+    path_layer : _ChunkedLayer
+        marks the nodes on the rover's path
+    rover_coords : (int, int)
+        the row and column of the node on which the rover is located, or None if it has not been set
+    width : int
+        the number of columns in the pathfinding window
+    height : int
+        the number of rows in the pathfinding window
+
+    Methods
+    -------
+    nearest_node(self, point)
+        Finds the node whose physical location is closest to the specified point, allocating its tile
+    location(self, row, column)
+        Finds the physical position of a node at the specified indices
+    nearest_indices(self, points)
+        Finds the row and column of the nearest node to each of an array of points
+    locations(self, rows, columns)
+        Finds the physical positions of the nodes at arrays of indices
+    flat_index(self, row, column)
+        Finds the index of a node within the pathfinding window
+    node_from_index(self, index)
+        Returns the node located at the specified index of the pathfinding window
+    blocked_layer(self)
+        Returns a boolean array covering the pathfinding window that marks every node the rover may not pass through
+    contains(self, rows, columns)
+        Determines which of the specified indices lie on the grid, which is all of them
+    parent_of(self, row, column)
+        Returns the parent recorded for a node during pathfinding
+    set_parents(self, children, parents)
+        Records the parents of a batch of nodes, given as flat indices of the pathfinding window
+    clear_obstacles(self)
+        Forgets every obstacle and all padding recorded on the grid
+    tile_count(self)
+        Returns the number of tiles that have been allocated
+    __getitem__(indices)
+        Returns a view of the node located at the specified indices
+    __repr__()
+        Returns a representation of the allocated part of the grid as a string
+    """
+
+    def __init__(self, origin, node_spacing=1.0, tile_size=32, search_margin=2):
+        """Initializes a new ChunkedGrid instance.
+
+        Parameters
+        ----------
+        origin : (float, float)
+            the physical location of the node at row 0 and column 0, usually the rover's starting point
+        node_spacing : float
+            the length of each grid square in meters
+        tile_size : int
+            the number of nodes along each side of a tile
+        search_margin : int
+            the number of tiles by which the pathfinding window extends beyond the allocated tiles. It must be at least 1, or a route around obstacles on the edge of the allocated tiles could be cut off
+
+        Raises
+        ------
+        ValueError
+            If `search_margin` is less than 1
+        """
+        if search_margin < 1:
+            raise ValueError("The search margin must be at least 1 tile, not {}".format(search_margin))
+        self.origin = origin
+        self.node_spacing = node_spacing
+        self.tile_size = tile_size
+        self.search_margin = search_margin
+        self.rover_coords = None
+
+        self._tiles = {}
+        self._window = None
+
+        self.obstacle_layer = _ChunkedLayer(self, "obstacle")
+        self.padding_layer = _ChunkedLayer(self, "padding")
+        self.path_layer = _ChunkedLayer(self, "path")
+
+    def _tile(self, tile_row, tile_column):
+        """Returns the tile at the specified tile indices, allocating it if necessary"""
+        tile = self._tiles.get((tile_row, tile_column))
+        if tile is None:
+            shape = (self.tile_size, self.tile_size)
+            tile = {
+                "obstacle": np.zeros(shape, dtype=bool),
+                "padding": np.zeros(shape, dtype=bool),
+                "path": np.zeros(shape, dtype=bool),
+                "parent": np.zeros(shape, dtype=np.uint8),
+            }
+            self._tiles[(tile_row, tile_column)] = tile
+            self._window = None
+        return tile
+
+    def _touch(self, row, column):
+        """Allocates the tile containing a node, so that the pathfinding window covers it"""
+        self._tile(row // self.tile_size, column // self.tile_size)
+
+    def _bounds(self, margin):
+        """Returns (first row, first column, height, width) of the box around the allocated tiles, extended by `margin` tiles"""
+        if not self._tiles:
+            self._touch(0, 0)
+        tile_rows = [tile_row for tile_row, _ in self._tiles]
+        tile_columns = [tile_column for _, tile_column in self._tiles]
+        first_row = (min(tile_rows) - margin) * self.tile_size
+        first_column = (min(tile_columns) - margin) * self.tile_size
+        height = (max(tile_rows) - min(tile_rows) + 1 + 2 * margin) * self.tile_size
+        width = (max(tile_columns) - min(tile_columns) + 1 + 2 * margin) * self.tile_size
+        return first_row, first_column, height, width
+
+    def _current_window(self):
+        if self._window is None:
+            self._window = self._bounds(self.search_margin)
+        return self._window
+
+    @property
+    def height(self):
+        return self._current_window()[2]
+
+    @property
+    def width(self):
+        return self._current_window()[3]
+
+    def _dense(self, name, bounds):
+        """Copies a layer into a dense array covering the specified (first row, first column, height, width) box"""
+        first_row, first_column, height, width = bounds
+        array = np.zeros((height, width), dtype=bool)
+        for (tile_row, tile_column), tile in self._tiles.items():
+            row = tile_row * self.tile_size - first_row
+            column = tile_column * self.tile_size - first_column
+            array[row:row + self.tile_size, column:column + self.tile_size] = tile[name]
+        return array
+
+    def __getitem__(self, indices):
+        """Allows a node to be read from a grid through subscripts"""
+        row, column = indices
+        return GridNode(self, int(row), int(column))
+
+    def __repr__(self):
+        """Provides a string representation of the allocated part of the grid"""
+        bounds = self._bounds(0)
+        characters = np.full(bounds[2:], " ", dtype="<U1")
+        characters[self._dense("path", bounds)] = "p"
+        characters[self._dense("padding", bounds)] = "-"
+        characters[self._dense("obstacle", bounds)] = "x"
+        if self.rover_coords is not None:
+            row = self.rover_coords[0] - bounds[0]
+            column = self.rover_coords[1] - bounds[1]
+            if 0 <= row < bounds[2] and 0 <= column < bounds[3]:
+                characters[row, column] = "r"
+
+        return "\n".join("[" + " ".join(row) + "]" for row in characters)
+
+    def flat_index(self, row, column):
+        """Finds the index of a node within the pathfinding window
+
+        Parameters
+        ----------
+        row : int
+            the row of the node
+        column : int
+            the column of the node
+
+        Returns
+        -------
+        An int that identifies the node until another tile is allocated
+
+        """
+        first_row, first_column, _, width = self._current_window()
+        return (row - first_row) * width + (column - first_column)
+
+    def node_from_index(self, index):
+        """Returns the node located at the specified index of the pathfinding window
+
+        Parameters
+        ----------
+        index : int
+            an index produced by `flat_index`
+
+        Returns
+        -------
+        The node at that index
+
+        """
+        first_row, first_column, _, width = self._current_window()
+        row, column = divmod(int(index), width)
+        return GridNode(self, first_row + row, first_column + column)
+
+    def blocked_layer(self):
+        """Returns a boolean array covering the pathfinding window that marks every node the rover may not pass through
+
+        Returns
+        -------
+        A (height, width) boolean array that is true wherever a node is an obstacle or padding
+
+        """
+        window = self._current_window()
+        return self._dense("obstacle", window) | self._dense("padding", window)
+
+    def contains(self, rows, columns):
+        """Determines which of the specified indices lie on the grid, which is all of them
+
+        Returns
+        -------
+        A boolean array of true values with the shape of `rows`
+
+        """
+        return np.ones(np.shape(rows), dtype=bool)
+
+    def parent_of(self, row, column):
+        """Returns the parent recorded for a node during pathfinding
+
+        Parameters
+        ----------
+        row : int
+            the row of the node
+        column : int
+            the column of the node
+
+        Returns
+        -------
+        The parent node, or None if the node has no parent
+
+        """
+        tile = self._tiles.get((row // self.tile_size, column // self.tile_size))
+        step = 0 if tile is None else tile["parent"][row % self.tile_size, column % self.tile_size]
+        if step == 0:
+            return None
+        row_offset, column_offset = _PARENT_STEPS[step - 1]
+        return GridNode(self, row + row_offset, column + column_offset)
+
+    def set_parents(self, children, parents):
+        """Records the parents of a batch of nodes, given as flat indices of the pathfinding window
+
+        Parameters
+        ----------
+        children : array_like
+            the flat indices of the nodes whose parents are set
+        parents : array_like
+            the flat indices of their parents, or -1 to remove a node's parent. A parent must be adjacent to its child
+
+        Raises
+        ------
+        ValueError
+            If a parent is not adjacent to its child
+        """
+        # Every index is converted before any tile is allocated, as allocation moves the window
+        child_nodes = [self.node_from_index(child) for child in children]
+        parent_nodes = [None if parent < 0 else self.node_from_index(parent) for parent in parents]
+
+        for child, parent in zip(child_nodes, parent_nodes):
+            row, column = child.coords
+            if parent is None:
+                step = 0
+            else:
+                offset = (parent.coords[0] - row, parent.coords[1] - column)
+                if offset not in _PARENT_STEPS:
+                    raise ValueError("The parent of node {} must be adjacent to it".format(child.coords))
+                step = _PARENT_STEPS.index(offset) + 1
+            tile = self._tile(row // self.tile_size, column // self.tile_size)
+            tile["parent"][row % self.tile_size, column % self.tile_size] = step
+
+    def clear_obstacles(self):
+        """Forgets every obstacle and all padding recorded on the grid"""
+        self.obstacle_layer[:] = False
+        self.padding_layer[:] = False
+
+    def tile_count(self):
+        """Returns the number of tiles that have been allocated"""
+        return len(self._tiles)
+
+    def nearest_node(self, point):
+        """Finds the node whose physical location is closest to the specified point, allocating its tile
+
+        Parameters
+        ----------
+        point : (float, float)
+            a point to be approximated by the location of a node
+
+        Returns
+        -------
+        The node on the grid nearest to the point
+
+        """
+        row = int(round((point[1] - self.origin[1]) / float(self.node_spacing)))
+        column = int(round((point[0] - self.origin[0]) / float(self.node_spacing)))
+        self._touch(row, column)
+        return GridNode(self, row, column)
+
+    def location(self, row, column):
+        """Finds the physical position of a node at the specified indices
+
+        Parameters
+        ----------
+        row : int
+            the row of the node whose physical location is sought
+        column : int
+            the column of the node whose physical location is sought
+
+        Returns
+        -------
+        A tuple containing the physical location of the node
+
+        """
+        return (self.origin[0] + column * self.node_spacing, self.origin[1] + row * self.node_spacing)
+
+    def nearest_indices(self, points):
+        """Finds the row and column of the nearest node to each of an array of points
+
+        Parameters
+        ----------
+        points : array_like
+            an (M, 2) array of (x, y) points
+
+        Returns
+        -------
+        A tuple of two integer arrays of length M, holding the rows and columns of the nodes nearest to each point
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        rows = np.rint((points[:, 1] - self.origin[1]) / self.node_spacing).astype(np.intp)
+        columns = np.rint((points[:, 0] - self.origin[0]) / self.node_spacing).astype(np.intp)
+        return rows, columns
+
+    def locations(self, rows, columns):
+        """Finds the physical positions of the nodes at arrays of indices
+
+        Parameters
+        ----------
+        rows : array_like
+            the rows of the nodes whose physical locations are sought
+        columns : array_like
+            the columns of the nodes whose physical locations are sought
+
+        Returns
+        -------
+        An (M, 2) array whose rows are the (x, y) locations of the nodes
+
+        """
+        points = np.empty((np.size(rows), 2))
+        points[:, 0] = self.origin[0] + np.ravel(columns) * self.node_spacing
+        points[:, 1] = self.origin[1] + np.ravel(rows) * self.node_spacing
+        return points
+
+
+class _ChunkedLayer:
+    """A boolean layer of a ChunkedGrid that can be indexed with (row, column) pairs of ints or arrays, like a numpy array"""
+
+    def __init__(self, grid, name):
+        self._grid = grid
+        self._name = name
+
+    def _split(self, indices):
+        """Groups arrays of indices by the tile containing them, yielding (tile key, mask, local rows, local columns)"""
+        rows, columns = np.broadcast_arrays(np.asarray(indices[0], dtype=np.intp), np.asarray(indices[1], dtype=np.intp))
+        size = self._grid.tile_size
+        tile_rows = rows // size
+        tile_columns = columns // size
+        keys = set(zip(tile_rows.ravel().tolist(), tile_columns.ravel().tolist()))
+        for key in keys:
+            mask = (tile_rows == key[0]) & (tile_columns == key[1])
+            yield key, mask, rows[mask] % size, columns[mask] % size
+
+    def __getitem__(self, indices):
+        size = self._grid.tile_size
+        row, column = indices
+        if np.isscalar(row) and np.isscalar(column):
+            tile = self._grid._tiles.get((row // size, column // size))
+            return False if tile is None else tile[self._name][row % size, column % size]
+
+        result = np.zeros(np.broadcast(np.asarray(row), np.asarray(column)).shape, dtype=bool)
+        for key, mask, local_rows, local_columns in self._split(indices):
+            tile = self._grid._tiles.get(key)
+            if tile is not None:
+                result[mask] = tile[self._name][local_rows, local_columns]
+        return result
+
+    def __setitem__(self, indices, value):
+        if isinstance(indices, slice):
+            # Only a full slice is supported, which sets the layer on every allocated tile
+            for tile in self._grid._tiles.values():
+                tile[self._name][indices] = value
+            return
+
+        size = self._grid.tile_size
+        row, column = indices
+        if np.isscalar(row) and np.isscalar(column):
+            tile = self._grid._tiles.get((row // size, column // size))
+            # Unallocated tiles are already false, so clearing a node never allocates one
+            if tile is None and not value:
+                return
+            self._grid._tile(row // size, column // size)[self._name][row % size, column % size] = value
+            return
+
+        values = np.broadcast_to(np.asarray(value, dtype=bool), np.broadcast(np.asarray(row), np.asarray(column)).shape)
+        for key, mask, local_rows, local_columns in self._split(indices):
+            tile_values = values[mask]
+            if key not in self._grid._tiles and not tile_values.any():
+                continue
+            self._grid._tile(*key)[self._name][local_rows, local_columns] = tile_values
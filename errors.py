@@ -8,3 +8,17 @@ class ObseleteGridError(Exception):
     """
     pass
 
+class SimulationTimeoutError(Exception):
+    """Called when a simulated rover is sent a command after its time limit has run out
+    """
+    pass
+
+class ReplayFinishedError(Exception):
+    """Called when a replayed rover is sent more commands than there are frames in its recording
+    """
+    pass
+
+class PlanningTimeoutError(Exception):
+    """Called when a planner's time budget runs out before it has found any route
+    """
+    pass
@@ -0,0 +1,256 @@
+import multiprocessing
+from multiprocessing import shared_memory
+from math import ceil
+from time import sleep
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import numpy as np
+from grid import Grid
+from inflation import ObstacleInflator
+from locate_obstacles import locate_obstacles_array
+from move_rover import PurePursuit, RateLimiter
+from pathfinding import smooth_path
+from run_course import make_planner
+from errors import NoValidPathError
+
+class SharedMap:
+    """An obstacle map held in a block of shared memory, so that several processes plan on the same obstacles without copying them
+
+    The block holds a version number followed by the obstacle and padding layers. `grid` is a Grid whose obstacle and padding layers are views of the block, so obstacles marked through it in one process are visible in every other process at once, while the path and parent layers stay private to each process. Only one process should write to the map, bumping the version after each batch of changes. Readers never lock, so a reader may see part of a batch that is still being written; it should note the version before it reads and read again once the version has moved on, by which time the batch is complete.
+
+    A SharedMap can be passed to another process, which attaches to the same block rather than receiving a copy.
+
+    Attributes
+    ----------
+    name : str
+        the name of the shared memory block
+    grid : Grid
+        a grid whose obstacle and padding layers live in the block
+    version : int
+        the number of batches of changes written to the map so far
+
+    Methods
+    -------
+    changed()
+        Bumps the version, announcing a batch of changes to every reader
+    close()
+        Detaches this process from the block
+    unlink()
+        Frees the block once every process has closed it
+    """
+
+    def __init__(self, start, end, node_spacing=1.0, name=None):
+        """Creates a new shared map with no obstacles, or attaches to an existing one.
+
+        Parameters
+        ----------
+        start : (float, float)
+            a point that defines the origin of the grid
+        end : (float, float)
+            a point that defines the corner of the grid opposite `start`
+        node_spacing : float
+            the length of each grid square in meters
+        name : str
+            the name of an existing block to attach to, which must have been created with the same corners and node spacing. If None, a new block is created
+        """
+        self._arguments = (start, end, node_spacing)
+        self.grid = Grid(start, end, node_spacing=node_spacing)
+        shape = (self.grid.height, self.grid.width)
+        layer_size = shape[0] * shape[1]
+        # The version is 8 bytes long, so both layers start on an aligned boundary
+        size = 8 + 2 * layer_size
+        if name is None:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+            self._memory.buf[:size] = bytes(size)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self.name = self._memory.name
+
+        self._version = np.ndarray((1,), dtype=np.int64, buffer=self._memory.buf)
+        self.grid.obstacle_layer = np.ndarray(shape, dtype=bool, buffer=self._memory.buf, offset=8)
+        self.grid.padding_layer = np.ndarray(shape, dtype=bool, buffer=self._memory.buf, offset=8 + layer_size)
+
+    def __reduce__(self):
+        return (SharedMap, self._arguments + (self.name,))
+
+    @property
+    def version(self):
+        return int(self._version[0])
+
+    def changed(self):
+        """Bumps the version, announcing a batch of changes to every reader"""
+        self._version[0] += 1
+
+    def close(self):
+        """Detaches this process from the block. The grid must not be used afterwards"""
+        # The views into the block have to go before it can be closed
+        self._version = None
+        self.grid.obstacle_layer = None
+        self.grid.padding_layer = None
+        self._memory.close()
+
+    def unlink(self):
+        """Frees the block once every process has closed it"""
+        self._memory.unlink()
+
+def _planning_worker(shared_map, index, end_point, poses, finished, stop, routes, planner, include_diagonals, euclidean):
+    """Plans routes for one rover in its own process, from the rover's latest position, whenever the version of the shared map changes. The rover's progress alone never triggers a new route, since the route it is following still leads to its endpoint"""
+    # Only the parent process waits for what is left in the queue when it finishes
+    routes.cancel_join_thread()
+    try:
+        grid = shared_map.grid
+        end_node = grid.nearest_node(end_point)
+        find_path = make_planner(planner, grid, end_node, include_diagonals=include_diagonals, euclidean=euclidean)
+        planned_version = None
+        while not stop.is_set() and not finished[index]:
+            version = shared_map.version
+            if version == planned_version:
+                sleep(0.002)
+                continue
+
+            # The map may change while the route is planned; the route is still sound for the map as it was, and the next pass plans on the newer one
+            rover_node = grid.nearest_node((poses[2 * index], poses[2 * index + 1]))
+            try:
+                path = find_path(rover_node)
+            except NoValidPathError:
+                routes.put(("unreachable", index, version, None))
+                planned_version = version
+                continue
+            waypoints = [grid.location(*node.coords) for node in smooth_path(rover_node, path)]
+            routes.put(("route", index, version, waypoints))
+            planned_version = version
+    except Exception as error:
+        routes.put(("error", index, None, error))
+    finally:
+        shared_map.close()
+
+def run_fleet(rovers, end_points, node_spacing=0.4, include_diagonals=True, euclidean=True, verbose=False, sensors_to_ignore=[7], obstacle_padding=0.4, buffer_distance=5.0, planner="astar", control_rate=20.0, obstacle_check_rate=5.0, realtime=True):
+    """Navigates several rovers to their own endpoints over a single map of the obstacles they have all seen
+
+    The map is a SharedMap covering every rover and endpoint plus `buffer_distance`. Each rover has its own planning process, which plans on the shared layers themselves, so an obstacle seen by one rover changes the others' routes as soon as it is marked, and planning for different rovers runs on different cores rather than taking turns on one interpreter. A planning process replans whenever the map's version changes, and publishes each route with the version it was planned on.
+
+    The calling process steers every rover with a PurePursuit controller at `control_rate`, reads each rover's LiDAR at `obstacle_check_rate`, and is the only one to write to the map. Each rover switches to a new route as soon as one is published for it, and keeps following its previous route until then.
+
+    Parameters
+    ----------
+    rovers : list of Rover
+        the rovers to be navigated through the obstacles
+    end_points : list of tuple
+        the coordinates of each rover's intended destination
+    node_spacing : float
+        the distance between nodes on the grid
+    include_diagonals : bool
+        whether or not the rovers should be able to move diagonally between nodes
+    euclidean : bool
+        whether or not euclidean distance should be used as the heuristic function when running A*
+    verbose : bool
+        whether or not to include verbose logging
+    sensors_to_ignore : list of ints
+        indices of LiDAR sensors to be ignored by every rover
+    obstacle_padding : float
+        the amount of distance from each obstacle the rovers should maintain
+    buffer_distance : float
+        the amount of distance in each direction by which the grid should be extended beyond what is necessary to fit every rover and destination
+    planner : str
+        the algorithm used to plan routes; one of `run_course.PLANNERS`
+    control_rate : float
+        the number of commands per second sent to each rover
+    obstacle_check_rate : float
+        the number of times per second each rover's LiDAR is read and marked on the map
+    realtime : bool
+        whether or not the control loop waits between commands to hold `control_rate`
+
+    Raises
+    ------
+    ValueError
+        If the number of rovers and endpoints differ
+    """
+    if len(rovers) != len(end_points):
+        raise ValueError("There are {} rovers but {} endpoints".format(len(rovers), len(end_points)))
+
+    corners = np.array([(rover.x, rover.y) for rover in rovers] + list(end_points), dtype=float)
+    start = tuple(corners.min(axis=0) - buffer_distance)
+    end = tuple(corners.max(axis=0) + buffer_distance)
+    shared_map = SharedMap(start, end, node_spacing=node_spacing)
+    grid = shared_map.grid
+    inflator = ObstacleInflator(int(ceil(float(obstacle_padding) / node_spacing)))
+
+    # Each rover's position is shared with its planning process, which starts its routes from there
+    poses = multiprocessing.Array("d", corners[:len(rovers)].ravel().tolist(), lock=False)
+    finished = multiprocessing.Array("b", len(rovers), lock=False)
+    stop = multiprocessing.Event()
+    routes = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_planning_worker, args=(shared_map, index, tuple(end_point), poses, finished, stop, routes, planner, include_diagonals, euclidean))
+               for index, end_point in enumerate(end_points)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+
+    limiter = RateLimiter(control_rate, obstacle_check_rate, realtime)
+    controllers = [None] * len(rovers)
+
+    try:
+        while not all(finished):
+            if limiter.obstacle_check_due():
+                marked = False
+                for index, rover in enumerate(rovers):
+                    if finished[index]:
+                        continue
+                    rows, columns = grid.nearest_indices(locate_obstacles_array(rover, sensors_to_ignore=sensors_to_ignore))
+                    unmarked = ~grid.obstacle_layer[rows, columns]
+                    if not unmarked.any():
+                        continue
+                    rows, columns = rows[unmarked], columns[unmarked]
+                    grid.obstacle_layer[rows, columns] = True
+                    # The rover's own node is never padded, or it could not plan its way out
+                    inflator.inflate(grid, rows, columns, keep_clear=grid.nearest_node((rover.x, rover.y)).coords)
+                    marked = True
+                if marked:
+                    shared_map.changed()
+
+            while True:
+                try:
+                    kind, index, version, content = routes.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "error":
+                    raise content
+                if finished[index]:
+                    continue
+                if kind == "unreachable":
+                    # A route that was only unreachable on an old version of the map is simply planned again
+                    if version == shared_map.version:
+                        if verbose: print("ERROR: NO ROUTE FOUND FOR ROVER {}.\nREDRAWING GRID".format(index))
+                        grid.clear_obstacles()
+                        shared_map.changed()
+                    continue
+                rover = rovers[index]
+                controllers[index] = PurePursuit((rover.x, rover.y), content)
+                if verbose:
+                    print("Rover {} following {} waypoints planned on map version {}".format(index, len(content), version))
+
+            for index, rover in enumerate(rovers):
+                if finished[index]:
+                    continue
+                command = (0, 0) if controllers[index] is None else controllers[index].command(rover.x, rover.y, rover.heading)
+                if command is None:
+                    # Every route ends at the destination, so finishing one means the rover has arrived
+                    finished[index] = True
+                    rover.send_command(0, 0)
+                    continue
+                rover.send_command(*command)
+                poses[2 * index] = rover.x
+                poses[2 * index + 1] = rover.y
+
+            limiter.wait()
+    finally:
+        stop.set()
+        for worker in workers:
+            worker.join()
+        shared_map.close()
+        shared_map.unlink()
+
+    for rover in rovers:
+        rover.send_command(0, 0)
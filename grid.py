@@ -18,8 +18,16 @@ class Grid:
         the number of nodes in each row; equivalently the number of columns in the grid 
     height : int
         the number of nodes in each column; equivalently the number of rows in the grid
-    _array : nparray
-        the underlying numpy array in which the contents of the grid is stored
+    obstacle_layer : nparray
+        a (height, width) boolean array marking the nodes that contain an obstacle
+    padding_layer : nparray
+        a (height, width) boolean array marking the nodes that are padding around an obstacle
+    path_layer : nparray
+        a (height, width) boolean array marking the nodes on the rover's path
+    parent_layer : nparray
+        a (height, width) int32 array holding the flat index of each node's parent during pathfinding, or -1 if the node has no parent
+    rover_coords : (int, int)
+        the row and column of the node on which the rover is located, or None if it has not been set
 
     Methods
     -------
@@ -30,10 +38,28 @@ class Grid:
         Finds the node whose physical location is closest to the specified point 
     location(self, row, column)
         Finds the physical position of a node at the specified indices 
+    nearest_indices(self, points)
+        Finds the row and column of the nearest node to each of an array of points
+    locations(self, rows, columns)
+        Finds the physical positions of the nodes at arrays of indices
+    flat_index(self, row, column)
+        Finds the index of a node in the flattened layers of the grid
+    node_from_index(self, index)
+        Returns the node located at the specified index of the flattened layers
+    blocked_layer(self)
+        Returns a boolean array marking every node the rover may not pass through
+    contains(self, rows, columns)
+        Determines which of the specified indices lie on the grid
+    parent_of(self, row, column)
+        Returns the parent recorded for a node during pathfinding
+    set_parents(self, children, parents)
+        Records the parents of a batch of nodes, given as flat indices
+    clear_obstacles(self)
+        Forgets every obstacle and all padding recorded on the grid
     __getitem__(indices)
-        Returns the item in the underlying array located at the specified indices
+        Returns a view of the node located at the specified indices, or of a whole row if only one index is given
     __setitem__(indices, value)
-        Sets the item in the underlying array located at the specified indices to the given value
+        Copies the state of the given node onto the node located at the specified indices
     __repr__()
         Returns a representation of the grid as a string
     """
@@ -54,7 +80,6 @@ class Grid:
         self.start = start
         self.end = end
 
-        pre_array = []
         num_x_boxes = int(ceil(abs(float(end[0] - start[0]) / node_spacing)))
         num_y_boxes = int(ceil(abs(float(end[1] - start[1]) / node_spacing)))
 
@@ -62,35 +87,155 @@ class Grid:
         num_x_boxes = max(num_x_boxes, 1)
         num_y_boxes = max(num_y_boxes, 1)
 
-        for i in range(num_y_boxes):
-            for j in range(num_x_boxes):
-                pre_array.append(GridNode(i, j))
-        
-        self._array = np.array(pre_array).reshape((num_y_boxes, num_x_boxes))
+        # Nodes are stored as a struct of arrays; GridNode instances are only created when a caller asks for one
+        shape = (num_y_boxes, num_x_boxes)
+        self.obstacle_layer = np.zeros(shape, dtype=bool)
+        self.padding_layer = np.zeros(shape, dtype=bool)
+        self.path_layer = np.zeros(shape, dtype=bool)
+        self.parent_layer = np.full(shape, -1, dtype=np.int32)
+        self.rover_coords = None
+
         self.width = num_x_boxes
         self.height = num_y_boxes
         self.node_spacing = node_spacing
 
+    def _checked_indices(self, row, column):
+        """Wraps negative indices and ensures both indices lie on the grid"""
+        if row < 0:
+            row += self.height
+        if column < 0:
+            column += self.width
+        if not (0 <= row < self.height and 0 <= column < self.width):
+            raise IndexError("Node ({}, {}) is outside of the grid".format(row, column))
+        return (int(row), int(column))
+
     def __getitem__(self, indices):
-        """Allows a value to be read from a grid through subscripts"""
-        return self._array[indices]
+        """Allows a node (or a row of nodes) to be read from a grid through subscripts"""
+        if isinstance(indices, tuple):
+            return GridNode(self, *self._checked_indices(*indices))
+        return _GridRow(self, self._checked_indices(indices, 0)[0])
     
     def __setitem__(self, indices, value):
-        """Allows a value to be set on an element of a grid through subscripts"""
-        self._array[indices] = value
+        """Allows the state of a node to be copied onto an element of a grid through subscripts"""
+        row, column = self._checked_indices(*indices)
+        self.obstacle_layer[row, column] = value.is_obstacle
+        self.padding_layer[row, column] = value.is_padding
+        self.path_layer[row, column] = value.on_path
+        parent = value.parent
+        self.parent_layer[row, column] = -1 if parent is None else self.flat_index(*parent.coords)
+        if value.is_rover:
+            self.rover_coords = (row, column)
     
     def __repr__(self):
         """Provides a string representation of an instance of Grid"""
-        string = "["
-
-        for i in range(self.height):
-            for j in range(self.width):
-                node = self[i][j]
-                # Ensures there are no trailing spaces or newlines
-                string += repr(node) + ("]" if j == self.width - 1 else " ")
-            string += ("" if i == self.height - 1 else "\n[")
-        
-        return string
+        # Later assignments take precedence, mirroring GridNode.__repr__
+        characters = np.full((self.height, self.width), " ", dtype="<U1")
+        characters[self.path_layer] = "p"
+        characters[self.padding_layer] = "-"
+        characters[self.obstacle_layer] = "x"
+        if self.rover_coords is not None:
+            characters[self.rover_coords] = "r"
+
+        # Ensures there are no trailing spaces or newlines
+        return "\n".join("[" + " ".join(row) + "]" for row in characters)
+
+    def flat_index(self, row, column):
+        """Finds the index of a node in the flattened layers of the grid
+
+        Parameters
+        ----------
+        row : int
+            the row of the node
+        column : int
+            the column of the node
+
+        Returns
+        -------
+        An int that uniquely identifies the node on the grid
+
+        """
+        return row * self.width + column
+
+    def node_from_index(self, index):
+        """Returns the node located at the specified index of the flattened layers
+
+        Parameters
+        ----------
+        index : int
+            an index produced by `flat_index`
+
+        Returns
+        -------
+        The node at that index
+
+        """
+        row, column = divmod(int(index), self.width)
+        return GridNode(self, row, column)
+
+    def blocked_layer(self):
+        """Returns a boolean array marking every node the rover may not pass through
+
+        Returns
+        -------
+        A (height, width) boolean array that is true wherever a node is an obstacle or padding
+
+        """
+        return self.obstacle_layer | self.padding_layer
+
+    def contains(self, rows, columns):
+        """Determines which of the specified indices lie on the grid
+
+        Parameters
+        ----------
+        rows : array_like
+            the rows of the nodes
+        columns : array_like
+            the columns of the nodes
+
+        Returns
+        -------
+        A boolean array that is true wherever the node at the corresponding indices lies on the grid
+
+        """
+        rows = np.asarray(rows)
+        columns = np.asarray(columns)
+        return (rows >= 0) & (rows < self.height) & (columns >= 0) & (columns < self.width)
+
+    def parent_of(self, row, column):
+        """Returns the parent recorded for a node during pathfinding
+
+        Parameters
+        ----------
+        row : int
+            the row of the node
+        column : int
+            the column of the node
+
+        Returns
+        -------
+        The parent node, or None if the node has no parent
+
+        """
+        index = self.parent_layer[row, column]
+        return None if index < 0 else self.node_from_index(index)
+
+    def set_parents(self, children, parents):
+        """Records the parents of a batch of nodes, given as flat indices
+
+        Parameters
+        ----------
+        children : array_like
+            the flat indices of the nodes whose parents are set
+        parents : array_like
+            the flat indices of their parents, or -1 to remove a node's parent
+
+        """
+        self.parent_layer.flat[children] = parents
+
+    def clear_obstacles(self):
+        """Forgets every obstacle and all padding recorded on the grid"""
+        self.obstacle_layer[:] = False
+        self.padding_layer[:] = False
     
     def nearest_node(self, point):
         """Finds the node whose physical location is closest to the specified point
@@ -120,7 +265,7 @@ class Grid:
         j = min(j, self.width - 1)
         j = max(j, 0)
         
-        return self[i][j]
+        return self[i, j]
     
     def location(self, row, column):
         """Finds the physical position of a node at the specified indices
@@ -142,6 +287,59 @@ class Grid:
         y = self.start[1] + float(row) / self.height * (self.end[1] - self.start[1])
         return (x, y)
     
+    def nearest_indices(self, points):
+        """Finds the row and column of the nearest node to each of an array of points
+
+        Parameters
+        ----------
+        points : array_like
+            an (M, 2) array of (x, y) points
+
+        Returns
+        -------
+        A tuple of two integer arrays of length M, holding the rows and columns of the nodes nearest to each point. These agree with `nearest_node` point for point
+
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        y_distance = float(self.end[1] - self.start[1])
+        x_distance = float(self.end[0] - self.start[0])
+
+        if y_distance != 0:
+            rows = np.rint(self.height * (points[:, 1] - self.start[1]) / y_distance)
+        else:
+            rows = np.zeros(len(points))
+        if x_distance != 0:
+            columns = np.rint(self.width * (points[:, 0] - self.start[0]) / x_distance)
+        else:
+            columns = np.zeros(len(points))
+
+        # Ensures values are within bounds
+        rows = np.clip(rows, 0, self.height - 1).astype(np.intp)
+        columns = np.clip(columns, 0, self.width - 1).astype(np.intp)
+        return rows, columns
+
+    def locations(self, rows, columns):
+        """Finds the physical positions of the nodes at arrays of indices
+
+        Parameters
+        ----------
+        rows : array_like
+            the rows of the nodes whose physical locations are sought
+        columns : array_like
+            the columns of the nodes whose physical locations are sought
+
+        Returns
+        -------
+        An (M, 2) array whose rows are the (x, y) locations of the nodes
+
+        """
+        rows = np.asarray(rows, dtype=float)
+        columns = np.asarray(columns, dtype=float)
+        points = np.empty((rows.size, 2))
+        points[:, 0] = self.start[0] + columns.ravel() / self.width * (self.end[0] - self.start[0])
+        points[:, 1] = self.start[1] + rows.ravel() / self.height * (self.end[1] - self.start[1])
+        return points
+
     @staticmethod
     def oversized_grid(start, end, node_spacing=1.0, buffer_distance=5.0):
         """Creates an instance of grid larger than made necessary by the start and end points
@@ -175,3 +373,24 @@ class Grid:
 
         return Grid(new_start, new_end, node_spacing=node_spacing)
 
+
+
+class _GridRow:
+    """A lightweight view of a single row of a grid, so that nodes can still be accessed as `grid[i][j]`"""
+
+    def __init__(self, grid, row):
+        self._grid = grid
+        self._row = row
+
+    def __len__(self):
+        return self._grid.width
+
+    def __getitem__(self, column):
+        return self._grid[self._row, column]
+
+    def __setitem__(self, column, value):
+        self._grid[self._row, column] = value
+
+    def __iter__(self):
+        for column in range(self._grid.width):
+            yield GridNode(self._grid, self._row, column)
@@ -1,10 +1,16 @@
+import numbers
+import warnings
 import numpy as np
 
-class GridNode:
+class GridNode(object):
     """A class that represents a node in the rover's environment
 
+    A GridNode does not store any state of its own. It is a thin view onto a single cell of a `Grid`, whose contents are held in numpy layers on the grid itself. Nodes are created on demand, so two nodes describing the same cell are equal (and hash equally) without being the same object. Nodes built with the deprecated `GridNode(row, column, ...)` signature are the exception: they keep their own state, as they did before nodes became views.
+
     Attributes
     ----------
+    grid : Grid
+        the grid on which the node is located
     coords : (int, int)
         the row and column of the grid in which the node is located
     is_obstacle : bool
@@ -23,31 +29,88 @@ class GridNode:
     __repr__()
         Returns a representation of the node as a string
     """
-    def __init__(self, row, column, is_obstacle=False, is_padding=False, on_path=False, is_rover = False):
+    __slots__ = ("grid", "coords")
+
+    def __init__(self, *args, **kwargs):
         """Initializes a new GridNode instance.
 
         Parameters
         ----------
+        grid : Grid
+            the grid whose cell the node represents
         row : int
             the row on which the node is located
         column : int
-            the row on which the node is located
-        is_obstacle : bool
-            whether or not the space represented by the node contains an obstacle
-        is_padding : bool
-            whether or not the space represented by the node is padding around an obstacle
-        on_path : bool
-            whether or not the node is a point on the rover's path
-        is_rover : bool
-            whether or not the rover's position
+            the column on which the node is located
+
+        Notes
+        -----
+        The signature used before nodes became views, `GridNode(row, column, is_obstacle=False, is_padding=False, on_path=False, is_rover=False)`, is still accepted but deprecated. It makes a detached node that keeps its own state, as nodes used to, and which can be copied onto a grid with `grid[row, column] = node`.
 
         """
+        if "grid" in kwargs or (args and not isinstance(args[0], numbers.Integral)):
+            self.grid, row, column = _view_args(*args, **kwargs)
+        else:
+            warnings.warn("GridNode(row, column, ...) is deprecated; nodes are views onto a grid, so read them with grid[row, column] or build them with GridNode(grid, row, column)", DeprecationWarning, stacklevel=2)
+            row, column, is_obstacle, is_padding, on_path, is_rover = _detached_args(*args, **kwargs)
+            self.grid = _DetachedCell((row, column), is_obstacle, is_padding, on_path, is_rover)
         self.coords = (row, column)
-        self.is_obstacle = is_obstacle
-        self.is_padding = is_padding
-        self.on_path = on_path
-        self.is_rover = is_rover
-        self.parent = None
+
+    @property
+    def is_obstacle(self):
+        return bool(self.grid.obstacle_layer[self.coords])
+
+    @is_obstacle.setter
+    def is_obstacle(self, value):
+        self.grid.obstacle_layer[self.coords] = value
+
+    @property
+    def is_padding(self):
+        return bool(self.grid.padding_layer[self.coords])
+
+    @is_padding.setter
+    def is_padding(self, value):
+        self.grid.padding_layer[self.coords] = value
+
+    @property
+    def on_path(self):
+        return bool(self.grid.path_layer[self.coords])
+
+    @on_path.setter
+    def on_path(self, value):
+        self.grid.path_layer[self.coords] = value
+
+    @property
+    def is_rover(self):
+        return self.grid.rover_coords == self.coords
+
+    @is_rover.setter
+    def is_rover(self, value):
+        if value:
+            self.grid.rover_coords = self.coords
+        elif self.grid.rover_coords == self.coords:
+            self.grid.rover_coords = None
+
+    @property
+    def parent(self):
+        return self.grid.parent_of(*self.coords)
+
+    @parent.setter
+    def parent(self, node):
+        if isinstance(self.grid, _DetachedCell):
+            self.grid.parent = node
+            return
+        self.grid.set_parents([self.grid.flat_index(*self.coords)], [-1 if node is None else self.grid.flat_index(*node.coords)])
+
+    def __eq__(self, other):
+        return isinstance(other, GridNode) and self.grid is other.grid and self.coords == other.coords
+
+    def __ne__(self, other):
+        # Required in Python 2.x, where __ne__ is not derived from __eq__
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.coords)
 
     def __repr__(self):
         """Returns a string representing the node. The string depends on whether or not the node represents an obstacle, padding, a point on the rover's path, or the rover itself
@@ -63,6 +126,25 @@ class GridNode:
         else:
             return " "
 
+def _view_args(grid, row, column):
+    return grid, row, column
+
+def _detached_args(row, column, is_obstacle=False, is_padding=False, on_path=False, is_rover=False):
+    return row, column, is_obstacle, is_padding, on_path, is_rover
+
+class _DetachedCell(object):
+    """Stands in for the grid of a node built with the deprecated `GridNode(row, column, ...)` signature, holding that one node's state"""
+
+    def __init__(self, coords, is_obstacle, is_padding, on_path, is_rover):
+        self.obstacle_layer = {coords: is_obstacle}
+        self.padding_layer = {coords: is_padding}
+        self.path_layer = {coords: on_path}
+        self.rover_coords = coords if is_rover else None
+        self.parent = None
+
+    def parent_of(self, row, column):
+        return self.parent
+
 def neighbouring_nodes(node, grid, include_diagonals=True, radius=1):
     """Finds a list of nodes around a specified node on a grid
 
@@ -93,17 +175,17 @@ def neighbouring_nodes(node, grid, include_diagonals=True, radius=1):
                 if i_offset == 0 and j_offset == 0: continue
                 # Ensure the new node is within the bounds of the grid
                 if i + i_offset in range(grid.height) and j + j_offset in range(grid.width):
-                    node_list.append(grid[i + i_offset][j + j_offset])
+                    node_list.append(grid[i + i_offset, j + j_offset])
     #   n
     # n x n
     #   n
     else:
         for i_offset in [dist for dist in range(-radius, radius + 1) if dist != 0]:
             if i + i_offset in range(grid.height):
-                node_list.append(grid[i + i_offset][j])
+                node_list.append(grid[i + i_offset, j])
         for j_offset in [dist for dist in range(-radius, radius + 1) if dist != 0]:
             if j + j_offset in range(grid.width):
-                node_list.append(grid[i][j + j_offset])
+                node_list.append(grid[i, j + j_offset])
     
     return node_list
 
@@ -0,0 +1,398 @@
+import heapq
+import itertools
+import numpy as np
+from pathfinding import neighbour_offsets, path_from_indices, quickest_path
+
+class HierarchicalPlanner:
+    """A planner that searches an abstract graph of grid clusters first, then refines the route only inside the clusters it crosses
+
+    The planner implements HPA*. The grid is split into square clusters. Wherever two neighbouring clusters share a run of free nodes along their border, the run becomes an entrance with one or two transitions across it, and the shortest distances between the transitions inside each cluster become the edges of an abstract graph. A query connects the start and goal to the transitions of their own clusters, searches the abstract graph, and stitches the route together from the cluster-local paths found while building it.
+
+    When diagonal moves are allowed, a pair of nodes that can only be crossed between diagonally, because both nodes between them are blocked, becomes a transition of its own. This includes pairs across the corner where four clusters meet. A start inside padding steps out of it into any free neighbour, including one across a cluster border, which joins the abstract graph through the transitions of its own cluster. Since the abstract graph then holds every way between free nodes, a failed abstract search means there is no route; a flat search over the whole grid confirms this before the planner gives up, and so an unreachable goal costs as much as it would any flat planner.
+
+    Entrances and intra-cluster distances are computed lazily, the first time a search reaches a cluster, and cached. On every query the grid's obstacle and padding layers are compared against the ones the planner last saw, and only the clusters containing changed nodes, along with their neighbours, are rebuilt. The routes are close to, but not always, the shortest possible.
+
+    Attributes
+    ----------
+    grid : Grid
+        the grid on which paths are planned
+    goal : GridNode
+        the node every path leads to
+    cluster_size : int
+        the number of nodes along each side of a cluster
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    expansions : int
+        the number of abstract nodes expanded over the lifetime of the planner
+    peak_open_set : int
+        the largest number of entries the abstract search's open set has held over the lifetime of the planner
+
+    Methods
+    -------
+    quickest_path(start_node, verbose=False)
+        Finds a path from a node to the goal through the abstract graph
+    """
+
+    def __init__(self, grid, goal, cluster_size=16, include_diagonals=True):
+        """Initializes a new HierarchicalPlanner instance.
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid on which paths are planned
+        goal : GridNode
+            the node every path leads to
+        cluster_size : int
+            the number of nodes along each side of a cluster
+        include_diagonals : bool
+            whether or not the rover should be able to move diagonally between nodes
+        """
+        self.grid = grid
+        self.goal = goal
+        self.cluster_size = cluster_size
+        self.include_diagonals = include_diagonals
+        self.expansions = 0
+        self.peak_open_set = 0
+
+        self._offsets = neighbour_offsets(include_diagonals)
+        self._blocked = grid.blocked_layer()
+        self._blocked_flat = self._blocked.ravel()
+        # Transitions across each border, keyed by (cluster, "east" or "south")
+        self._borders = {}
+        # The transitions on the far side of a border from each transition
+        self._partners = {}
+        # Intra-cluster edges and the search trees they were read from, keyed by cluster
+        self._clusters = {}
+
+    def _cluster_of(self, index):
+        row, column = divmod(index, self.grid.width)
+        return (row // self.cluster_size, column // self.cluster_size)
+
+    def _cluster_bounds(self, cluster):
+        """Returns the first row, first column, end row and end column of a cluster"""
+        first_row = cluster[0] * self.cluster_size
+        first_column = cluster[1] * self.cluster_size
+        return first_row, first_column, min(first_row + self.cluster_size, self.grid.height), min(first_column + self.cluster_size, self.grid.width)
+
+    def _cluster_exists(self, cluster):
+        return 0 <= cluster[0] * self.cluster_size < self.grid.height and 0 <= cluster[1] * self.cluster_size < self.grid.width
+
+    def _border_transitions(self, cluster, side):
+        """Finds the pairs of nodes through which the rover can cross from a cluster to its neighbour on the east or south side"""
+        key = (cluster, side)
+        if key in self._borders:
+            return self._borders[key]
+
+        first_row, first_column, end_row, end_column = self._cluster_bounds(cluster)
+        transitions = []
+        if side == "east" and end_column < self.grid.width:
+            inside = (np.arange(first_row, end_row), end_column - 1)
+            step = (0, 1)
+        elif side == "south" and end_row < self.grid.height:
+            inside = (end_row - 1, np.arange(first_column, end_column))
+            step = (1, 0)
+        else:
+            inside = None
+
+        if inside is not None:
+            rows, columns = np.broadcast_arrays(*inside)
+            open_border = ~self._blocked[rows, columns] & ~self._blocked[rows + step[0], columns + step[1]]
+            # Finds the maximal runs of nodes that are free on both sides of the border
+            edges = np.diff(np.concatenate(([0], open_border.astype(np.int8), [0])))
+            for run_start, run_end in zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1) - 1):
+                # Long entrances get a transition at each end, short ones a single transition in the middle
+                positions = [run_start, run_end] if run_end - run_start >= 5 else [(run_start + run_end) // 2]
+                for position in positions:
+                    near = self.grid.flat_index(int(rows[position]), int(columns[position]))
+                    far = self.grid.flat_index(int(rows[position]) + step[0], int(columns[position]) + step[1])
+                    transitions.append((near, far))
+
+            if self.include_diagonals:
+                transitions.extend(self._diagonal_transitions(rows, columns, step, side, first_row, first_column, end_column))
+            for near, far in transitions:
+                self._partners.setdefault(near, set()).add(far)
+                self._partners.setdefault(far, set()).add(near)
+
+        self._borders[key] = transitions
+        return transitions
+
+    def _diagonal_transitions(self, rows, columns, step, side, first_row, first_column, end_column):
+        """Finds the pairs of free nodes that face each other diagonally across a border, where both nodes that would join them with straight moves are blocked
+
+        Diagonal pairs on an east border may lead into the clusters to the northeast and southeast. Those on a south border are kept to the cluster directly below, since the pairs that lead round its corners belong to the east borders of the clusters beside it.
+        """
+        height, width = self.grid.height, self.grid.width
+        transitions = []
+        for slide in (-1, 1):
+            if side == "east":
+                far_rows, far_columns = rows + slide, columns + 1
+                valid = (far_rows >= 0) & (far_rows < height)
+            else:
+                far_rows, far_columns = rows + 1, columns + slide
+                valid = (far_columns >= first_column) & (far_columns < end_column)
+            rows_in, columns_in = rows[valid], columns[valid]
+            far_rows, far_columns = far_rows[valid], far_columns[valid]
+            squeeze = ~self._blocked[rows_in, columns_in] & ~self._blocked[far_rows, far_columns] & \
+                self._blocked[rows_in + step[0], columns_in + step[1]] & self._blocked[far_rows - step[0], far_columns - step[1]]
+            for position in np.flatnonzero(squeeze):
+                transitions.append((self.grid.flat_index(int(rows_in[position]), int(columns_in[position])),
+                                    self.grid.flat_index(int(far_rows[position]), int(far_columns[position]))))
+        return transitions
+
+    def _transitions(self, cluster):
+        """Lists the transitions that lie inside a cluster"""
+        row, column = cluster
+        nodes = set()
+        for near, _ in self._border_transitions(cluster, "east") + self._border_transitions(cluster, "south"):
+            nodes.add(near)
+        # Diagonal transitions can lead in from the clusters diagonally to the west as well as from the neighbours to the west and north
+        for neighbour, side in (((row, column - 1), "east"), ((row - 1, column - 1), "east"), ((row + 1, column - 1), "east"), ((row - 1, column), "south")):
+            if self._cluster_exists(neighbour):
+                for _, far in self._border_transitions(neighbour, side):
+                    if self._cluster_of(far) == cluster:
+                        nodes.add(far)
+        return sorted(nodes)
+
+    def _distance_fields(self, sources, cluster):
+        """Runs breadth-first searches from several nodes at once that never leave their cluster
+
+        Returns an array with one layer per source, holding the number of steps from the source to every node of the cluster, or -1 for the nodes it cannot reach
+        """
+        first_row, first_column, end_row, end_column = self._cluster_bounds(cluster)
+        free = ~self._blocked[first_row:end_row, first_column:end_column]
+        height, width = free.shape
+        fields = np.full((len(sources), height, width), -1, dtype=np.int32)
+        frontier = np.zeros(fields.shape, dtype=bool)
+        for layer, source in enumerate(sources):
+            row, column = divmod(source, self.grid.width)
+            frontier[layer, row - first_row, column - first_column] = True
+        fields[frontier] = 0
+        reached = frontier.copy()
+
+        steps = 0
+        while frontier.any():
+            steps += 1
+            # Grows every search by one step at once by shifting its frontier in each direction
+            grown = np.zeros(fields.shape, dtype=bool)
+            for row_offset, column_offset in self._offsets:
+                grown[:, max(row_offset, 0):height + min(row_offset, 0), max(column_offset, 0):width + min(column_offset, 0)] |= \
+                    frontier[:, max(-row_offset, 0):height - max(row_offset, 0), max(-column_offset, 0):width - max(column_offset, 0)]
+            frontier = grown & free & ~reached
+            fields[frontier] = steps
+            reached |= frontier
+
+        return fields
+
+    def _descend(self, field, cluster, target):
+        """Follows a distance field downhill from `target` to the source it was grown from, returning the nodes visited after `target`"""
+        first_row, first_column, end_row, end_column = self._cluster_bounds(cluster)
+        width = self.grid.width
+        row, column = divmod(target, width)
+        steps = field[row - first_row, column - first_column]
+        nodes = []
+        while steps > 0:
+            for row_offset, column_offset in self._offsets:
+                neighbour_row = row + row_offset
+                neighbour_column = column + column_offset
+                if first_row <= neighbour_row < end_row and first_column <= neighbour_column < end_column and \
+                        field[neighbour_row - first_row, neighbour_column - first_column] == steps - 1:
+                    break
+            row, column = neighbour_row, neighbour_column
+            steps -= 1
+            nodes.append(row * width + column)
+        return nodes
+
+    def _steps_to(self, field, cluster, index):
+        """Reads the number of steps to a node from a distance field, or None if the node cannot be reached"""
+        if self._cluster_of(index) != cluster:
+            return None
+        first_row, first_column, _, _ = self._cluster_bounds(cluster)
+        row, column = divmod(index, self.grid.width)
+        steps = field[row - first_row, column - first_column]
+        return int(steps) if steps >= 0 else None
+
+    def _entries(self, field, cluster):
+        """Maps each transition of a cluster that can be reached in a distance field to its distance in meters"""
+        entries = {}
+        for transition in self._transitions(cluster):
+            steps = self._steps_to(field, cluster, transition)
+            if steps is not None:
+                entries[transition] = steps * self.grid.node_spacing
+        return entries
+
+    def _cluster_edges(self, cluster):
+        """Returns the abstract edges between the transitions of a cluster, and the distance field grown from each transition"""
+        if cluster not in self._clusters:
+            edges = {}
+            fields = {}
+            transitions = self._transitions(cluster)
+            if transitions:
+                for source, field in zip(transitions, self._distance_fields(transitions, cluster)):
+                    fields[source] = field
+                    edges[source] = []
+                    for target in transitions:
+                        steps = self._steps_to(field, cluster, target)
+                        if target != source and steps is not None:
+                            edges[source].append((target, steps * self.grid.node_spacing))
+            self._clusters[cluster] = (edges, fields)
+        return self._clusters[cluster]
+
+    def _apply_grid_changes(self):
+        """Forgets the entrances and edges of every cluster in which a node has changed since the last query"""
+        blocked = self.grid.blocked_layer()
+        changed_rows, changed_columns = np.nonzero(blocked != self._blocked)
+        self._blocked = blocked
+        self._blocked_flat = blocked.ravel()
+
+        dirty = set(zip((changed_rows // self.cluster_size).tolist(), (changed_columns // self.cluster_size).tolist()))
+        stale = set(dirty)
+        for row, column in dirty:
+            # Diagonal transitions depend on nodes in the clusters around a border as well as on either side of it
+            borders = [((row + row_offset, column + column_offset), "east") for row_offset in (-1, 0, 1) for column_offset in (-1, 0)]
+            borders += [((row - 1, column), "south"), ((row, column), "south")]
+            for border in borders:
+                if border not in self._borders:
+                    continue
+                old_transitions = self._borders.pop(border)
+                for near, far in old_transitions:
+                    self._partners[near].discard(far)
+                    self._partners[far].discard(near)
+                # The clusters holding either end of a transition only need rebuilding if the transition has moved
+                moved = set(old_transitions) ^ set(self._border_transitions(*border))
+                stale.update(self._cluster_of(index) for pair in moved for index in pair)
+        for cluster in stale:
+            self._clusters.pop(cluster, None)
+
+    def _origin(self, index):
+        """Connects a node from which a search sets off to the abstract graph, returning its cluster, the distance field grown from it within the cluster, the transitions that field reaches and the number of steps to the goal, or None if the goal is not in the cluster or cannot be reached within it"""
+        cluster = self._cluster_of(index)
+        field = self._distance_fields([index], cluster)[0]
+        return cluster, field, self._entries(field, cluster), self._steps_to(field, cluster, self.grid.flat_index(*self.goal.coords))
+
+    def _heuristic(self, index1, index2):
+        row1, column1 = divmod(index1, self.grid.width)
+        row2, column2 = divmod(index2, self.grid.width)
+        if self.include_diagonals:
+            steps = max(abs(row1 - row2), abs(column1 - column2))
+        else:
+            steps = abs(row1 - row2) + abs(column1 - column2)
+        return steps * self.grid.node_spacing
+
+    def quickest_path(self, start_node, verbose=False):
+        """Finds a path from a node to the goal through the abstract graph
+
+        Parameters
+        ----------
+        start_node : GridNode
+            the node from which the rover begins
+        verbose : bool
+            whether or not to log when a path is found
+
+        Returns
+        -------
+        list
+            A list of nodes that leads to the goal, excluding `start_node`
+
+        Raises
+        ------
+        NoValidPathError
+            If no viable path is found
+        """
+        self._apply_grid_changes()
+
+        start = self.grid.flat_index(*start_node.coords)
+        goal = self.grid.flat_index(*self.goal.coords)
+        start_cluster = self._cluster_of(start)
+        goal_cluster = self._cluster_of(goal)
+
+        # The start and goal join the abstract graph through the transitions of their own clusters
+        goal_field = self._distance_fields([goal], goal_cluster)[0]
+        goal_entries = self._entries(goal_field, goal_cluster)
+        origins = { start: self._origin(start) }
+        # A start inside padding may only be able to step out of it into a neighbouring cluster, so each free neighbour there joins the graph through its own cluster in turn
+        escapes = []
+        if self._blocked_flat[start]:
+            row, column = start_node.coords
+            for row_offset, column_offset in self._offsets:
+                neighbour_row, neighbour_column = row + row_offset, column + column_offset
+                if not (0 <= neighbour_row < self.grid.height and 0 <= neighbour_column < self.grid.width):
+                    continue
+                neighbour = self.grid.flat_index(neighbour_row, neighbour_column)
+                if not self._blocked_flat[neighbour] and self._cluster_of(neighbour) != start_cluster:
+                    escapes.append((neighbour, self.grid.node_spacing))
+                    origins[neighbour] = self._origin(neighbour)
+
+        def successors(node):
+            if node in origins:
+                cluster, _, entries, steps_to_goal = origins[node]
+                edges = list(entries.items())
+                edges.extend((partner, self.grid.node_spacing) for partner in self._partners.get(node, ()))
+                if steps_to_goal is not None and not self._blocked_flat[goal]:
+                    edges.append((goal, steps_to_goal * self.grid.node_spacing))
+                if node == start:
+                    edges.extend(escapes)
+                return edges
+            edges = list(self._cluster_edges(self._cluster_of(node))[0].get(node, []))
+            edges.extend((partner, self.grid.node_spacing) for partner in self._partners.get(node, ()))
+            if node in goal_entries and not self._blocked_flat[goal]:
+                edges.append((goal, goal_entries[node]))
+            return edges
+
+        distances = { start: 0.0 }
+        parents = {}
+        closed_set = set()
+        counter = itertools.count()
+        open_heap = [(self._heuristic(start, goal), next(counter), 0.0, start)]
+
+        while open_heap:
+            if len(open_heap) > self.peak_open_set:
+                self.peak_open_set = len(open_heap)
+            _, _, distance, current = heapq.heappop(open_heap)
+            if current in closed_set or distance != distances[current]:
+                continue
+            if current == goal:
+                break
+            closed_set.add(current)
+            self.expansions += 1
+
+            for successor, cost in successors(current):
+                successor_distance = distance + cost
+                if successor in distances and distances[successor] <= successor_distance:
+                    continue
+                distances[successor] = successor_distance
+                parents[successor] = current
+                closed_set.discard(successor)
+                heapq.heappush(open_heap, (successor_distance + self._heuristic(successor, goal), next(counter), successor_distance, successor))
+
+        if goal != start and goal not in parents:
+            # The abstract graph holds every way between free nodes, so a flat search only confirms there is no route before giving up. It costs as much as any search for an unreachable goal: every node reachable from the start is expanded
+            stats = {}
+            try:
+                return quickest_path(start_node, self.goal, self.grid, include_diagonals=self.include_diagonals, verbose=verbose, algorithm="bidirectional", stats=stats)
+            finally:
+                self.expansions += stats.get("expansions", 0)
+
+        if verbose:
+            print("Found a valid path")
+
+        abstract_route = [goal]
+        while abstract_route[-1] != start:
+            abstract_route.append(parents[abstract_route[-1]])
+        abstract_route.reverse()
+
+        # Refines each abstract edge into the nodes it stands for, using only the search trees of the clusters on the route
+        indices = [start]
+        for previous, current in zip(abstract_route, abstract_route[1:]):
+            if current in self._partners.get(previous, ()) or (previous == start and current in origins and current != start):
+                segment = [current]
+            elif previous in origins:
+                cluster, field, _, _ = origins[previous]
+                segment = list(reversed(self._descend(field, cluster, current)))[1:] + [current]
+            elif current == goal:
+                segment = self._descend(goal_field, goal_cluster, previous)
+            else:
+                cluster = self._cluster_of(previous)
+                segment = list(reversed(self._descend(self._cluster_edges(cluster)[1][previous], cluster, current)))[1:] + [current]
+            indices.extend(segment)
+
+        return path_from_indices(self.grid, indices)
@@ -0,0 +1,220 @@
+import heapq
+import numpy as np
+from errors import NoValidPathError
+from pathfinding import neighbour_offsets, path_from_indices
+
+INFINITY = float("inf")
+
+class DStarLite:
+    """An incremental planner that repairs its previous search when the grid changes, rather than starting again
+
+    The planner implements D* Lite. It searches backwards from a fixed goal, so the distance of every expanded node to the goal survives between calls. Whenever it is asked for a path it compares the grid's obstacle and padding layers against the ones it last planned on, and only re-expands the nodes whose distances are affected by the cells that changed. The rover may move freely between calls.
+
+    Attributes
+    ----------
+    grid : Grid
+        the grid on which paths are planned
+    goal : GridNode
+        the node every path leads to
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    expansions : int
+        the number of nodes expanded over the lifetime of the planner
+    peak_open_set : int
+        the largest number of nodes the open set has held over the lifetime of the planner
+
+    Methods
+    -------
+    quickest_path(start_node, verbose=False)
+        Finds the shortest path from a node to the goal, reusing as much of the previous search as possible
+    """
+
+    def __init__(self, grid, goal, include_diagonals=True):
+        """Initializes a new DStarLite instance.
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid on which paths are planned
+        goal : GridNode
+            the node every path leads to
+        include_diagonals : bool
+            whether or not the rover should be able to move diagonally between nodes
+        """
+        self.grid = grid
+        self.goal = goal
+        self.include_diagonals = include_diagonals
+        self.expansions = 0
+        self.peak_open_set = 0
+
+        self._offsets = neighbour_offsets(include_diagonals)
+        self._goal_index = grid.flat_index(*goal.coords)
+        self._blocked = grid.blocked_layer().ravel()
+        # Indexing bytes is much cheaper than indexing a numpy array one element at a time
+        self._blocked_bytes = self._blocked.tobytes()
+        self._g = {}
+        # Distances are counted in steps rather than meters, so that they are exact and keys that should tie always do
+        self._rhs = { self._goal_index: 0 }
+        self._open = {}
+        self._heap = []
+        self._key_modifier = 0
+        self._last_start = None
+        self._start = self._goal_index
+
+        self._push(self._goal_index)
+
+    def _heuristic(self, index1, index2):
+        """An admissible and consistent estimate of the distance between two nodes, in steps"""
+        row1, column1 = divmod(index1, self.grid.width)
+        row2, column2 = divmod(index2, self.grid.width)
+        if self.include_diagonals:
+            # Diagonal moves cost the same as straight ones, so the Chebyshev distance is exact on an empty grid
+            steps = max(abs(row1 - row2), abs(column1 - column2))
+        else:
+            steps = abs(row1 - row2) + abs(column1 - column2)
+        return steps
+
+    def _neighbours(self, index):
+        """Lists the flat indices of the nodes adjacent to a node"""
+        width = self.grid.width
+        row, column = divmod(index, width)
+        return [(row + row_offset) * width + column + column_offset for row_offset, column_offset in self._offsets
+                if 0 <= row + row_offset < self.grid.height and 0 <= column + column_offset < width]
+
+    def _key(self, index):
+        best = min(self._g.get(index, INFINITY), self._rhs.get(index, INFINITY))
+        return (best + self._heuristic(self._start, index) + self._key_modifier, best)
+
+    def _push(self, index):
+        key = self._key(index)
+        self._open[index] = key
+        heapq.heappush(self._heap, (key, index))
+
+    def _top(self):
+        """Discards stale heap entries and returns the smallest live one, if there is one"""
+        while self._heap:
+            key, index = self._heap[0]
+            if self._open.get(index) == key:
+                return key, index
+            heapq.heappop(self._heap)
+        return (INFINITY, INFINITY), None
+
+    def _update_vertex(self, index):
+        g = self._g
+        if index != self._goal_index:
+            # Every step costs the same, so the best successor is simply the free neighbour closest to the goal
+            blocked = self._blocked_bytes
+            width = self.grid.width
+            height = self.grid.height
+            row, column = divmod(index, width)
+            best = INFINITY
+            for row_offset, column_offset in self._offsets:
+                neighbour_row = row + row_offset
+                neighbour_column = column + column_offset
+                if 0 <= neighbour_row < height and 0 <= neighbour_column < width:
+                    neighbour = neighbour_row * width + neighbour_column
+                    if not blocked[neighbour]:
+                        distance = g.get(neighbour, INFINITY)
+                        if distance < best:
+                            best = distance
+            rhs = best + 1
+            self._rhs[index] = rhs
+        else:
+            rhs = 0
+        self._open.pop(index, None)
+        if g.get(index, INFINITY) != rhs:
+            self._push(index)
+
+    def _compute_shortest_path(self):
+        while True:
+            top_key, index = self._top()
+            start_g = self._g.get(self._start, INFINITY)
+            start_rhs = self._rhs.get(self._start, INFINITY)
+
+            if index is None or (top_key >= self._key(self._start) and start_rhs == start_g):
+                return
+
+            if len(self._open) > self.peak_open_set:
+                self.peak_open_set = len(self._open)
+            heapq.heappop(self._heap)
+            del self._open[index]
+            self.expansions += 1
+            new_key = self._key(index)
+
+            if top_key < new_key:
+                self._push(index)
+            elif self._g.get(index, INFINITY) > self._rhs[index]:
+                self._g[index] = self._rhs[index]
+                for neighbour in self._neighbours(index):
+                    self._update_vertex(neighbour)
+            else:
+                self._g[index] = INFINITY
+                self._update_vertex(index)
+                for neighbour in self._neighbours(index):
+                    self._update_vertex(neighbour)
+
+    def _apply_grid_changes(self):
+        """Finds the cells whose state has changed since the last search and repairs the distances that depend on them"""
+        blocked = self.grid.blocked_layer().ravel()
+        changed = np.flatnonzero(blocked != self._blocked)
+        self._blocked = blocked
+        self._blocked_bytes = blocked.tobytes()
+
+        # Only the cost of edges leading into a changed cell is affected, so only its neighbours need updating
+        for index in changed.tolist():
+            for neighbour in self._neighbours(index):
+                self._update_vertex(neighbour)
+
+    def quickest_path(self, start_node, verbose=False):
+        """Finds the shortest path from a node to the goal, reusing as much of the previous search as possible
+
+        Parameters
+        ----------
+        start_node : GridNode
+            the node from which the rover begins
+        verbose : bool
+            whether or not to log when a path is found
+
+        Returns
+        -------
+        list
+            A list of nodes that forms the optimal path, excluding `start_node`
+
+        Raises
+        ------
+        NoValidPathError
+            If no viable path is found
+        """
+        self._start = self.grid.flat_index(*start_node.coords)
+        if self._last_start is not None:
+            self._key_modifier += self._heuristic(self._last_start, self._start)
+        self._last_start = self._start
+
+        self._apply_grid_changes()
+        self._compute_shortest_path()
+
+        if self._rhs.get(self._start, INFINITY) == INFINITY:
+            print("Viable path was not found\n" + repr(self.grid))
+            raise NoValidPathError
+
+        if verbose:
+            print("Found a valid path")
+
+        # Follows the steepest descent of the distance to the goal
+        g = self._g
+        blocked = self._blocked_bytes
+        indices = [self._start]
+        index = self._start
+        while index != self._goal_index:
+            next_index = None
+            best = INFINITY
+            for neighbour in self._neighbours(index):
+                if not blocked[neighbour] and g.get(neighbour, INFINITY) < best:
+                    next_index = neighbour
+                    best = g[neighbour]
+            if next_index is None:
+                raise NoValidPathError
+            indices.append(next_index)
+            index = next_index
+
+        return path_from_indices(self.grid, indices)
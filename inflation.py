@@ -0,0 +1,62 @@
+import numpy as np
+
+class ObstacleInflator:
+    """Pads obstacles on a grid by stamping a precomputed circular kernel around a batch of obstacle nodes at once
+
+    Attributes
+    ----------
+    radius : int
+        the number of nodes of padding to place around each obstacle
+    row_offsets : nparray
+        the row offsets of every node covered by the kernel, relative to the obstacle
+    column_offsets : nparray
+        the column offsets of every node covered by the kernel, relative to the obstacle
+
+    Methods
+    -------
+    inflate(grid, rows, columns, keep_clear=None)
+        Marks the padding around the obstacles at the specified indices
+    """
+
+    def __init__(self, radius):
+        """Initializes a new ObstacleInflator instance.
+
+        Parameters
+        ----------
+        radius : int
+            the number of nodes of padding to place around each obstacle. Nodes whose centres lie within this many node spacings of an obstacle's centre are padded
+        """
+        self.radius = radius
+        row_offsets, column_offsets = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+        # The obstacle itself is not counted as its own padding
+        in_kernel = (row_offsets ** 2 + column_offsets ** 2 <= radius ** 2) & ((row_offsets != 0) | (column_offsets != 0))
+        self.row_offsets = row_offsets[in_kernel]
+        self.column_offsets = column_offsets[in_kernel]
+
+    def inflate(self, grid, rows, columns, keep_clear=None):
+        """Marks the padding around the obstacles at the specified indices
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid whose padding layer is updated
+        rows : array_like
+            the rows of the new obstacles
+        columns : array_like
+            the columns of the new obstacles
+        keep_clear : (int, int)
+            the row and column of a node, such as the one the rover is on, that must not become padding. A node that was already padding is left as it was
+        """
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1, 1)
+        columns = np.asarray(columns, dtype=np.intp).reshape(-1, 1)
+        padded_rows = (rows + self.row_offsets).ravel()
+        padded_columns = (columns + self.column_offsets).ravel()
+
+        # Ensures the padding is within the bounds of the grid
+        in_bounds = grid.contains(padded_rows, padded_columns)
+
+        if keep_clear is not None:
+            was_padding = grid.padding_layer[keep_clear]
+        grid.padding_layer[padded_rows[in_bounds], padded_columns[in_bounds]] = True
+        if keep_clear is not None:
+            grid.padding_layer[keep_clear] = was_padding
@@ -0,0 +1,136 @@
+from timeit import default_timer as timer
+
+# The phases of run_course's navigation loop, in the order they run. "build" only happens once, before the loop starts, and "display" only when the run is verbose
+PHASES = ["build", "sense", "mark", "plan", "smooth", "display", "move"]
+COUNTERS = ["iterations", "replans", "routes_kept", "backup_switches", "expansions", "peak_open_set", "obstacles_added", "obstacles_removed", "resets", "timeouts", "sweeps", "sweeps_skipped"]
+
+class RunStats:
+    """Records the time spent in each phase of every iteration of `run_course`, along with counts of the events that drive it
+
+    Pass an instance to `run_course` as `stats` and read it afterwards, or give it a callback to watch a run as it happens.
+
+    Attributes
+    ----------
+    iterations : list of dict
+        one dictionary per iteration, mapping the name of each phase that ran to the time it took in seconds. The first covers setup: building the grid and planning the first route
+    counters : dict
+        the number of "iterations" of the loop, "replans" after the first route, times the current route was kept because new obstacles missed it ("routes_kept"), "backup_switches" to an alternative route, nodes the planner "expansions", the largest open set the planner held ("peak_open_set"), "obstacles_added" to the grid and "obstacles_removed" from it by log-odds mapping, "resets" after no route could be found, "timeouts" when the planner's budget ran out before it found any route, LiDAR "sweeps" read and how many of them were skipped as unchanged ("sweeps_skipped"). The last two are only added at the end of the run
+    callback : function
+        a function called with this RunStats and the record of an iteration each time one finishes, or None
+
+    Methods
+    -------
+    begin_iteration()
+        Closes the current iteration, if any, and starts timing a new one
+    record(phase)
+        Adds the time since the previous phase ended to the current iteration
+    count(counter, amount=1)
+        Increases a counter
+    finish()
+        Closes the last iteration
+    phase_times(phase)
+        Lists the time a phase took in each iteration in which it ran
+    summary()
+        Describes the run in a table of phase timings followed by the counters
+    """
+
+    def __init__(self, callback=None):
+        """Initializes a new RunStats instance.
+
+        Parameters
+        ----------
+        callback : function
+            a function called with this RunStats and the record of an iteration each time one finishes
+        """
+        self.iterations = []
+        self.counters = dict((counter, 0) for counter in COUNTERS)
+        self.callback = callback
+        self._current = None
+        self._last_time = None
+
+    def begin_iteration(self):
+        """Closes the current iteration, if any, and starts timing a new one"""
+        self.finish()
+        self._current = {}
+        self._last_time = timer()
+
+    def record(self, phase):
+        """Adds the time since the previous phase ended, or since the iteration began, to the current iteration
+
+        Parameters
+        ----------
+        phase : str
+            the phase that just ended; one of `PHASES`
+        """
+        now = timer()
+        self._current[phase] = self._current.get(phase, 0.0) + now - self._last_time
+        self._last_time = now
+
+    def count(self, counter, amount=1):
+        """Increases a counter
+
+        Parameters
+        ----------
+        counter : str
+            the counter to increase; one of `COUNTERS`
+        amount : int
+            the amount by which to increase it
+        """
+        self.counters[counter] += amount
+
+    def finish(self):
+        """Closes the last iteration, passing it to the callback"""
+        if self._current is None:
+            return
+        record = self._current
+        self._current = None
+        self.iterations.append(record)
+        self.counters["iterations"] = len(self.iterations) - 1
+        if self.callback is not None:
+            self.callback(self, record)
+
+    def phase_times(self, phase):
+        """Lists the time a phase took in each iteration in which it ran
+
+        Parameters
+        ----------
+        phase : str
+            one of `PHASES`
+
+        Returns
+        -------
+        A list of times in seconds
+        """
+        return [record[phase] for record in self.iterations if phase in record]
+
+    def summary(self):
+        """Describes the run in a table of phase timings followed by the counters
+
+        Returns
+        -------
+        A multi-line string
+        """
+        lines = ["{:>8} {:>6} {:>10} {:>10} {:>10}".format("phase", "runs", "total s", "mean ms", "max ms")]
+        for phase in PHASES:
+            times = self.phase_times(phase)
+            if times:
+                lines.append("{:>8} {:>6} {:>10.3f} {:>10.2f} {:>10.2f}".format(phase, len(times), sum(times), 1000 * sum(times) / len(times), 1000 * max(times)))
+        lines.append(", ".join("{} {}".format(counter, self.counters[counter]) for counter in COUNTERS))
+        return "\n".join(lines)
+
+class NullStats:
+    """Stands in for RunStats when a run is not being instrumented, so that recording costs no more than an empty method call"""
+
+    counters = None
+
+    def begin_iteration(self):
+        pass
+
+    def record(self, phase):
+        pass
+
+    def count(self, counter, amount=1):
+        pass
+
+    def finish(self):
+        pass
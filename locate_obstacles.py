@@ -1,4 +1,39 @@
-from math import isinf, pi, sin, cos, radians
+from math import pi, radians
+import numpy as np
+
+def locate_obstacles_array(rover, sweep_angle=pi/2, sensors_to_ignore=[7]):
+    """Identifies obstacles and calculates their positions for a whole LiDAR sweep at once
+
+    Parameters
+    ---------
+    rover : Rover
+        the Gazebo rover on which the LiDAR sensors are mounted
+    sweep_angle : float
+        the angle through which the LiDAR rays sweep in radians
+    sensors_to_ignore : list of ints
+        the indices of LiDAR sensors to ignore, if they are broken or otherwise undesirable
+
+    Returns an (M, 2) numpy array whose rows are the (x, y) positions of obstacles, in the order of the sensors that detected them
+    """
+    return _obstacle_positions(rover.x, rover.y, rover.heading, np.asarray(rover.laser_distances, dtype=float), sweep_angle, sensors_to_ignore)
+
+def _obstacle_positions(x, y, heading, distances, sweep_angle, sensors_to_ignore):
+    """Calculates the positions of the obstacles in a LiDAR sweep taken from the given pose"""
+    num_lidar_sensors = len(distances)
+
+    detected = ~np.isinf(distances)
+    ignored = [i for i in sensors_to_ignore if 0 <= i < num_lidar_sensors]
+    detected[ignored] = False
+
+    # The angle of each lidar sensor with respect to the rover
+    sensor_indices = np.flatnonzero(detected)
+    lidar_angles = sweep_angle * (-0.5 + sensor_indices / float(max(num_lidar_sensors - 1, 1)))
+    obstacle_headings = radians(heading) + lidar_angles
+
+    obstacles = np.empty((len(sensor_indices), 2))
+    obstacles[:, 0] = x + distances[sensor_indices] * np.cos(obstacle_headings)
+    obstacles[:, 1] = y + distances[sensor_indices] * np.sin(obstacle_headings)
+    return obstacles
 
 def locate_obstacles(rover, sweep_angle=pi/2, sensors_to_ignore=[7]):
     """Identifies obstacles and calculates their positions
@@ -14,25 +49,126 @@ def locate_obstacles(rover, sweep_angle=pi/2, sensors_to_ignore=[7]):
 
     Returns a list of (x, y) tuples representing the positions of obstacles
     """
-    num_lidar_sensors = len(rover.laser_distances)
-    obstacles = []
+    return [tuple(obstacle) for obstacle in locate_obstacles_array(rover, sweep_angle=sweep_angle, sensors_to_ignore=sensors_to_ignore).tolist()]
+
+class ScanFilter:
+    """Reduces LiDAR sweeps to the grid cells of obstacles that are not yet marked, without processing sweeps that repeat one already seen
+
+    A rover's control loop usually spins faster than its LiDAR updates, and a stationary rover sees the same obstacles over and over, so most sweeps add nothing to the grid. Each sweep is first compared with the last one that turned out to add nothing. If the rover's pose and every range are unchanged within tolerance, the sweep is skipped without locating its obstacles at all. Otherwise its readings are quantized to cells, and only the first reading to land on each cell that is not already an obstacle is kept.
+
+    A sweep is only remembered once it has added nothing, which means every obstacle in it is already marked. Any sweep that is later skipped for matching it therefore has nothing to add either, until the grid's obstacles are cleared and `forget` is called.
+
+    Attributes
+    ----------
+    grid : Grid or ChunkedGrid
+        the grid whose obstacle layer the readings are checked against
+    sweep_angle : float
+        the angle through which the LiDAR rays sweep in radians
+    sensors_to_ignore : list of ints
+        the indices of LiDAR sensors to ignore
+    position_tolerance : float
+        the distance in meters the rover may move before a sweep counts as changed
+    heading_tolerance : float
+        the angle in degrees the rover may turn before a sweep counts as changed
+    range_tolerance : float
+        the distance in meters any range may change by before a sweep counts as changed
+    sweeps : int
+        the number of sweeps passed to `new_cells`
+    skipped_sweeps : int
+        the number of those that were skipped as unchanged
+
+    Methods
+    -------
+    new_cells(rover)
+        Finds the cells of the obstacles in the rover's current sweep that are not yet marked on the grid
+    forget()
+        Forgets the remembered sweep, so that the next one is processed in full
+    """
+
+    def __init__(self, grid, sweep_angle=pi/2, sensors_to_ignore=[7], position_tolerance=0.02, heading_tolerance=0.2, range_tolerance=0.02):
+        """Initializes a new ScanFilter instance.
+
+        Parameters
+        ----------
+        grid : Grid or ChunkedGrid
+            the grid whose obstacle layer the readings are checked against
+        sweep_angle : float
+            the angle through which the LiDAR rays sweep in radians
+        sensors_to_ignore : list of ints
+            the indices of LiDAR sensors to ignore
+        position_tolerance : float
+            the distance in meters the rover may move before a sweep counts as changed
+        heading_tolerance : float
+            the angle in degrees the rover may turn before a sweep counts as changed
+        range_tolerance : float
+            the distance in meters any range may change by before a sweep counts as changed
+        """
+        self.grid = grid
+        self.sweep_angle = sweep_angle
+        self.sensors_to_ignore = sensors_to_ignore
+        self.position_tolerance = position_tolerance
+        self.heading_tolerance = heading_tolerance
+        self.range_tolerance = range_tolerance
+        self.sweeps = 0
+        self.skipped_sweeps = 0
+        self._seen_pose = None
+        self._seen_distances = None
+
+    def _unchanged(self, x, y, heading, distances):
+        """Determines whether a sweep matches the remembered one within tolerance"""
+        if self._seen_pose is None or len(distances) != len(self._seen_distances):
+            return False
+        seen_x, seen_y, seen_heading = self._seen_pose
+        if (x - seen_x) ** 2 + (y - seen_y) ** 2 > self.position_tolerance ** 2:
+            return False
+        if abs((heading - seen_heading + 180) % 360 - 180) > self.heading_tolerance:
+            return False
+        # Rays that hit nothing compare equal only to rays that still hit nothing, and the others must have barely moved
+        with np.errstate(invalid="ignore"):
+            return bool(np.all((distances == self._seen_distances) | (np.abs(distances - self._seen_distances) <= self.range_tolerance)))
 
-    for i in range(num_lidar_sensors):
+    def _readings(self, x, y, heading, distances):
+        """Locates the obstacles in a sweep taken from the given pose"""
+        return _obstacle_positions(x, y, heading, distances, self.sweep_angle, self.sensors_to_ignore)
 
-        if i in sensors_to_ignore:
-            continue
+    def _new_obstacles(self, rover):
+        """Finds the readings in the rover's current sweep that land on cells not yet marked, returning their positions along with the rows and columns of the new cells"""
+        self.sweeps += 1
+        x, y, heading = rover.x, rover.y, rover.heading
+        distances = np.asarray(rover.laser_distances, dtype=float)
+        if self._unchanged(x, y, heading, distances):
+            self.skipped_sweeps += 1
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
 
-        distance = rover.laser_distances[i]
+        points = self._readings(x, y, heading, distances)
+        rows, columns = self.grid.nearest_indices(points)
+        unmarked = ~self.grid.obstacle_layer[rows, columns]
+        points, rows, columns = points[unmarked], rows[unmarked], columns[unmarked]
+        if len(rows) == 0:
+            self._seen_pose = (x, y, heading)
+            self._seen_distances = distances
+            return points, rows, columns
+        # Keeps only the first reading to land on each cell not already marked as an obstacle
+        _, first_readings = np.unique(np.column_stack((rows, columns)), axis=0, return_index=True)
+        first_readings.sort()
+        return points, rows[first_readings], columns[first_readings]
 
-        if not isinf(distance):
-            # The angle of the lidar sensor with respect to the rover
-            # Casting i to a float is necessary in Python 2.x
-            lidar_angle = sweep_angle * (-0.5 + float(i) / (num_lidar_sensors - 1))
-            obstacle_heading = radians(rover.heading) + lidar_angle
+    def new_cells(self, rover):
+        """Finds the cells of the obstacles in the rover's current sweep that are not yet marked on the grid
 
-            obstacle_x = rover.x + distance * cos(obstacle_heading)
-            obstacle_y = rover.y + distance * sin(obstacle_heading)
+        Parameters
+        ----------
+        rover : Rover
+            the rover on which the LiDAR sensors are mounted
 
-            obstacles.append((obstacle_x, obstacle_y))
+        Returns
+        -------
+        A tuple of two integer arrays holding the rows and columns of the new cells, in the order of the sensors that detected them, which are empty if the sweep adds nothing
+        """
+        _, rows, columns = self._new_obstacles(rover)
+        return rows, columns
 
-    return obstacles
\ No newline at end of file
+    def forget(self):
+        """Forgets the remembered sweep, so that the next one is processed in full. Call this whenever obstacles are removed from the grid"""
+        self._seen_pose = None
+        self._seen_distances = None
@@ -0,0 +1,159 @@
+import numpy as np
+from grid import Grid
+
+MAGIC = b"ROVERMAP"
+VERSION = 1
+# The header is a single record, so it is read and written in one operation like the layers after it
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("height", "<u4"), ("width", "<u4"), ("row_bytes", "<u4"),
+                   ("start", "<f8", (2,)), ("end", "<f8", (2,)), ("node_spacing", "<f8")])
+# The order in which the layers follow the header
+LAYERS = ["obstacle_layer", "padding_layer"]
+
+class MapFile:
+    """An occupancy map kept on disk, so that obstacles seen on one run of a course are known from the start of the next
+
+    The file holds a fixed-size header with the grid's corners and node spacing, followed by the obstacle and padding layers with every row packed into bits. The layers are opened with `np.memmap`, so loading a map unpacks them straight into a Grid with a single array operation per layer, and recording newly seen obstacles only writes the rows they fall in.
+
+    Attributes
+    ----------
+    path : str
+        the location of the file
+    start : (float, float)
+        the origin of the grid the file stores
+    end : (float, float)
+        the corner of the grid opposite `start`
+    node_spacing : float
+        the length of each grid square in meters
+    width : int
+        the number of columns in the grid
+    height : int
+        the number of rows in the grid
+
+    Methods
+    -------
+    @staticmethod
+    create(path, grid)
+        Writes a grid to a new map file
+    load()
+        Creates a Grid holding the obstacles and padding stored in the file
+    save(grid)
+        Writes every row of a grid's obstacle and padding layers to the file
+    record(grid, rows, margin=0)
+        Writes the rows of a grid's obstacle and padding layers that contain newly marked nodes to the file
+    flush()
+        Ensures every change recorded so far has reached the disk
+    """
+
+    def __init__(self, path):
+        """Opens an existing map file for reading and recording.
+
+        Parameters
+        ----------
+        path : str
+            the location of the file
+
+        Raises
+        ------
+        ValueError
+            If the file is not a map file, or was written by an incompatible version
+        """
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if len(header) != 1 or header["magic"][0] != MAGIC:
+            raise ValueError("{} is not a map file".format(path))
+        if header["version"][0] != VERSION:
+            raise ValueError("{} has map file version {}; expected {}".format(path, header["version"][0], VERSION))
+
+        header = header[0]
+        self.start = tuple(float(value) for value in header["start"])
+        self.end = tuple(float(value) for value in header["end"])
+        self.node_spacing = float(header["node_spacing"])
+        self.height = int(header["height"])
+        self.width = int(header["width"])
+        self._layers = np.memmap(path, dtype=np.uint8, mode="r+", offset=HEADER.itemsize, shape=(len(LAYERS), self.height, int(header["row_bytes"])))
+
+    @staticmethod
+    def create(path, grid):
+        """Writes a grid to a new map file, replacing any file already at `path`
+
+        Parameters
+        ----------
+        path : str
+            the location of the file
+        grid : Grid
+            the grid whose dimensions and obstacles are stored
+
+        Returns
+        -------
+        A MapFile open on the new file
+        """
+        if not isinstance(grid, Grid):
+            raise ValueError("Map files can only store a fixed-size Grid")
+        header = np.zeros(1, dtype=HEADER)
+        header["magic"] = MAGIC
+        header["version"] = VERSION
+        header["height"] = grid.height
+        header["width"] = grid.width
+        header["row_bytes"] = (grid.width + 7) // 8
+        header["start"] = grid.start
+        header["end"] = grid.end
+        header["node_spacing"] = grid.node_spacing
+
+        with open(path, "wb") as map_file:
+            header.tofile(map_file)
+            np.packbits(np.stack([getattr(grid, layer) for layer in LAYERS]), axis=2).tofile(map_file)
+        return MapFile(path)
+
+    def load(self):
+        """Creates a Grid holding the obstacles and padding stored in the file
+
+        Returns
+        -------
+        A new instance of Grid
+        """
+        grid = Grid(self.start, self.end, node_spacing=self.node_spacing)
+        if (grid.height, grid.width) != (self.height, self.width):
+            raise ValueError("{} describes a {}x{} grid, but its corners give {}x{}".format(self.path, self.height, self.width, grid.height, grid.width))
+        for index, layer in enumerate(LAYERS):
+            getattr(grid, layer)[:] = np.unpackbits(self._layers[index], axis=1, count=self.width).view(bool)
+        return grid
+
+    def _check(self, grid):
+        if (grid.height, grid.width) != (self.height, self.width):
+            raise ValueError("The grid is {}x{}, but {} stores a {}x{} grid".format(grid.height, grid.width, self.path, self.height, self.width))
+
+    def save(self, grid):
+        """Writes every row of a grid's obstacle and padding layers to the file
+
+        Parameters
+        ----------
+        grid : Grid
+            a grid with the dimensions stored in the file
+        """
+        self._check(grid)
+        for index, layer in enumerate(LAYERS):
+            self._layers[index] = np.packbits(getattr(grid, layer), axis=1)
+
+    def record(self, grid, rows, margin=0):
+        """Writes the rows of a grid's obstacle and padding layers that contain newly marked nodes to the file
+
+        Parameters
+        ----------
+        grid : Grid
+            a grid with the dimensions stored in the file
+        rows : array_like
+            the rows of the nodes that have been marked
+        margin : int
+            the number of rows on either side of each marked row that are also written, such as the radius of the padding placed around new obstacles
+        """
+        self._check(grid)
+        rows = np.unique(np.asarray(rows, dtype=np.intp))
+        if margin > 0:
+            rows = np.unique((rows[:, np.newaxis] + np.arange(-margin, margin + 1)).ravel())
+        rows = rows[(rows >= 0) & (rows < self.height)]
+        for index, layer in enumerate(LAYERS):
+            self._layers[index, rows] = np.packbits(getattr(grid, layer)[rows], axis=1)
+
+    def flush(self):
+        """Ensures every change recorded so far has reached the disk"""
+        self._layers.flush()
@@ -0,0 +1,160 @@
+import numpy as np
+from grid import Grid
+from chunked_grid import ChunkedGrid
+from run_course import run_course, MAP_TYPES
+from wavefront_planner import distance_fields, UNREACHABLE
+
+def path_cost_matrix(grid, points, include_diagonals=True):
+    """Estimates the length of the route between every pair of points, around the obstacles recorded on the grid so far
+
+    A wavefront is grown from each point in turn, only until it has reached all of the others, and only its distances to the points are kept. Memory therefore stays at a few layers of the grid however many points there are, and the whole matrix costs about as much as one breadth-first search per point. Every step between nodes is counted as `node_spacing`, and each estimate is raised to at least the straight-line distance between its points, so diagonals are not undercounted on open ground.
+
+    Parameters
+    ----------
+    grid : Grid or ChunkedGrid
+        the grid whose obstacles the routes must avoid. The points must lie on it, and a ChunkedGrid grows to cover them
+    points : list of (float, float)
+        the physical locations between which the routes are estimated
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+
+    Returns
+    -------
+    A symmetric (len(points), len(points)) array of estimated route lengths in meters, which is infinite between points that the known obstacles separate
+    """
+    # Every node is found before the layer is read, so that a ChunkedGrid's window already covers all of them
+    nodes = [grid.nearest_node(point) for point in points]
+    sources = [divmod(grid.flat_index(*node.coords), grid.width) for node in nodes]
+    rows, columns = (np.array(indices, dtype=np.intp) for indices in zip(*sources))
+    blocked = grid.blocked_layer()
+    steps = np.empty((len(sources), len(sources)), dtype=np.int64)
+    for i, source in enumerate(sources):
+        # Each field is dropped as soon as its distances to the points are read, so only one is ever held
+        steps[i] = distance_fields(blocked, [source], include_diagonals, targets=sources)[0, rows, columns]
+
+    costs = steps * float(grid.node_spacing)
+    costs[steps >= UNREACHABLE] = np.inf
+    points = np.asarray(points, dtype=float)
+    straight = np.hypot(points[:, np.newaxis, 0] - points[np.newaxis, :, 0], points[:, np.newaxis, 1] - points[np.newaxis, :, 1])
+    costs = np.maximum(costs, straight)
+    # A point inside padding can be left but not reached, so the cheaper direction is taken for both
+    return np.minimum(costs, costs.T)
+
+def plan_visit_order(costs, start=0, end=None):
+    """Orders the points of a cost matrix into a short tour, by visiting the nearest unvisited point each time and then improving the result with 2-opt
+
+    Each 2-opt pass compares every possible reversal of a stretch of the tour at once with array operations, and applies the one that shortens the tour the most, until none does.
+
+    Parameters
+    ----------
+    costs : array_like
+        a symmetric (N, N) array of the cost of travelling between each pair of points. Infinite costs are allowed
+    start : int
+        the index of the point at which the tour begins
+    end : int
+        the index of the point at which the tour must finish, which may be `start` for a round trip, or None to let it finish wherever is cheapest
+
+    Returns
+    -------
+    A list of the indices of every point other than `start` and `end`, in the order they should be visited
+    """
+    costs = np.array(costs, dtype=float)
+    count = len(costs)
+    finite = np.isfinite(costs)
+    # Infinite costs are replaced by one larger than any tour made of finite ones, so that the arithmetic still works
+    costs[~finite] = 1 + count * (costs[finite].max() if finite.any() else 0.0)
+
+    if end is None:
+        # A final stop that costs nothing to reach from anywhere turns an open tour into a closed one
+        costs = np.pad(costs, ((0, 1), (0, 1)), mode="constant")
+        end = count
+
+    tour = [start]
+    unvisited = [index for index in range(count) if index not in (start, end)]
+    while unvisited:
+        nearest = unvisited[int(np.argmin(costs[tour[-1], unvisited]))]
+        tour.append(nearest)
+        unvisited.remove(nearest)
+    tour.append(end)
+
+    while len(tour) > 3:
+        stops = np.array(tour)
+        before, inner, after = stops[:-2], stops[1:-1], stops[2:]
+        # Reversing the stretch from inner[i] to inner[j] replaces the legs before[i]-inner[i] and inner[j]-after[j]
+        savings = costs[before[:, np.newaxis], inner[np.newaxis, :]] + costs[inner[:, np.newaxis], after[np.newaxis, :]] \
+            - costs[before, inner][:, np.newaxis] - costs[inner, after][np.newaxis, :]
+        savings[np.tril_indices(len(inner))] = 0
+        i, j = np.unravel_index(np.argmin(savings), savings.shape)
+        if savings[i, j] > -1e-9:
+            break
+        tour[i + 1:j + 2] = tour[j + 1:i:-1]
+
+    return tour[1:-1]
+
+def run_mission(rover, waypoints, optimize_order=True, return_to_start=False, grid=None, node_spacing=0.4, include_diagonals=True, verbose=False, map_type="chunked", buffer_distance=5.0, stats=None, **course_options):
+    """Navigates the rover to each of a list of waypoints, keeping a single map of the obstacles for the whole mission
+
+    Every leg is driven by `run_course` on the same grid, so obstacles seen on earlier legs are avoided from the start of later ones instead of being found again. When `optimize_order` is set, the remaining waypoints are reordered before every leg with `plan_visit_order`, using route lengths estimated by `path_cost_matrix` over everything mapped so far.
+
+    Parameters
+    ----------
+    rover : Rover
+        the rover to be navigated through the obstacles
+    waypoints : list of (float, float)
+        the points the rover should visit
+    optimize_order : bool
+        whether or not to choose the order in which the waypoints are visited. Otherwise they are visited in the order given
+    return_to_start : bool
+        whether or not the rover should return to where it started once every waypoint has been visited
+    grid : Grid or ChunkedGrid
+        the map to navigate on, such as one kept from an earlier mission. If None, a new one is created according to `map_type`
+    node_spacing : float
+        the distance between nodes on a new grid
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    verbose : bool
+        whether or not to include verbose logging
+    map_type : str
+        the kind of map created if `grid` is None. "chunked" uses a ChunkedGrid that grows wherever the rover goes, while "fixed" uses a Grid covering every waypoint plus `buffer_distance`, which the "dstar_lite", "hpa" and "wavefront" planners require
+    buffer_distance : float
+        the amount of distance in each direction by which a "fixed" grid extends beyond the waypoints
+    stats : RunStats
+        if given, accumulates the timings and counters of every leg
+    course_options
+        any further keyword arguments of `run_course`, such as `planner` or `obstacle_padding`, which apply to every leg
+
+    Returns
+    -------
+    A list of the waypoints in the order they were visited
+    """
+    start_point = (rover.x, rover.y)
+    if grid is None:
+        if map_type == "fixed":
+            corners = np.array(list(waypoints) + [start_point], dtype=float)
+            grid = Grid.oversized_grid(tuple(corners.min(axis=0)), tuple(corners.max(axis=0)), node_spacing=node_spacing, buffer_distance=buffer_distance)
+        elif map_type == "chunked":
+            grid = ChunkedGrid(start_point, node_spacing=node_spacing)
+        else:
+            raise ValueError("Unknown map type {!r}; expected one of {}".format(map_type, MAP_TYPES))
+
+    remaining = list(waypoints)
+    visited = []
+    while remaining:
+        if optimize_order and len(remaining) > 1:
+            points = [(rover.x, rover.y)] + remaining + ([start_point] if return_to_start else [])
+            costs = path_cost_matrix(grid, points, include_diagonals=include_diagonals)
+            order = plan_visit_order(costs, end=len(remaining) + 1 if return_to_start else None)
+            remaining = [remaining[index - 1] for index in order]
+
+        waypoint = remaining.pop(0)
+        if verbose:
+            print("Driving to waypoint {} of {} at {}".format(len(visited) + 1, len(visited) + len(remaining) + 1, waypoint))
+        run_course(rover, waypoint, include_diagonals=include_diagonals, verbose=verbose, grid=grid, stats=stats, **course_options)
+        visited.append(waypoint)
+
+    if return_to_start:
+        if verbose:
+            print("Returning to the start at {}".format(start_point))
+        run_course(rover, start_point, include_diagonals=include_diagonals, verbose=verbose, grid=grid, stats=stats, **course_options)
+
+    return visited
@@ -1,8 +1,11 @@
-from math import atan2, radians, sqrt
+from math import atan2, cos, pi, radians, sin, sqrt
+from time import sleep
+from timeit import default_timer as timer
 from errors import ObseleteGridError
-from locate_obstacles import locate_obstacles
+from locate_obstacles import locate_obstacles_array
+from pathfinding import line_of_sight
 
-def move_rover(rover, x, y, grid):
+def move_rover(rover, x, y, grid, scan_filter=None, obstacle_index=None, clearance=0.0):
     """Moves a rover from its current location to a specified destination
 
     Parameters
@@ -13,6 +16,14 @@ def move_rover(rover, x, y, grid):
         The x coordinate of the desired destination
     y : float
         The y coordinate of the desired destination
+    grid : Grid or ChunkedGrid
+        The grid whose obstacle layer the LiDAR readings are checked against
+    scan_filter : ScanFilter
+        If given, finds the new obstacles in each sweep, so that sweeps that repeat one already seen are not checked again
+    obstacle_index : ObstacleIndex
+        If given along with a `scan_filter` that marks the obstacles it finds, such as a ClearanceFilter, new obstacles only stop the rover if they come within `clearance` of the line to the destination
+    clearance : float
+        The distance in meters the rest of the route must keep from the obstacles in `obstacle_index`
 
     Raises
     ------
@@ -25,12 +36,9 @@ def move_rover(rover, x, y, grid):
     while abs(radians(rover.heading) - angle_to_travel) > angle_tolerance:
         # Speed is proportional to how much angular distance there is still to travel, with a minimum speed
         rover.send_command(0, angle_to_travel - radians(rover.heading))
-        
-        for obstacle_pos in locate_obstacles(rover):
-            obstacle_node = grid.nearest_node(obstacle_pos)
-            
-            if not obstacle_node.is_obstacle:
-                raise ObseleteGridError
+
+        if _found_new_obstacles(rover, grid, [7], scan_filter, [(x, y)], obstacle_index, clearance):
+            raise ObseleteGridError
 
     rover.send_command(0, 0)
 
@@ -59,3 +67,316 @@ def move_rover(rover, x, y, grid):
         rover.send_command(speed, 0)   
 
     rover.send_command(0, 0)
+
+def _route_clear(grid, x, y, waypoints, obstacle_index, clearance):
+    """Checks whether the rest of a route stays out of padded nodes and keeps `clearance` from every obstacle in the index, or, where the rover is already closer than that, gets no closer"""
+    points = [(x, y)] + list(waypoints)
+    nodes = [grid.nearest_node(point).coords for point in points]
+    if not all(line_of_sight(grid, start, end) for start, end in zip(nodes, nodes[1:])):
+        return False
+    required = min(clearance, obstacle_index.nearest_distance((x, y), limit=clearance))
+    return all(obstacle_index.segment_distance(start, end, required) >= required for start, end in zip(points, points[1:]))
+
+def _found_new_obstacles(rover, grid, sensors_to_ignore, scan_filter, waypoints=None, obstacle_index=None, clearance=0.0):
+    """Determines whether the rover's LiDAR can see any obstacle that is not marked on the grid, or, if `obstacle_index` is given, any that leaves the rest of the route too close to an obstacle"""
+    if scan_filter is not None:
+        found = len(scan_filter.new_cells(rover)[0]) != 0
+        if found and obstacle_index is not None:
+            # The scan filter has already marked the new obstacles, so the rover only has to stop if they are in its way
+            return not _route_clear(grid, rover.x, rover.y, waypoints, obstacle_index, clearance)
+        return found
+    rows, columns = grid.nearest_indices(locate_obstacles_array(rover, sensors_to_ignore=sensors_to_ignore))
+    return not grid.obstacle_layer[rows, columns].all()
+
+def _wrap_angle(angle):
+    """Wraps an angle in radians into the range [-pi, pi]"""
+    return atan2(sin(angle), cos(angle))
+
+def _lookahead_point(x, y, points, segment, lookahead_distance):
+    """Finds the point furthest along a polyline that lies on a circle around the rover
+
+    Parameters
+    ----------
+    x : float
+        The x coordinate of the rover
+    y : float
+        The y coordinate of the rover
+    points : list of (float, float)
+        The vertices of the polyline
+    segment : int
+        The index of the segment the rover was last following. Segments before it are never returned
+    lookahead_distance : float
+        The radius of the circle
+
+    Returns
+    -------
+    The index of the segment the point lies on, and the (x, y) coordinates of the point. If the end of the polyline lies inside the circle and no corner outside the circle comes before it, the end itself is returned. If the circle does not reach the polyline, the end of the current segment is returned instead
+    """
+    found = None
+    for i in range(segment, len(points) - 1):
+        (x1, y1), (x2, y2) = points[i], points[i + 1]
+        dx, dy = x2 - x1, y2 - y1
+        fx, fy = x1 - x, y1 - y
+        # Solves |p1 + t * (p2 - p1) - rover| = lookahead_distance for the larger t
+        a = dx * dx + dy * dy
+        b = 2 * (fx * dx + fy * dy)
+        c = fx * fx + fy * fy - lookahead_distance ** 2
+        discriminant = b * b - 4 * a * c
+        if a > 0 and discriminant >= 0:
+            t = (-b + sqrt(discriminant)) / (2 * a)
+            if 0 <= t <= 1:
+                found = (i, (x1 + t * dx, y1 + t * dy))
+            elif t > 1 and i == len(points) - 2:
+                # The end of the path lies inside the circle, and every corner before it has been reached, so the end is the furthest point there is
+                found = (i, points[-1])
+        # Stops at the first later segment that begins outside the circle, so the rover never skips ahead to a distant part of the path that happens to pass nearby
+        if i > segment and c > 0:
+            break
+
+    if found is None:
+        return segment, points[segment + 1]
+    return found
+
+class PurePursuit:
+    """A pure pursuit controller, which turns the rover's position along a path into the speeds that keep it on the path
+
+    Each time it is asked for a command, the controller picks the point on the path `lookahead_distance` ahead of the rover and returns the linear and angular speeds that steer it along an arc through that point, so corners are taken as curves rather than with a stop and a turn on the spot. The rover only turns on the spot when the path leads behind it.
+
+    Attributes
+    ----------
+    points : list of (float, float)
+        The (x, y) coordinates of the path's vertices, beginning with the point the rover set off from
+    lookahead_distance : float
+        The distance ahead of the rover, along the path, of the point it steers towards. Shorter distances follow corners more closely, longer ones drive more smoothly
+    max_speed : float
+        The highest linear speed commanded
+    speed_factor : float
+        The linear speed per meter of path remaining to the last waypoint, which slows the rover as it arrives
+    dist_tolerance : float
+        The distance from the last waypoint at which the rover is considered to have arrived
+
+    remaining_waypoints : list of (float, float)
+        The waypoints the rover has not yet passed, ending with the last one
+
+    Methods
+    -------
+    command(x, y, heading)
+        Calculates the speeds to send to a rover at a given position, or None once it has arrived
+    distance_remaining(x, y)
+        Measures how far a rover at a given position still has to drive along the path
+    """
+
+    def __init__(self, start, waypoints, lookahead_distance=0.6, max_speed=0.25, speed_factor=2, dist_tolerance=1e-1):
+        """Initializes a new PurePursuit instance.
+
+        Parameters
+        ----------
+        start : (float, float)
+            The (x, y) coordinates from which the rover sets off
+        waypoints : list of (float, float)
+            The (x, y) coordinates of the points the rover should pass through, in order
+        lookahead_distance : float
+            The distance ahead of the rover, along the path, of the point it steers towards
+        max_speed : float
+            The highest linear speed commanded
+        speed_factor : float
+            The linear speed per meter of path remaining to the last waypoint
+        dist_tolerance : float
+            The distance from the last waypoint at which the rover is considered to have arrived
+        """
+        self.points = [tuple(start)] + [tuple(waypoint) for waypoint in waypoints]
+        self.lookahead_distance = lookahead_distance
+        self.max_speed = max_speed
+        self.speed_factor = speed_factor
+        self.dist_tolerance = dist_tolerance
+        self._segment = 0
+
+    @property
+    def remaining_waypoints(self):
+        return self.points[self._segment + 1:]
+
+    def distance_remaining(self, x, y):
+        """Measures how far a rover at a given position still has to drive along the path
+
+        Parameters
+        ----------
+        x : float
+            The x coordinate of the rover
+        y : float
+            The y coordinate of the rover
+
+        Returns
+        -------
+        float
+            The distance from the rover to the next waypoint it has not passed, plus the length of the path beyond it
+        """
+        points = [(x, y)] + self.remaining_waypoints
+        return sum(sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2) for (x1, y1), (x2, y2) in zip(points, points[1:]))
+
+    def command(self, x, y, heading):
+        """Calculates the speeds to send to a rover at a given position
+
+        Parameters
+        ----------
+        x : float
+            The x coordinate of the rover
+        y : float
+            The y coordinate of the rover
+        heading : float
+            The direction the rover is facing, in degrees
+
+        Returns
+        -------
+        A (linear speed, angular speed) tuple, or None if the rover has arrived at the last waypoint
+        """
+        if len(self.points) == 1:
+            return None
+        self._segment, (target_x, target_y) = _lookahead_point(x, y, self.points, self._segment, self.lookahead_distance)
+        end_x, end_y = self.points[-1]
+        # Only a rover on the last segment can have arrived, so a path that passes close to its own end on the way is still followed
+        if self._segment == len(self.points) - 2 and sqrt((end_x - x) ** 2 + (end_y - y) ** 2) <= self.dist_tolerance:
+            return None
+
+        distance_to_target = sqrt((target_x - x) ** 2 + (target_y - y) ** 2)
+        distance_remaining = self.distance_remaining(x, y)
+
+        heading_error = _wrap_angle(atan2(target_y - y, target_x - x) - radians(heading))
+        if abs(heading_error) > pi / 2:
+            # The target is behind the rover, so it turns on the spot as move_rover does
+            return (0, heading_error)
+        # The arc through the target point has a curvature of 2 sin(error) / distance
+        linear_speed = min(self.speed_factor * distance_remaining, self.max_speed) * cos(heading_error)
+        return (linear_speed, 2 * linear_speed * sin(heading_error) / max(distance_to_target, 1e-6))
+
+class RateLimiter:
+    """Paces a control loop at a fixed rate, and tells it on which of its ticks to look for obstacles
+
+    Each call to `wait` sleeps until the next tick is due. A tick that runs late is not made up for by rushing the ones after it; the schedule simply starts again from the late tick.
+
+    Attributes
+    ----------
+    control_rate : float
+        the number of ticks per second
+    realtime : bool
+        whether or not `wait` sleeps. A simulated rover that advances its own clock with every command can run without sleeping
+    tick : int
+        the number of ticks that have passed
+
+    Methods
+    -------
+    obstacle_check_due()
+        Determines whether the loop should look for obstacles on the current tick
+    wait()
+        Ends the current tick, sleeping until the next one is due
+    """
+
+    def __init__(self, control_rate=20.0, obstacle_check_rate=5.0, realtime=True):
+        """Initializes a new RateLimiter instance, whose first tick begins immediately.
+
+        Parameters
+        ----------
+        control_rate : float
+            the number of ticks per second
+        obstacle_check_rate : float
+            the number of times per second the loop should look for obstacles. It is rounded to a whole number of ticks, and obstacles are looked for on at least every tick
+        realtime : bool
+            whether or not `wait` sleeps
+        """
+        self.control_rate = control_rate
+        self.realtime = realtime
+        self.tick = 0
+        self._period = 1.0 / control_rate
+        self._ticks_per_check = max(int(round(float(control_rate) / obstacle_check_rate)), 1)
+        self._next_tick = timer()
+
+    def obstacle_check_due(self):
+        """Determines whether the loop should look for obstacles on the current tick
+
+        Returns
+        -------
+        bool
+            True on the first tick and on every tick one obstacle check period after it
+        """
+        return self.tick % self._ticks_per_check == 0
+
+    def wait(self):
+        """Ends the current tick, sleeping until the next one is due if the limiter runs in real time"""
+        self.tick += 1
+        if not self.realtime:
+            return
+        self._next_tick += self._period
+        delay = self._next_tick - timer()
+        if delay > 0:
+            sleep(delay)
+        else:
+            self._next_tick = timer()
+
+def follow_path(rover, waypoints, grid, lookahead_distance=0.6, max_speed=0.25, speed_factor=2, control_rate=20.0, obstacle_check_rate=5.0, sensors_to_ignore=[7], dist_tolerance=1e-1, realtime=True, scan_filter=None, obstacle_index=None, clearance=0.0, stuck_timeout=10.0):
+    """Drives a rover along a series of waypoints without stopping at each one, sending the commands of a PurePursuit controller at a fixed rate
+
+    Parameters
+    ----------
+    rover : Rover
+        The rover within the Gazebo simulation
+    waypoints : list of (float, float)
+        The (x, y) coordinates of the points the rover should pass through, in order. The rover begins from its current location
+    grid : Grid or ChunkedGrid
+        The grid whose obstacle layer the LiDAR readings are checked against
+    lookahead_distance : float
+        The distance ahead of the rover, along the path, of the point it steers towards. Shorter distances follow corners more closely, longer ones drive more smoothly
+    max_speed : float
+        The highest linear speed sent to the rover
+    speed_factor : float
+        The linear speed per meter of path remaining to the last waypoint, which slows the rover as it arrives
+    control_rate : float
+        The number of commands sent to the rover each second
+    obstacle_check_rate : float
+        The number of times each second the LiDAR readings are checked for obstacles that are not on the grid
+    sensors_to_ignore : list of ints
+        The indices of LiDAR sensors to ignore
+    dist_tolerance : float
+        The distance from the last waypoint at which the rover is considered to have arrived
+    realtime : bool
+        Whether or not to wait between commands to hold `control_rate`. A simulated rover that advances its own clock with every command does not need to
+    scan_filter : ScanFilter
+        If given, finds the new obstacles in each sweep instead, so that sweeps that repeat one already seen are not checked again. Its own `sensors_to_ignore` then apply
+    obstacle_index : ObstacleIndex
+        If given along with a `scan_filter` that marks the obstacles it finds, such as a ClearanceFilter, new obstacles only stop the rover if they come within `clearance` of the part of the path still ahead of it
+    clearance : float
+        The distance in meters the rest of the path must keep from the obstacles in `obstacle_index`
+    stuck_timeout : float
+        The number of seconds of commands after which the rover is considered stuck if it has not got `dist_tolerance` closer to the end of the path, such as when it is pinned against an obstacle its LiDAR cannot see
+
+    Raises
+    ------
+    ObseleteGridError
+        if untracked obstacles are found while following the path, or the rover is stuck
+    """
+    controller = PurePursuit((rover.x, rover.y), waypoints, lookahead_distance=lookahead_distance, max_speed=max_speed, speed_factor=speed_factor, dist_tolerance=dist_tolerance)
+    limiter = RateLimiter(control_rate, obstacle_check_rate, realtime)
+    # Counted in ticks rather than seconds, so that a rover that is not driven in real time gets stuck just as soon
+    stuck_ticks = max(int(round(stuck_timeout * control_rate)), 1)
+    closest = controller.distance_remaining(rover.x, rover.y)
+    last_progress = 0
+
+    while True:
+        command = controller.command(rover.x, rover.y, rover.heading)
+        if command is None:
+            break
+
+        if limiter.obstacle_check_due() and _found_new_obstacles(rover, grid, sensors_to_ignore, scan_filter, controller.remaining_waypoints, obstacle_index, clearance):
+            raise ObseleteGridError
+
+        distance_remaining = controller.distance_remaining(rover.x, rover.y)
+        if distance_remaining <= closest - dist_tolerance:
+            closest = distance_remaining
+            last_progress = limiter.tick
+        elif limiter.tick - last_progress >= stuck_ticks:
+            # Something the grid does not know about is in the way, so the route has to be planned again
+            rover.send_command(0, 0)
+            raise ObseleteGridError
+
+        rover.send_command(*command)
+        limiter.wait()
+
+    rover.send_command(0, 0)
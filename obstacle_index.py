@@ -0,0 +1,350 @@
+from math import ceil, floor, hypot, pi, sqrt
+import numpy as np
+from grid import Grid
+from locate_obstacles import ScanFilter
+from inflation import ObstacleInflator
+
+INFINITY = float("inf")
+
+class ObstacleIndex:
+    """Keeps the raw positions of obstacles in a spatial hash, so that clearances are measured to the obstacles themselves rather than to the nodes they fall in
+
+    Points are sorted into square buckets `bucket_size` meters on a side, and only the buckets that exist are stored, in a dictionary keyed by the (column, row) of the bucket. A query only looks at the buckets near the point or segment it is asked about, so its cost follows the number of obstacles close by rather than the number stored or the area they cover.
+
+    Attributes
+    ----------
+    bucket_size : float
+        the length of each side of a bucket in meters
+
+    Methods
+    -------
+    add(points)
+        Adds a batch of obstacle positions to the index
+    clear()
+        Removes every obstacle from the index
+    nearest_distance(point, limit=None)
+        Finds the distance from a point to the nearest obstacle
+    segment_distance(start, end, limit)
+        Finds the distance from a straight line to the nearest obstacle
+    """
+
+    def __init__(self, bucket_size=1.0):
+        """Initializes a new, empty ObstacleIndex instance.
+
+        Parameters
+        ----------
+        bucket_size : float
+            the length of each side of a bucket in meters. Buckets around the clearance being checked for, or somewhat larger, keep queries fast
+        """
+        if bucket_size <= 0:
+            raise ValueError("The bucket size must be positive, not {}".format(bucket_size))
+        self.bucket_size = float(bucket_size)
+        self._buckets = {}
+        self._count = 0
+        # The lowest and highest bucket columns and rows in use, beyond which no search needs to look
+        self._low = None
+        self._high = None
+
+    def __len__(self):
+        return self._count
+
+    def add(self, points):
+        """Adds a batch of obstacle positions to the index
+
+        Parameters
+        ----------
+        points : array_like
+            an (M, 2) array of the (x, y) positions of the obstacles
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0:
+            return
+        keys = np.floor(points / self.bucket_size).astype(np.int64)
+        bucket_keys, inverse = np.unique(keys, axis=0, return_inverse=True)
+        # Sorting the points by bucket lets each bucket take its points as a single slice
+        order = np.argsort(inverse.ravel(), kind="stable")
+        bounds = np.searchsorted(inverse.ravel()[order], np.arange(len(bucket_keys) + 1))
+        for i, key in enumerate(map(tuple, bucket_keys.tolist())):
+            new_points = points[order[bounds[i]:bounds[i + 1]]]
+            existing = self._buckets.get(key)
+            self._buckets[key] = new_points if existing is None else np.concatenate((existing, new_points))
+
+        self._count += len(points)
+        low, high = bucket_keys.min(axis=0), bucket_keys.max(axis=0)
+        self._low = low if self._low is None else np.minimum(self._low, low)
+        self._high = high if self._high is None else np.maximum(self._high, high)
+
+    def clear(self):
+        """Removes every obstacle from the index"""
+        self._buckets = {}
+        self._count = 0
+        self._low = None
+        self._high = None
+
+    def _gather(self, keys):
+        """Returns every point in the buckets with the specified keys as a single (M, 2) array"""
+        found = [self._buckets[key] for key in keys if key in self._buckets]
+        if not found:
+            return np.zeros((0, 2))
+        return np.concatenate(found)
+
+    def _around(self, column, row, reach):
+        """Lists the keys of the stored buckets at most `reach` buckets from a bucket in either direction"""
+        if (2 * reach + 1) ** 2 > len(self._buckets):
+            # Checking every stored bucket is cheaper than every key the square could hold
+            return [(key_column, key_row) for key_column, key_row in self._buckets if abs(key_column - column) <= reach and abs(key_row - row) <= reach]
+        return [(column + column_offset, row + row_offset) for column_offset in range(-reach, reach + 1) for row_offset in range(-reach, reach + 1)]
+
+    def nearest_distance(self, point, limit=None):
+        """Finds the distance from a point to the nearest obstacle
+
+        The search looks at the buckets around the point, widening the square it covers until it holds an obstacle that no bucket beyond it could beat.
+
+        Parameters
+        ----------
+        point : (float, float)
+            the (x, y) position to measure from
+        limit : float
+            if given, obstacles further away than this are not looked for
+
+        Returns
+        -------
+        float
+            the distance in meters, or infinity if there are no obstacles within `limit`
+        """
+        if not self._buckets:
+            return INFINITY
+        x, y = float(point[0]), float(point[1])
+        column, row = int(floor(x / self.bucket_size)), int(floor(y / self.bucket_size))
+        # No bucket further than this from the point's own holds any obstacle
+        furthest = max(column - self._low[0], self._high[0] - column, row - self._low[1], self._high[1] - row, 0)
+        if limit is not None:
+            furthest = min(furthest, int(ceil(limit / self.bucket_size)))
+
+        reach = 1
+        while True:
+            reach = min(reach, furthest)
+            points = self._gather(self._around(column, row, reach))
+            nearest = float(np.hypot(points[:, 0] - x, points[:, 1] - y).min()) if len(points) else INFINITY
+            # Any obstacle outside the square searched is more than `reach` buckets away
+            if nearest <= reach * self.bucket_size or reach == furthest:
+                break
+            reach = 2 * reach if nearest == INFINITY else max(2 * reach, int(ceil(nearest / self.bucket_size)))
+        if limit is not None and nearest > limit:
+            return INFINITY
+        return nearest
+
+    def segment_distance(self, start, end, limit):
+        """Finds the distance from a straight line to the nearest obstacle
+
+        Only the buckets within `limit` of the line are looked at, so the answer is exact for obstacles closer than `limit` and infinity for everything else. Checking whether a line keeps a clearance from every obstacle therefore only costs as much as that clearance needs.
+
+        Parameters
+        ----------
+        start : (float, float)
+            the (x, y) position at which the line begins
+        end : (float, float)
+            the (x, y) position at which the line ends
+        limit : float
+            the distance within which obstacles are looked for
+
+        Returns
+        -------
+        float
+            the distance in meters from the closest point on the line to the closest obstacle, or infinity if there are no obstacles within `limit`
+        """
+        if not self._buckets:
+            return INFINITY
+        start = np.array(start, dtype=float)
+        change = np.array(end, dtype=float) - start
+        length = float(np.hypot(*change))
+
+        # Samples a bucket apart lie within half a bucket of every point on the line, so the buckets around them cover everything within `limit`
+        samples = start + np.linspace(0, 1, int(ceil(length / self.bucket_size)) + 1)[:, np.newaxis] * change
+        reach = int(ceil((limit + 0.5 * self.bucket_size) / self.bucket_size))
+        offsets = np.arange(-reach, reach + 1)
+        sample_keys = np.floor(samples / self.bucket_size).astype(np.int64)
+        shape = (len(samples), len(offsets), len(offsets))
+        columns = np.broadcast_to(sample_keys[:, 0, np.newaxis, np.newaxis] + offsets[:, np.newaxis], shape).ravel()
+        rows = np.broadcast_to(sample_keys[:, 1, np.newaxis, np.newaxis] + offsets, shape).ravel()
+        # Neighbouring samples share most of their buckets, so each bucket is only looked up once
+        _, first = np.unique(columns * (2 ** 32) + rows, return_index=True)
+        keys = zip(columns[first].tolist(), rows[first].tolist())
+        points = self._gather(keys)
+        if len(points) == 0:
+            return INFINITY
+
+        # Each obstacle is measured to the point on the line nearest to it
+        offsets = points - start
+        along = np.clip(offsets.dot(change) / length ** 2, 0, 1) if length > 0 else np.zeros(len(points))
+        nearest = float(np.hypot(*(offsets - along[:, np.newaxis] * change).T).min())
+        return nearest if nearest <= limit else INFINITY
+
+class ClearanceFilter(ScanFilter):
+    """Marks and pads the obstacles in each sweep on the grid itself, measuring the padding from the position of every reading rather than from the node it fell in, and keeps those positions in an ObstacleIndex so that routes can also be checked against the obstacles themselves
+
+    A node becomes padding when its centre is within `pad_distance` of a reading, which is `padding` widened by half the longest step the planner takes between neighbouring nodes. Every step between two nodes that are free of obstacles and padding then keeps `padding` from every reading, without the padding being rounded up to whole nodes around the node a reading fell in. That rounding is what closes gaps the rover could pass through: padding a node spacing and a quarter wide, for instance, is rounded up to two whole nodes on every side. Nodes deep inside the padding are marked without being measured, and only those near its edge are checked against the index.
+
+    A reading is only a single point on the surface of whatever it hit. Neighbouring readings of a sweep that are too close together for the rover to pass between keeping `padding` from both are joined by points along the line between them, so that the surface of an obstacle is indexed and padded between the rays that hit it rather than only where they did. Surfaces no ray has reached yet, such as the far side of a rock, are not padded until they are seen.
+
+    A ClearanceFilter can stand in for a ScanFilter wherever one is accepted, with `new_cells` reporting the nodes that have just become obstacles. Unlike a ScanFilter, it marks them on the grid itself.
+
+    Attributes
+    ----------
+    padding : float
+        the distance in meters every step between free nodes keeps from the obstacles
+    pad_distance : float
+        the distance in meters from an obstacle within which the centre of a node becomes padding
+    index : ObstacleIndex
+        the positions of the readings. Obstacles that were already on the grid are only known to the nearest node
+    cells_added : int
+        the number of nodes that have become obstacles
+
+    Methods
+    -------
+    new_cells(rover)
+        Marks and pads the obstacles in the rover's current sweep that are not yet on the grid, and finds the nodes they fell in
+    add_obstacles(points, keep_clear=None)
+        Marks, pads and indexes obstacles at the specified positions
+    forget()
+        Forgets the remembered sweep and rebuilds the index from the obstacles left on the grid
+    """
+
+    def __init__(self, grid, padding, sweep_angle=pi/2, sensors_to_ignore=[7], bucket_size=1.0, include_diagonals=True, **tolerances):
+        """Initializes a new ClearanceFilter instance, indexing the centre of every node already marked as an obstacle.
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid whose obstacle and padding layers are kept up to date
+        padding : float
+            the distance in meters every step between free nodes keeps from the obstacles
+        sweep_angle : float
+            the angle through which the LiDAR rays sweep in radians
+        sensors_to_ignore : list of ints
+            the indices of LiDAR sensors to ignore
+        bucket_size : float
+            the length of each side of the index's buckets in meters
+        include_diagonals : bool
+            whether the planner steps diagonally between nodes, which makes its longest step, and so the padding needed around it, longer
+        tolerances
+            `position_tolerance`, `heading_tolerance` and `range_tolerance`, as for ScanFilter
+        """
+        if not isinstance(grid, Grid):
+            raise ValueError("Exact clearance requires a fixed-size Grid")
+        ScanFilter.__init__(self, grid, sweep_angle=sweep_angle, sensors_to_ignore=sensors_to_ignore, **tolerances)
+        self.padding = padding
+        self.index = ObstacleIndex(bucket_size)
+        self.cells_added = 0
+        # Nodes can sit a little closer together than `node_spacing` when it does not divide the grid evenly
+        column_spacing = abs(float(grid.end[0] - grid.start[0])) / grid.width or grid.node_spacing
+        row_spacing = abs(float(grid.end[1] - grid.start[1])) / grid.height or grid.node_spacing
+        step = hypot(column_spacing, row_spacing) if include_diagonals else max(column_spacing, row_spacing)
+        # Both ends of a step keeping this distance from a point keep its middle, the closest it can come, `padding` away
+        self.pad_distance = sqrt(float(padding) ** 2 + (0.5 * step) ** 2)
+
+        # A reading lies anywhere in its node, up to half a node diagonal from the centre, so nodes whose centres are this much closer than `pad_distance` to that centre are always padding and nodes this much further never are
+        corner = 0.5 * hypot(column_spacing, row_spacing)
+        outer = ObstacleInflator(int(ceil((self.pad_distance + corner) / min(column_spacing, row_spacing))))
+        reach = np.hypot(outer.row_offsets * row_spacing, outer.column_offsets * column_spacing)
+        inside = reach <= self.pad_distance - corner
+        self._inner_offsets = outer.row_offsets[inside], outer.column_offsets[inside]
+        self._edge_offsets = outer.row_offsets[~inside], outer.column_offsets[~inside]
+        self.index.add(grid.locations(*np.nonzero(grid.obstacle_layer)))
+
+    def _readings(self, x, y, heading, distances):
+        """Locates the obstacles in a sweep, filling in the surface between neighbouring readings that are too close together for the rover to pass between"""
+        points = ScanFilter._readings(self, x, y, heading, distances)
+        if len(points) < 2:
+            return points
+        changes = np.diff(points, axis=0)
+        gaps = np.hypot(changes[:, 0], changes[:, 1])
+        # Nothing could pass between readings less than twice the padding apart while keeping its clearance from both, so joining them closes no gap the rover could use
+        joined = np.flatnonzero(gaps < 2 * self.padding)
+        if len(joined) == 0:
+            return points
+
+        # Filled points a quarter of the padding apart leave no part of the surface between two readings more than an eighth of the padding from one
+        pieces = np.maximum(np.ceil(gaps[joined] / (0.25 * self.padding)).astype(np.intp), 1)
+        pairs = np.repeat(joined, pieces - 1)
+        fractions = np.concatenate([np.arange(1, count) / float(count) for count in pieces.tolist()])
+        filled = points[pairs] + fractions[:, np.newaxis] * changes[pairs]
+        return np.concatenate((points, filled))
+
+    def new_cells(self, rover):
+        """Marks and pads the obstacles in the rover's current sweep that are not yet on the grid, and finds the nodes they fell in
+
+        Parameters
+        ----------
+        rover : Rover
+            the rover on which the LiDAR sensors are mounted
+
+        Returns
+        -------
+        A tuple of two integer arrays holding the rows and columns of the nodes that have just become obstacles, which have already been marked and padded
+        """
+        points, rows, columns = self._new_obstacles(rover)
+        if len(rows) == 0:
+            return rows, columns
+        # The rover's own node is never padded, or it could not plan its way out
+        self._mark(points, rows, columns, self.grid.nearest_node((rover.x, rover.y)).coords)
+        return rows, columns
+
+    def add_obstacles(self, points, keep_clear=None):
+        """Marks, pads and indexes obstacles at the specified positions
+
+        Parameters
+        ----------
+        points : array_like
+            an (M, 2) array of the (x, y) positions of the obstacles
+        keep_clear : (int, int)
+            the row and column of a node, such as the one the rover is on, that must not become padding. A node that was already padding is left as it was
+
+        Returns
+        -------
+        A tuple of two integer arrays holding the rows and columns of the nodes that have just become obstacles
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        rows, columns = self.grid.nearest_indices(points)
+        unmarked = ~self.grid.obstacle_layer[rows, columns]
+        points, rows, columns = points[unmarked], rows[unmarked], columns[unmarked]
+        if len(rows) == 0:
+            return rows, columns
+        unique_cells = np.unique(np.column_stack((rows, columns)), axis=0)
+        rows, columns = unique_cells[:, 0], unique_cells[:, 1]
+        self._mark(points, rows, columns, keep_clear)
+        return rows, columns
+
+    def _mark(self, points, rows, columns, keep_clear):
+        """Indexes new readings and marks the nodes they fell in as obstacles, padding every node whose centre is within `pad_distance` of one"""
+        grid = self.grid
+        self.index.add(points)
+        grid.obstacle_layer[rows, columns] = True
+        self.cells_added += len(rows)
+        if keep_clear is not None:
+            was_padding = grid.padding_layer[keep_clear]
+
+        rows, columns = rows[:, np.newaxis], columns[:, np.newaxis]
+        inner_rows, inner_columns = (rows + self._inner_offsets[0]).ravel(), (columns + self._inner_offsets[1]).ravel()
+        in_bounds = grid.contains(inner_rows, inner_columns)
+        grid.padding_layer[inner_rows[in_bounds], inner_columns[in_bounds]] = True
+
+        # Only the nodes near the edge of the padding that are not yet blocked need measuring
+        edge_rows, edge_columns = (rows + self._edge_offsets[0]).ravel(), (columns + self._edge_offsets[1]).ravel()
+        in_bounds = grid.contains(edge_rows, edge_columns)
+        edge_rows, edge_columns = edge_rows[in_bounds], edge_columns[in_bounds]
+        unblocked = ~(grid.padding_layer[edge_rows, edge_columns] | grid.obstacle_layer[edge_rows, edge_columns])
+        edge_cells = np.unique(np.column_stack((edge_rows[unblocked], edge_columns[unblocked])), axis=0)
+        if len(edge_cells):
+            centres = grid.locations(edge_cells[:, 0], edge_cells[:, 1])
+            near = np.array([self.index.nearest_distance(centre, limit=self.pad_distance) <= self.pad_distance for centre in centres])
+            grid.padding_layer[edge_cells[near, 0], edge_cells[near, 1]] = True
+
+        if keep_clear is not None:
+            grid.padding_layer[keep_clear] = was_padding
+
+    def forget(self):
+        """Forgets the remembered sweep and rebuilds the index from the obstacles left on the grid. Call this whenever obstacles are removed from the grid"""
+        ScanFilter.forget(self)
+        self.index.clear()
+        self.index.add(self.grid.locations(*np.nonzero(self.grid.obstacle_layer)))
@@ -0,0 +1,210 @@
+from math import pi, radians
+import numpy as np
+from grid import Grid
+from locate_obstacles import ScanFilter
+
+class OccupancyMap(ScanFilter):
+    """Keeps the evidence for an obstacle in every node as log-odds, and marks the grid's obstacle layer wherever the evidence outweighs the evidence against
+
+    Every LiDAR sweep is ray cast onto the grid at once: the node each ray ends in gains `hit`, and every node the ray passes through on the way loses `miss`. A genuine obstacle is hit again and again, while a spurious reading is soon passed through by other rays and removed, along with its padding, without the rest of the map being touched. Log-odds are clamped between `minimum` and `maximum`, so that no node becomes too certain to be corrected.
+
+    When no route can be found, `fade` weakens only the obstacles that have not been observed recently, rather than wiping the whole map. An OccupancyMap can stand in for a ScanFilter wherever one is accepted, with `new_cells` reporting the nodes that have just become obstacles. Unlike a ScanFilter, it marks them on the grid itself.
+
+    Attributes
+    ----------
+    log_odds : nparray
+        a (height, width) float32 array holding the evidence for an obstacle in each node. 0 means no evidence either way
+    last_observed : nparray
+        a (height, width) int32 array holding the number of the last sweep to have updated each node, or -1 if none has
+    inflator : ObstacleInflator
+        pads the nodes that become obstacles, and re-pads around the ones that stop being obstacles
+    hit : float
+        the log-odds added to a node in which a ray ends
+    miss : float
+        the log-odds subtracted from a node a ray passes through
+    minimum : float
+        the lowest log-odds a node may hold
+    maximum : float
+        the highest log-odds a node may hold
+    free_range : float
+        the distance in meters along a ray that detects nothing over which the nodes are treated as free
+    stale_after : int
+        the number of sweeps after which a node that has not been observed is considered stale
+    cells_added : int
+        the number of times a node has become an obstacle
+    cells_removed : int
+        the number of times a node has stopped being an obstacle
+
+    Methods
+    -------
+    new_cells(rover)
+        Adds the rover's current sweep to the map, and finds the nodes that have become obstacles as a result
+    fade(amount=1.0, keep_clear=None)
+        Weakens the obstacles that have not been observed recently
+    """
+
+    def __init__(self, grid, inflator, sweep_angle=pi/2, sensors_to_ignore=[7], hit=0.85, miss=0.4, minimum=-2.0, maximum=3.5, free_range=3.0, stale_after=25, **tolerances):
+        """Initializes a new OccupancyMap instance, treating every node already marked as an obstacle as having been hit once.
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid whose obstacle and padding layers are kept up to date
+        inflator : ObstacleInflator
+            pads the nodes that become obstacles
+        sweep_angle : float
+            the angle through which the LiDAR rays sweep in radians
+        sensors_to_ignore : list of ints
+            the indices of LiDAR sensors to ignore
+        hit : float
+            the log-odds added to a node in which a ray ends
+        miss : float
+            the log-odds subtracted from a node a ray passes through
+        minimum : float
+            the lowest log-odds a node may hold
+        maximum : float
+            the highest log-odds a node may hold
+        free_range : float
+            the distance in meters along a ray that detects nothing over which the nodes are treated as free
+        stale_after : int
+            the number of sweeps after which a node that has not been observed is considered stale
+        tolerances
+            `position_tolerance`, `heading_tolerance` and `range_tolerance`, as for ScanFilter
+        """
+        if not isinstance(grid, Grid):
+            raise ValueError("Log-odds occupancy requires a fixed-size Grid")
+        ScanFilter.__init__(self, grid, sweep_angle=sweep_angle, sensors_to_ignore=sensors_to_ignore, **tolerances)
+        self.inflator = inflator
+        self.hit = hit
+        self.miss = miss
+        self.minimum = minimum
+        self.maximum = maximum
+        self.free_range = free_range
+        self.stale_after = stale_after
+        self.cells_added = 0
+        self.cells_removed = 0
+
+        self.log_odds = np.where(grid.obstacle_layer, np.float32(hit), np.float32(0))
+        self.last_observed = np.full(self.log_odds.shape, -1, dtype=np.int32)
+
+    def _on_grid(self, points):
+        """Finds the flat indices of the nodes nearest to an array of points, dropping points that lie off the grid"""
+        rows, columns = self.grid.nearest_indices(points)
+        # Points off the grid are clamped onto its edge, so they are recognised by how far they are from their node
+        inside = np.abs(self.grid.locations(rows, columns) - points).max(axis=1) <= self.grid.node_spacing
+        return np.unique(rows[inside] * self.grid.width + columns[inside])
+
+    def _cast(self, x, y, heading, distances):
+        """Finds the nodes the rays of a sweep end in, and the nodes they pass through before that"""
+        angles = radians(heading) + self.sweep_angle * (-0.5 + np.arange(len(distances)) / float(max(len(distances) - 1, 1)))
+        used = np.ones(len(distances), dtype=bool)
+        used[[i for i in self.sensors_to_ignore if 0 <= i < len(distances)]] = False
+        angles, distances = angles[used], distances[used]
+        directions = np.column_stack((np.cos(angles), np.sin(angles)))
+        hits = np.isfinite(distances)
+
+        hit_points = np.array([x, y]) + distances[hits, np.newaxis] * directions[hits]
+        hit_cells = self._on_grid(hit_points)
+
+        # Each ray is sampled every half node up to just short of what it hit, or to `free_range` if it hit nothing
+        step = self.grid.node_spacing / 2.0
+        reach = np.where(hits, distances - step, self.free_range)
+        samples = np.arange(0, max(reach.max(), 0) + step, step)
+        along = samples[np.newaxis, :] <= reach[:, np.newaxis]
+        free_points = np.empty((int(along.sum()), 2))
+        free_points[:, 0] = (x + samples[np.newaxis, :] * directions[:, 0, np.newaxis])[along]
+        free_points[:, 1] = (y + samples[np.newaxis, :] * directions[:, 1, np.newaxis])[along]
+        free_cells = np.setdiff1d(self._on_grid(free_points), hit_cells, assume_unique=True)
+        return hit_cells, free_cells
+
+    def _update_layers(self, cells, keep_clear):
+        """Marks or unmarks the obstacles among the specified nodes to agree with their log-odds, and pads them to match"""
+        occupied = self.log_odds.flat[cells] > 0
+        marked = self.grid.obstacle_layer.flat[cells]
+        added = cells[occupied & ~marked]
+        removed = cells[~occupied & marked]
+        width = self.grid.width
+
+        if len(added):
+            self.grid.obstacle_layer.flat[added] = True
+            rows, columns = np.divmod(added, width)
+            self.inflator.inflate(self.grid, rows, columns, keep_clear=keep_clear)
+            self.cells_added += len(added)
+        if len(removed):
+            self.grid.obstacle_layer.flat[removed] = False
+            self._repad(*np.divmod(removed, width), keep_clear=keep_clear)
+            self.cells_removed += len(removed)
+        return np.divmod(added, width)
+
+    def _repad(self, rows, columns, keep_clear):
+        """Recomputes the padding around nodes that have stopped being obstacles, keeping the padding of the obstacles that remain"""
+        radius = self.inflator.radius
+        height, width = self.grid.height, self.grid.width
+        first_row, end_row = max(rows.min() - radius, 0), min(rows.max() + radius + 1, height)
+        first_column, end_column = max(columns.min() - radius, 0), min(columns.max() + radius + 1, width)
+        self.grid.padding_layer[first_row:end_row, first_column:end_column] = False
+
+        # Any obstacle within the padding radius of the cleared box may have padded part of it
+        near_first_row, near_end_row = max(first_row - radius, 0), min(end_row + radius, height)
+        near_first_column, near_end_column = max(first_column - radius, 0), min(end_column + radius, width)
+        near_rows, near_columns = np.nonzero(self.grid.obstacle_layer[near_first_row:near_end_row, near_first_column:near_end_column])
+        self.inflator.inflate(self.grid, near_rows + near_first_row, near_columns + near_first_column, keep_clear=keep_clear)
+
+    def new_cells(self, rover):
+        """Adds the rover's current sweep to the map, and finds the nodes that have become obstacles as a result
+
+        A sweep that repeats the previous one within tolerance is skipped, so that the same evidence is not counted twice.
+
+        Parameters
+        ----------
+        rover : Rover
+            the rover on which the LiDAR sensors are mounted
+
+        Returns
+        -------
+        A tuple of two integer arrays holding the rows and columns of the nodes that have just become obstacles, which have already been marked and padded
+        """
+        self.sweeps += 1
+        x, y, heading = rover.x, rover.y, rover.heading
+        distances = np.asarray(rover.laser_distances, dtype=float)
+        if self._unchanged(x, y, heading, distances):
+            self.skipped_sweeps += 1
+            return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+        self._seen_pose = (x, y, heading)
+        self._seen_distances = distances
+
+        hit_cells, free_cells = self._cast(x, y, heading, distances)
+        self.log_odds.flat[hit_cells] = np.minimum(self.log_odds.flat[hit_cells] + self.hit, self.maximum)
+        self.log_odds.flat[free_cells] = np.maximum(self.log_odds.flat[free_cells] - self.miss, self.minimum)
+        self.last_observed.flat[hit_cells] = self.sweeps
+        self.last_observed.flat[free_cells] = self.sweeps
+
+        rover_coords = self.grid.nearest_node((x, y)).coords
+        return self._update_layers(np.concatenate((hit_cells, free_cells)), rover_coords)
+
+    def fade(self, amount=1.0, keep_clear=None):
+        """Weakens the obstacles that have not been observed recently
+
+        Every obstacle that no ray has reached for `stale_after` sweeps loses `amount` log-odds, and those left without evidence for them are removed. If no obstacle is stale, every obstacle is weakened instead, so that repeated calls always make progress towards a clear map.
+
+        Parameters
+        ----------
+        amount : float
+            the log-odds taken from each stale obstacle
+        keep_clear : (int, int)
+            the row and column of a node, such as the one the rover is on, that must not become padding
+
+        Returns
+        -------
+        int
+            the number of obstacles removed
+        """
+        occupied = self.log_odds > 0
+        faded = occupied & (self.last_observed < self.sweeps - self.stale_after)
+        if not faded.any():
+            faded = occupied
+        self.log_odds[faded] = np.maximum(self.log_odds[faded] - amount, 0)
+
+        removed = self.cells_removed
+        self._update_layers(np.flatnonzero(faded), keep_clear)
+        return self.cells_removed - removed
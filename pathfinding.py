@@ -1,8 +1,29 @@
-from grid_node import distance, neighbouring_nodes
+import heapq
+import itertools
 import numpy as np
 from errors import NoValidPathError
 
-def quickest_path(node1, node2, grid, include_diagonals=True, euclidean=True, verbose=False):
+# Neighbour offsets, listed in the same order as `neighbouring_nodes` so that ties are broken identically
+_DIAGONAL_OFFSETS = [(i, j) for i in (-1, 0, 1) for j in (-1, 0, 1) if (i, j) != (0, 0)]
+_ORTHOGONAL_OFFSETS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+def neighbour_offsets(include_diagonals=True):
+    """Lists the (row, column) steps that lead from a node to each of its immediate neighbours
+
+    Parameters
+    ----------
+    include_diagonals : bool
+        whether or not nodes diagonal to the initial node should be considered neighbours
+
+    Returns
+    -------
+    A list of (int, int) tuples
+    """
+    return _DIAGONAL_OFFSETS if include_diagonals else _ORTHOGONAL_OFFSETS
+
+ALGORITHMS = ["astar", "jps", "bidirectional"]
+
+def quickest_path(node1, node2, grid, include_diagonals=True, euclidean=True, verbose=False, algorithm="astar", stats=None):
     """Finds the shortest path between two nodes on a grid, avoiding obstacles
 
     Parameters
@@ -13,6 +34,16 @@ def quickest_path(node1, node2, grid, include_diagonals=True, euclidean=True, ve
         The node that represents the desired destination
     grid : Grid
         A grid that contains `node1`, `node2`, and a representation of the rover's environment
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    euclidean : bool
+        whether or not the (squared) euclidean distance should be used as the A* heuristic. If not, Manhattan distance is used
+    verbose : bool
+        whether or not to log when a path is found
+    algorithm : str
+        the search to run; one of `ALGORITHMS`. "astar" is a heap-based A*. "jps" is Jump Point Search, which only expands the nodes where a shortest route may have to turn; it requires `include_diagonals` and ignores `euclidean`. "bidirectional" runs A* from both ends at once and stops once no route through the unexplored nodes can beat the best one where the two searches have met, which expands far fewer nodes on long open legs and gives up quickly when either end is boxed in; it ignores `euclidean`
+    stats : dict
+        if given, the number of nodes expanded by the search is added to its "expansions" entry, and its "peak_open_set" entry is raised to the largest number of entries the search's open set held
 
     Returns
     -------
@@ -23,66 +54,455 @@ def quickest_path(node1, node2, grid, include_diagonals=True, euclidean=True, ve
     ------
     NoValidPathError
         If no viable path is found
+    ValueError
+        If the algorithm is unknown, or "jps" is requested without diagonal moves
     """
+    start = grid.flat_index(*node1.coords)
+    goal = grid.flat_index(*node2.coords)
+    blocked = grid.blocked_layer().ravel()
 
-    for node_array in grid._array:
-        for node in node_array:
-            node.parent = None
+    if algorithm == "astar":
+        indices, expansions, peak_open_set = _a_star(start, goal, blocked, grid, include_diagonals, euclidean)
+    elif algorithm == "jps":
+        if not include_diagonals:
+            raise ValueError("Jump Point Search requires include_diagonals=True")
+        indices, expansions, peak_open_set = _jump_point_search(start, goal, blocked, grid)
+    elif algorithm == "bidirectional":
+        indices, expansions, peak_open_set = _bidirectional_a_star(start, goal, blocked, grid, include_diagonals)
+    else:
+        raise ValueError("Unknown algorithm {!r}; expected one of {}".format(algorithm, ALGORITHMS))
 
-    open_set = [node1]
-    closed_set = []
-    start_dist = { node1: 0 }
-    
-    while len(open_set) != 0:
-        # Casting the map to a list is redundant in Python 2.x, but is necessary in Python 3.x
-        h_values = list(map(
-                lambda n : distance(n, node2, euclidean=euclidean) + start_dist[n],
-                 open_set))
+    if stats is not None:
+        stats["expansions"] = stats.get("expansions", 0) + expansions
+        stats["peak_open_set"] = max(stats.get("peak_open_set", 0), peak_open_set)
+
+    if indices is None:
+        print("Viable path was not found\n" + repr(grid))
+        raise NoValidPathError
+
+    if verbose:
+        print("Found a valid path")
+
+    return path_from_indices(grid, indices)
+
+def quickest_indices(start, goal, blocked, grid, include_diagonals=True, euclidean=True):
+    """Finds a path between two flat indices of a blocked layer with A*, without creating any nodes
+
+    This lets a path be planned on a copy of a grid's blocked layer, for instance in a background thread while the grid itself keeps changing.
+
+    Parameters
+    ----------
+    start : int
+        the flat index of the node from which the path begins
+    goal : int
+        the flat index of the node at which the path ends
+    blocked : nparray
+        a flattened boolean array of the nodes that cannot be entered
+    grid : Grid, ChunkedGrid or any object with the same `width`, `height` and `node_spacing`
+        the dimensions of the layer
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    euclidean : bool
+        whether to use the Euclidean distance (True) or the Manhattan distance (False) as the heuristic
+
+    Returns
+    -------
+    A list of the flat indices from `start` to `goal`, or None if there is no path
+    """
+    return _a_star(start, goal, blocked, grid, include_diagonals, euclidean)[0]
+
+def _a_star(start, goal, blocked, grid, include_diagonals, euclidean):
+    """Runs A* between two flat indices
+
+    The open set is a binary heap. Decrease-key is done lazily by pushing a new entry and discarding stale ones as they are popped, and all per-search state lives in dictionaries keyed by flat node index, so nothing on the grid has to be reset before a search. Ties between equally promising nodes are broken in the order the nodes were discovered.
+
+    Returns
+    -------
+    A tuple of the list of flat indices from `start` to `goal` (None if there is no path), the number of nodes expanded and the largest number of entries the open set held
+    """
+    width, height = grid.width, grid.height
+    # Rows and columns within the search are recovered from flat indices, which need not match the nodes' own coordinates on every kind of grid
+    goal_row, goal_column = divmod(goal, width)
+    offsets = neighbour_offsets(include_diagonals)
+
+    def heuristic(row, column):
+        if euclidean:
+            return (goal_row - row) ** 2 + (goal_column - column) ** 2
+        return abs(goal_row - row) + abs(goal_column - column)
+
+    start_dist = { start: 0 }
+    parents = {}
+    closed_set = set()
+    expansions = 0
+    peak_open_set = 1
+    # Heap entries are (f, discovery order, g, index); the discovery order breaks ties first-come first-served
+    counter = itertools.count()
+    open_heap = [(heuristic(*divmod(start, width)), next(counter), 0, start)]
+
+    while open_heap:
+        if len(open_heap) > peak_open_set:
+            peak_open_set = len(open_heap)
+        _, _, g_value, current = heapq.heappop(open_heap)
+
+        # Skip entries made stale by a later decrease-key
+        if current in closed_set or g_value != start_dist[current]:
+            continue
 
-        index = np.argmin(np.array(h_values))
+        if current == goal:
+            break
 
-        current_node = open_set.pop(index)
+        closed_set.add(current)
+        expansions += 1
+        row, column = divmod(current, width)
+        g_value += grid.node_spacing
 
-        if current_node is node2:
-            if verbose:
-                print("Found a valid path")
-            break 
+        for row_offset, column_offset in offsets:
+            neighbour_row = row + row_offset
+            neighbour_column = column + column_offset
 
-        for node in neighbouring_nodes(current_node, grid, include_diagonals=include_diagonals):
+            # Ensure the node is within the bounds of the grid
+            if not (0 <= neighbour_row < height and 0 <= neighbour_column < width):
+                continue
+
+            neighbour = neighbour_row * width + neighbour_column
 
             # Don't consider obstacles among valid routes
-            if node.is_obstacle or node.is_padding:
+            if blocked[neighbour]:
                 continue
 
-            g_value = start_dist[current_node] + grid.node_spacing
-            if node in open_set:
-                if start_dist[node] <= g_value:
-                    continue
-            elif node in closed_set:
-                if start_dist[node] <= g_value: continue
-                closed_set.remove(node)
-                open_set.append(node)
-            else:
-                open_set.append(node)
-                start_dist[node] = g_value
-            node.parent = current_node
-
-        closed_set.append(current_node)
-    
-    # Recover path from grid
-    node = node2
-    path = []
+            if neighbour in start_dist and start_dist[neighbour] <= g_value:
+                continue
 
+            # Reopens the node if it was already closed with a worse distance
+            closed_set.discard(neighbour)
+            start_dist[neighbour] = g_value
+            parents[neighbour] = current
+            heapq.heappush(open_heap, (g_value + heuristic(neighbour_row, neighbour_column), next(counter), g_value, neighbour))
 
-    while node.parent is not None:
-        path.append(node)
-        node = node.parent
-    
-    if node is not node1:
-        print("Viable path was not found\n" + repr(grid))
-        raise NoValidPathError
-    
-    return list(reversed(path))
+    return _trace_parents(start, goal, parents), expansions, peak_open_set
+
+def _trace_parents(start, goal, parents):
+    """Follows parent links back from `goal`, returning the flat indices from `start` to `goal`, or None if `goal` was never reached"""
+    if goal != start and goal not in parents:
+        return None
+
+    indices = [goal]
+    while indices[-1] != start:
+        indices.append(parents[indices[-1]])
+    return list(reversed(indices))
+
+def _bidirectional_a_star(start, goal, blocked, grid, include_diagonals):
+    """Runs A* from both flat indices at once, meeting in the middle
+
+    Each step expands a node from whichever search has the smaller open set, so when one end is boxed in, its side of the search runs out of nodes long before the other would. Every time a search reaches a node the other has already reached, the route through that node becomes a candidate. Both searches are guided by an estimate that never overestimates (the Chebyshev distance, or the Manhattan distance without diagonal moves), so once the smallest estimated route length on either side is no shorter than the best candidate, no unexplored route can beat it and the candidate is a shortest route.
+
+    Returns
+    -------
+    A tuple of the list of flat indices from `start` to `goal` (None if there is no path), the number of nodes expanded and the largest number of entries the two open sets held together
+    """
+    width, height = grid.width, grid.height
+    offsets = neighbour_offsets(include_diagonals)
+    # The goal can never be entered if it is blocked, as in `_a_star`
+    if blocked[goal] and goal != start:
+        return None, 0, 0
+
+    def heuristic_to(target):
+        target_row, target_column = divmod(target, width)
+        if include_diagonals:
+            return lambda row, column: max(abs(target_row - row), abs(target_column - column)) * grid.node_spacing
+        return lambda row, column: (abs(target_row - row) + abs(target_column - column)) * grid.node_spacing
+
+    # Each side searches from its own end towards the other's; index 0 runs from `start` and index 1 from `goal`
+    heuristics = [heuristic_to(goal), heuristic_to(start)]
+    sources = [start, goal]
+    start_dists = [{ start: 0 }, { goal: 0 }]
+    parents = [{}, {}]
+    closed_sets = [set(), set()]
+    counter = itertools.count()
+    # Many routes share the same length when diagonal moves cost as much as straight ones, so ties are broken towards the node furthest from each side's own end, as in `_jump_point_search`
+    open_heaps = [[(heuristics[0](*divmod(start, width)), 0, next(counter), 0, start)],
+                  [(heuristics[1](*divmod(goal, width)), 0, next(counter), 0, goal)]]
+    expansions = 0
+    peak_open_set = 2
+    best_length = 0 if start == goal else float("inf")
+    meeting = start
+
+    def top(side):
+        """Discards stale entries from one side's heap and returns its smallest live one, or None"""
+        heap = open_heaps[side]
+        while heap:
+            _, _, _, g_value, index = heap[0]
+            if index not in closed_sets[side] and g_value == start_dists[side][index]:
+                return heap[0]
+            heapq.heappop(heap)
+        return None
+
+    while True:
+        tops = [top(0), top(1)]
+        # Once either side is exhausted, every node it can reach has been seen, so the best meeting found is final
+        if tops[0] is None or tops[1] is None:
+            break
+        if max(tops[0][0], tops[1][0]) >= best_length:
+            break
+
+        if len(open_heaps[0]) + len(open_heaps[1]) > peak_open_set:
+            peak_open_set = len(open_heaps[0]) + len(open_heaps[1])
+        side = 0 if len(open_heaps[0]) <= len(open_heaps[1]) else 1
+        _, _, _, g_value, current = heapq.heappop(open_heaps[side])
+        closed_sets[side].add(current)
+        expansions += 1
+        # The backward search may reach the start, even inside padding, but never passes through it
+        if side == 1 and current == start:
+            continue
+
+        start_dist = start_dists[side]
+        other_dist = start_dists[1 - side]
+        heuristic = heuristics[side]
+        row, column = divmod(current, width)
+        g_value += grid.node_spacing
+
+        for row_offset, column_offset in offsets:
+            neighbour_row = row + row_offset
+            neighbour_column = column + column_offset
+
+            # Ensure the node is within the bounds of the grid
+            if not (0 <= neighbour_row < height and 0 <= neighbour_column < width):
+                continue
+
+            neighbour = neighbour_row * width + neighbour_column
+
+            # Don't consider obstacles among valid routes, other than the start as seen from the goal
+            if blocked[neighbour] and not (side == 1 and neighbour == start):
+                continue
+
+            if neighbour in start_dist and start_dist[neighbour] <= g_value:
+                continue
+
+            closed_sets[side].discard(neighbour)
+            start_dist[neighbour] = g_value
+            parents[side][neighbour] = current
+            heapq.heappush(open_heaps[side], (g_value + heuristic(neighbour_row, neighbour_column), -g_value, next(counter), g_value, neighbour))
+
+            if neighbour in other_dist and g_value + other_dist[neighbour] < best_length:
+                best_length = g_value + other_dist[neighbour]
+                meeting = neighbour
+
+    if best_length == float("inf"):
+        return None, expansions, peak_open_set
+
+    # The forward half is traced back to the start, and the backward half is followed on to the goal
+    indices = _trace_parents(start, meeting, parents[0])
+    while indices[-1] != goal:
+        indices.append(parents[1][indices[-1]])
+    return indices, expansions, peak_open_set
+
+def _straight_jump_table(blocked, goal_row, goal_column):
+    """Precomputes, for every node and each of the four straight directions, where a straight jump from that node ends
+
+    A straight jump stops at the first node that is the goal or has a forced neighbour, and fails at the first blocked node or the edge of the grid. Both kinds of stop are found for the whole grid at once with cumulative minima and maxima, so each jump during the search is a constant-time lookup instead of a scan.
+
+    Parameters
+    ----------
+    blocked : nparray
+        a (height, width) boolean array marking the nodes that cannot be entered
+    goal_row : int
+        the row of the goal
+    goal_column : int
+        the column of the goal
+
+    Returns
+    -------
+    A function taking (row, column, row_step, column_step), with exactly one step non-zero, that returns the (row, column) of the jump point reached, or None
+    """
+    height, width = blocked.shape
+    # A border of blocked nodes stands in for the edge of the grid, so every index below is shifted by one
+    padded = np.ones((height + 2, width + 2), dtype=bool)
+    padded[1:-1, 1:-1] = blocked
+    free = ~padded
+    centre = (slice(1, -1), slice(1, -1))
+
+    def shifted(array, row_offset, column_offset):
+        """The values of `array` at (row + row_offset, column + column_offset) for every interior node"""
+        return array[1 + row_offset:height + 1 + row_offset, 1 + column_offset:width + 1 + column_offset]
+
+    tables = {}
+    for row_step, column_step in _ORTHOGONAL_OFFSETS:
+        # A node has a forced neighbour if a node beside it is blocked but the node diagonally ahead of that one is not
+        side_row, side_column = column_step, row_step
+        events = np.zeros_like(padded)
+        events[centre] = free[centre] & (
+            (shifted(padded, side_row, side_column) & shifted(free, side_row + row_step, side_column + column_step)) |
+            (shifted(padded, -side_row, -side_column) & shifted(free, -side_row + row_step, -side_column + column_step)))
+        events[goal_row + 1, goal_column + 1] = free[goal_row + 1, goal_column + 1]
+        stops = events | padded
+
+        axis = 0 if row_step else 1
+        positions = np.arange(stops.shape[axis]).reshape((-1, 1) if axis == 0 else (1, -1))
+        if row_step + column_step > 0:
+            # The first stop at or beyond each node, found by a cumulative minimum running backwards
+            nearest = np.where(stops, positions, stops.shape[axis])
+            nearest = np.flip(np.minimum.accumulate(np.flip(nearest, axis), axis=axis), axis)
+        else:
+            nearest = np.maximum.accumulate(np.where(stops, positions, -1), axis=axis)
+        tables[(row_step, column_step)] = (nearest, events)
+
+    def straight_jump(row, column, row_step, column_step):
+        nearest, events = tables[(row_step, column_step)]
+        # Looks up the first stop after the node itself, in padded coordinates
+        row += 1 + row_step
+        column += 1 + column_step
+        if row_step:
+            row = nearest[row, column]
+        else:
+            column = nearest[row, column]
+        return (int(row) - 1, int(column) - 1) if events[row, column] else None
+
+    return straight_jump
+
+def _jump_point_search(start, goal, blocked, grid):
+    """Runs Jump Point Search between two flat indices on an 8-connected grid where every move has the same cost
+
+    Rather than adding every neighbour to the open set, the search jumps along straight and diagonal lines until it reaches the goal or a node with a forced neighbour (one that can only be reached optimally through that node because an obstacle blocks the alternatives). Only those jump points are expanded. The search is guided by the Chebyshev distance, which never overestimates on this grid, so the route returned is a shortest one. Diagonal moves may pass between two blocked nodes, as they can in A*.
+
+    Returns
+    -------
+    A tuple of the list of flat indices from `start` to `goal`, including every node between consecutive jump points (None if there is no path), the number of nodes expanded and the largest number of entries the open set held
+    """
+    width, height = grid.width, grid.height
+    goal_row, goal_column = divmod(goal, width)
+
+    def free(row, column):
+        return 0 <= row < height and 0 <= column < width and not blocked[row * width + column]
+
+    def heuristic(row, column):
+        # Diagonal moves cost the same as straight ones, so the Chebyshev distance is exact on an empty grid
+        return max(abs(goal_row - row), abs(goal_column - column)) * grid.node_spacing
+
+    straight_jump = _straight_jump_table(blocked.reshape(height, width), goal_row, goal_column)
+
+    def jump(row, column, row_step, column_step):
+        """Steps from a node in one direction until a jump point is found, returning it or None"""
+        if not (row_step and column_step):
+            return straight_jump(row, column, row_step, column_step)
+
+        while True:
+            row += row_step
+            column += column_step
+            if not free(row, column):
+                return None
+            if row == goal_row and column == goal_column:
+                return (row, column)
+            if (not free(row - row_step, column) and free(row - row_step, column + column_step)) or \
+                    (not free(row, column - column_step) and free(row + row_step, column - column_step)):
+                return (row, column)
+            # A diagonal step is a jump point if either of its straight components leads to one
+            if straight_jump(row, column, row_step, 0) is not None or straight_jump(row, column, 0, column_step) is not None:
+                return (row, column)
+
+    def directions(row, column, parent):
+        """Lists the directions worth searching from a node, pruning those that are better reached from its parent"""
+        if parent is None:
+            return _DIAGONAL_OFFSETS
+
+        parent_row, parent_column = divmod(parent, width)
+        row_step = (row > parent_row) - (row < parent_row)
+        column_step = (column > parent_column) - (column < parent_column)
+
+        if row_step and column_step:
+            pruned = [(row_step, column_step), (row_step, 0), (0, column_step)]
+            if not free(row - row_step, column):
+                pruned.append((-row_step, column_step))
+            if not free(row, column - column_step):
+                pruned.append((row_step, -column_step))
+        elif row_step:
+            pruned = [(row_step, 0)]
+            if not free(row, column + 1):
+                pruned.append((row_step, 1))
+            if not free(row, column - 1):
+                pruned.append((row_step, -1))
+        else:
+            pruned = [(0, column_step)]
+            if not free(row + 1, column):
+                pruned.append((1, column_step))
+            if not free(row - 1, column):
+                pruned.append((-1, column_step))
+        return pruned
+
+    start_dist = { start: 0 }
+    parents = {}
+    closed_set = set()
+    expansions = 0
+    peak_open_set = 1
+    counter = itertools.count()
+    # Many routes share the same length when diagonal moves cost as much as straight ones, so ties are broken towards the node furthest from the start
+    open_heap = [(heuristic(*divmod(start, width)), 0, next(counter), 0, start)]
+
+    while open_heap:
+        if len(open_heap) > peak_open_set:
+            peak_open_set = len(open_heap)
+        _, _, _, g_value, current = heapq.heappop(open_heap)
+
+        if current in closed_set or g_value != start_dist[current]:
+            continue
+
+        if current == goal:
+            break
+
+        closed_set.add(current)
+        expansions += 1
+        row, column = divmod(current, width)
+
+        for row_step, column_step in directions(row, column, parents.get(current)):
+            jump_point = jump(row, column, row_step, column_step)
+            if jump_point is None:
+                continue
+
+            jump_row, jump_column = jump_point
+            successor = jump_row * width + jump_column
+            successor_g = g_value + max(abs(jump_row - row), abs(jump_column - column)) * grid.node_spacing
+
+            if successor in start_dist and start_dist[successor] <= successor_g:
+                continue
+
+            closed_set.discard(successor)
+            start_dist[successor] = successor_g
+            parents[successor] = current
+            heapq.heappush(open_heap, (successor_g + heuristic(jump_row, jump_column), -successor_g, next(counter), successor_g, successor))
+
+    jump_points = _trace_parents(start, goal, parents)
+    if jump_points is None:
+        return None, expansions, peak_open_set
+
+    # Fills in the straight or diagonal run of nodes between each pair of jump points
+    indices = jump_points[:1]
+    for previous, current in zip(jump_points, jump_points[1:]):
+        row, column = divmod(previous, width)
+        next_row, next_column = divmod(current, width)
+        row_step = (next_row > row) - (next_row < row)
+        column_step = (next_column > column) - (next_column < column)
+        for step in range(1, max(abs(next_row - row), abs(next_column - column)) + 1):
+            indices.append((row + step * row_step) * width + column + step * column_step)
+    return indices, expansions, peak_open_set
+
+def path_from_indices(grid, indices):
+    """Converts a chain of flat node indices into a path, recording each node's parent on the grid
+
+    Parameters
+    ----------
+    grid : Grid
+        the grid on which the nodes are located
+    indices : list of int
+        the flat indices of the nodes along the path, beginning with the node on which the rover is located
+
+    Returns
+    -------
+    A list of nodes that excludes the first index, as the rover is already there
+    """
+    # Nodes are created before the parents are recorded, as recording them may extend a growable grid and renumber its indices
+    path = [grid.node_from_index(index) for index in indices[1:]]
+    if len(indices) > 1:
+        grid.set_parents(indices[1:], indices[:-1])
+    return path
 
 def _tuple_difference(tuple1, tuple2):
     """Element-wise subtraction of two, two-dimensional tuples
@@ -125,11 +545,133 @@ def stitch_colinear_nodes(start_node, path):
     A list of nodes, containing only the nodes necessary to define the original path
     """
     if len(path) <= 1: 
-        return path
-    
+        return list(path)
+
+    stitched_path = []
     diff = _tuple_difference(path[0].coords, start_node.coords)
-    
+
     for i in range(1, len(path)):
-        if _tuple_difference(path[i].coords, path[i - 1].coords) != diff:
-            return [path[i - 1]] + stitch_colinear_nodes(path[i - 1], path[i:])
-    return [path[-1]]
+        next_diff = _tuple_difference(path[i].coords, path[i - 1].coords)
+        if next_diff != diff:
+            stitched_path.append(path[i - 1])
+            diff = next_diff
+    stitched_path.append(path[-1])
+    return stitched_path
+
+def _supercover(start, end):
+    """Lists every node that a straight line between the centres of two nodes passes through
+
+    Parameters
+    ----------
+    start : (int, int)
+        the row and column of the node at which the line begins
+    end : (int, int)
+        the row and column of the node at which the line ends
+
+    Returns
+    -------
+    Two arrays holding the rows and columns of the nodes. Where the line passes exactly through the corner of a node, both nodes on either side of the corner are included
+    """
+    start = np.array(start, dtype=float)
+    change = np.array(end, dtype=float) - start
+
+    # The fractions of the way along the line at which it crosses from one row or column into the next
+    crossings = [np.array([0.0, 1.0])]
+    for axis in (0, 1):
+        if change[axis] != 0:
+            low, high = sorted((start[axis], start[axis] + change[axis]))
+            boundaries = np.arange(low, high) + 0.5
+            crossings.append((boundaries - start[axis]) / change[axis])
+    crossings = np.unique(np.concatenate(crossings))
+
+    midpoints = (crossings[:-1] + crossings[1:]) / 2
+    nodes = np.floor(start + midpoints[:, np.newaxis] * change + 0.5).astype(np.intp)
+    if len(nodes) == 0:
+        nodes = start.astype(np.intp)[np.newaxis]
+
+    # Consecutive nodes that only touch at a corner also cover the two nodes sharing that corner
+    corner = (nodes[1:, 0] != nodes[:-1, 0]) & (nodes[1:, 1] != nodes[:-1, 1])
+    rows = np.concatenate((nodes[:, 0], nodes[:-1, 0][corner], nodes[1:, 0][corner]))
+    columns = np.concatenate((nodes[:, 1], nodes[1:, 1][corner], nodes[:-1, 1][corner]))
+    return rows, columns
+
+def line_of_sight(grid, start, end, obstacle_index=None, clearance=0.0):
+    """Checks whether the rover can drive in a straight line between two nodes without entering an obstacle or its padding
+
+    The node at `start` is not checked, since the rover may already be standing in padding when it sets off. If `obstacle_index` is given, the line must also keep `clearance` from the obstacles themselves or, if it starts closer than that, get no closer. The padding on the grid still applies, so that a gap in the index can never let a line closer to an obstacle than the nodes it pads
+
+    Parameters
+    ----------
+    grid : Grid or ChunkedGrid
+        the grid holding the obstacle and padding layers
+    start : (int, int)
+        the (row, column) of the node at which the line begins
+    end : (int, int)
+        the (row, column) of the node at which the line ends
+    obstacle_index : ObstacleIndex
+        if given, the positions of the obstacles the line must also keep `clearance` from
+    clearance : float
+        the distance in meters the line must keep from the obstacles in `obstacle_index`
+
+    Returns
+    -------
+    bool
+        whether the line is clear
+    """
+    rows, columns = _supercover(start, end)
+    leaving_start = (rows != start[0]) | (columns != start[1])
+    rows, columns = rows[leaving_start], columns[leaving_start]
+    if (grid.obstacle_layer[rows, columns] | grid.padding_layer[rows, columns]).any():
+        return False
+    if obstacle_index is None:
+        return True
+
+    start_point, end_point = grid.location(*start), grid.location(*end)
+    required = min(clearance, obstacle_index.nearest_distance(start_point, limit=clearance))
+    return obstacle_index.segment_distance(start_point, end_point, required) >= required
+
+def smooth_path(start_node, path, obstacle_index=None, clearance=0.0):
+    """Simplifies a path into the fewest waypoints that can be joined by straight lines clear of obstacles and padding
+
+    Unlike `stitch_colinear_nodes`, which only merges steps in exactly the same direction, a path that zig-zags between straight and diagonal steps is smoothed into a single line wherever every node the line passes through is free. The rover then stops to turn only where it has to go around something.
+
+    A path fed into the function might look like:
+    p p
+        p p
+            p p
+    
+    While the smoothed path would instead be:
+    p _
+        _ _
+            _ p
+
+    Parameters
+    ----------
+    start_node : GridNode
+        The node from which the rover is assumed to begin. As with `stitch_colinear_nodes`, it is not part of the path
+    path : list of GridNode
+        The list of nodes that defines the rover's path
+    obstacle_index : ObstacleIndex
+        If given, lines must also keep `clearance` from the positions of the obstacles it holds, as well as stay out of padded nodes
+    clearance : float
+        The distance in meters each line must keep from the obstacles in `obstacle_index`
+
+    Returns
+    -------
+    A list of nodes, ending with the last node of `path`, where the rover can drive in a straight line from each node to the next
+    """
+    # Only the corners of the path can become waypoints, so the collinear steps are merged first
+    corners = stitch_colinear_nodes(start_node, path)
+    if len(corners) <= 1:
+        return corners
+
+    grid = start_node.grid
+    smoothed_path = []
+    anchor = start_node.coords
+    for i in range(1, len(corners)):
+        # Extends the current line to the next corner for as long as the rover can see it
+        if not line_of_sight(grid, anchor, corners[i].coords, obstacle_index, clearance):
+            smoothed_path.append(corners[i - 1])
+            anchor = corners[i - 1].coords
+    smoothed_path.append(corners[-1])
+    return smoothed_path
@@ -0,0 +1,187 @@
+import threading
+from math import ceil
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import numpy as np
+from grid import Grid
+from inflation import ObstacleInflator
+from locate_obstacles import locate_obstacles_array
+from move_rover import PurePursuit, RateLimiter
+from pathfinding import smooth_path
+from run_course import make_planner
+from errors import NoValidPathError
+
+class _SharedMap:
+    """The live map, which the mapping stage writes to and the planning stage takes snapshots of
+
+    Every access goes through `condition`, whose lock is only ever held for as long as it takes to mark a batch of obstacles or copy the layers, so neither stage waits for the other to think.
+    """
+
+    def __init__(self, grid):
+        self.grid = grid
+        self.version = 0
+        self.condition = threading.Condition()
+
+class _LatestValue:
+    """A slot holding the most recent value published by one stage for another, which readers poll without blocking"""
+
+    def __init__(self, value=None):
+        self._lock = threading.Lock()
+        self._value = value
+
+    def get(self):
+        with self._lock:
+            return self._value
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+def _mapping_stage(shared_map, scans, inflator, stop):
+    """Marks each batch of obstacle positions read by the sensing stage on the live map"""
+    grid = shared_map.grid
+    while not stop.is_set():
+        try:
+            obstacles, rover_point = scans.get(timeout=0.1)
+        except queue.Empty:
+            continue
+
+        rows, columns = grid.nearest_indices(obstacles)
+        with shared_map.condition:
+            # Keeps only the first reading to land on each cell not already marked as an obstacle
+            unmarked = ~grid.obstacle_layer[rows, columns]
+            rows, columns = rows[unmarked], columns[unmarked]
+            if len(rows) == 0:
+                continue
+            _, first_readings = np.unique(np.column_stack((rows, columns)), axis=0, return_index=True)
+            first_readings.sort()
+            rows, columns = rows[first_readings], columns[first_readings]
+
+            grid.obstacle_layer[rows, columns] = True
+            # The rover's own node is never padded, or it could not plan its way out
+            inflator.inflate(grid, rows, columns, keep_clear=grid.nearest_node(rover_point).coords)
+            shared_map.version += 1
+            shared_map.condition.notify_all()
+
+def _planning_stage(shared_map, planning_grid, find_path, rover_pose, routes, stop, verbose):
+    """Copies the live map into the planner's own grid whenever it changes, and publishes a new route from the rover's latest position"""
+    planned_version = None
+    while not stop.is_set():
+        with shared_map.condition:
+            if shared_map.version == planned_version:
+                shared_map.condition.wait(0.1)
+                continue
+            planned_version = shared_map.version
+            planning_grid.obstacle_layer[:] = shared_map.grid.obstacle_layer
+            planning_grid.padding_layer[:] = shared_map.grid.padding_layer
+
+        rover_node = planning_grid.nearest_node(rover_pose.get())
+        try:
+            path = find_path(rover_node)
+        except NoValidPathError:
+            if verbose: print("ERROR: NO ROUTE FOUND.\nREDRAWING GRID")
+            with shared_map.condition:
+                shared_map.grid.clear_obstacles()
+                shared_map.version += 1
+            continue
+
+        waypoints = [planning_grid.location(*node.coords) for node in smooth_path(rover_node, path)]
+        if verbose:
+            print("Planned a route through {} waypoints for map version {}".format(len(waypoints), planned_version))
+        routes.set((planned_version, waypoints))
+
+def _run_stage(target, errors, *args):
+    """Runs a stage, keeping any exception it raises so that the control stage can raise it in turn"""
+    try:
+        target(*args)
+    except Exception as error:
+        errors.append(error)
+
+def run_course_pipelined(rover, end_point, node_spacing=0.4, include_diagonals=True, euclidean=True, verbose=False, sensors_to_ignore=[7], obstacle_padding=0.4, buffer_distance=5.0, planner="astar", control_rate=20.0, obstacle_check_rate=5.0, realtime=True):
+    """Navigates the rover to a specified endpoint, with sensing, mapping, planning and control running as separate stages so that the rover keeps moving while routes are recalculated
+
+    The calling thread is the control stage, and is the only one that talks to the rover. At a fixed rate it steers the rover along the latest route with a PurePursuit controller, and at `obstacle_check_rate` it reads the LiDAR and queues the obstacle positions for the mapping stage. The mapping stage marks them on the live map, and the planning stage, which plans on its own copy of the grid, takes a snapshot of the live map whenever it changes and publishes a new route. The control stage switches to each new route as soon as it is published, and until then keeps following the previous one, so the rover never stops to wait for the planner except before the first route.
+
+    Parameters
+    ----------
+    rover : Rover
+        the rover to be navigated through the obstacles
+    end_point : tuple
+        the coordinates of the rover's intended destination
+    node_spacing : float
+        the distance between nodes on the grid
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    euclidean : bool
+        whether or not euclidean distance should be used as the heuristic function when running A*
+    verbose : bool
+        whether or not to include verbose logging
+    sensors_to_ignore : list of ints
+        indices of LiDAR sensors to be ignored by the rover
+    obstacle_padding : float
+        the amount of distance from each obstacle the rover should maintain
+    buffer_distance : float
+        the amount of distance in each direction by which the grid should be extended beyond what is necessary to fit both the rover and its destination
+    planner : str
+        the algorithm used to plan routes; one of `run_course.PLANNERS`
+    control_rate : float
+        the number of commands per second sent to the rover
+    obstacle_check_rate : float
+        the number of times per second the LiDAR is read and passed to the mapping stage
+    realtime : bool
+        whether or not the control stage waits between commands to hold `control_rate`
+    """
+    start_point = (rover.x, rover.y)
+    live_grid = Grid.oversized_grid(start_point, end_point, node_spacing=node_spacing, buffer_distance=buffer_distance)
+    # The planner keeps its own grid, so that the map can change while it searches
+    planning_grid = Grid.oversized_grid(start_point, end_point, node_spacing=node_spacing, buffer_distance=buffer_distance)
+    end_node = planning_grid.nearest_node(end_point)
+    find_path = make_planner(planner, planning_grid, end_node, include_diagonals=include_diagonals, euclidean=euclidean, verbose=verbose)
+    inflator = ObstacleInflator(int(ceil(float(obstacle_padding) / live_grid.node_spacing)))
+
+    shared_map = _SharedMap(live_grid)
+    scans = queue.Queue()
+    rover_pose = _LatestValue(start_point)
+    routes = _LatestValue()
+    stop = threading.Event()
+    errors = []
+    stages = [threading.Thread(target=_run_stage, args=(_mapping_stage, errors, shared_map, scans, inflator, stop)),
+              threading.Thread(target=_run_stage, args=(_planning_stage, errors, shared_map, planning_grid, find_path, rover_pose, routes, stop, verbose))]
+    for stage in stages:
+        stage.daemon = True
+        stage.start()
+
+    limiter = RateLimiter(control_rate, obstacle_check_rate, realtime)
+    controller = None
+    route_version = None
+
+    try:
+        while True:
+            if errors:
+                raise errors[0]
+
+            rover_pose.set((rover.x, rover.y))
+            if limiter.obstacle_check_due():
+                scans.put((locate_obstacles_array(rover, sensors_to_ignore=sensors_to_ignore), (rover.x, rover.y)))
+
+            route = routes.get()
+            if route is not None and route[0] != route_version:
+                route_version, waypoints = route
+                controller = PurePursuit((rover.x, rover.y), waypoints)
+                if verbose:
+                    print("Following {} waypoints from {}".format(len(waypoints), (round(rover.x, 2), round(rover.y, 2))))
+
+            command = (0, 0) if controller is None else controller.command(rover.x, rover.y, rover.heading)
+            if command is None:
+                # Every route ends at the destination, so finishing one means the rover has arrived
+                break
+            rover.send_command(*command)
+            limiter.wait()
+    finally:
+        stop.set()
+        for stage in stages:
+            stage.join()
+
+    rover.send_command(0, 0)
@@ -0,0 +1,442 @@
+import heapq
+import itertools
+from math import ceil, log
+import numpy as np
+from errors import NoValidPathError
+
+FREE = 0
+PADDING = 1
+OBSTACLE = 2
+
+class QuadtreeMap:
+    """A map that keeps open ground as large square cells and only splits them down to single nodes around obstacles and padding
+
+    The map covers a square of `size` by `size` nodes, each `node_spacing` wide, laid out like the nodes of a Grid with the same `start`. Its leaves are squares of 2 ** level nodes on a side, keyed by (level, row, column) where row and column count squares of that size. Only the leaves themselves are stored, in a dictionary: open ground is a handful of large free leaves, and every node marked as an obstacle or padding is a leaf of level 0. Memory and the work of searching the map therefore grow with the number of obstacles rather than with the area covered.
+
+    Attributes
+    ----------
+    start : (float, float)
+        the physical location of the node at row 0 and column 0
+    node_spacing : float
+        the length of each node in meters
+    depth : int
+        the level of the single leaf covering an empty map
+    size : int
+        the number of nodes along each side of the map, which is 2 ** depth
+    leaves : int
+        the number of leaves the map is currently split into
+
+    Methods
+    -------
+    @staticmethod
+    from_grid(grid)
+        Creates a map holding the obstacles and padding of a Grid
+    mark(rows, columns, state=OBSTACLE)
+        Marks nodes as obstacles or padding, splitting the leaves they fall in
+    mark_obstacles(rows, columns, inflator=None, keep_clear=None)
+        Marks nodes as obstacles and pads them
+    clear_obstacles()
+        Forgets every obstacle and all padding, merging the map back into a single leaf
+    nearest_indices(points)
+        Finds the row and column of the node nearest to each of an array of points
+    location(row, column)
+        Finds the physical position of a node
+    leaf_at(row, column)
+        Finds the leaf containing a node
+    leaf_centre(leaf)
+        Finds the physical position of the centre of a leaf
+    is_blocked(leaf)
+        Determines whether a leaf is an obstacle or padding
+    neighbours(leaf, include_diagonals=True)
+        Lists the leaves that touch a leaf
+    quickest_path(start_point, end_point, include_diagonals=True, verbose=False, stats=None)
+        Finds a short route between two points through the free leaves
+    """
+
+    def __init__(self, start, end, node_spacing=1.0):
+        """Initializes a new, empty QuadtreeMap instance.
+
+        Parameters
+        ----------
+        start : (float, float)
+            the physical location of the node at row 0 and column 0
+        end : (float, float)
+            a point that must lie on the map. The map is square and its side a power of two nodes long, so it usually extends beyond `end`
+        node_spacing : float
+            the length of each node in meters
+        """
+        self.start = start
+        self.node_spacing = node_spacing
+        nodes = max(int(ceil(abs(float(end[axis] - start[axis]) / node_spacing))) + 1 for axis in (0, 1))
+        self.depth = int(ceil(log(nodes, 2))) if nodes > 1 else 0
+        self.size = 2 ** self.depth
+        self._leaves = { (self.depth, 0, 0): FREE }
+
+    @staticmethod
+    def from_grid(grid):
+        """Creates a map holding the obstacles and padding of a Grid
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid whose obstacle and padding layers are copied
+
+        Returns
+        -------
+        A new QuadtreeMap with the same start and node spacing, covering the whole grid
+        """
+        quadtree = QuadtreeMap(grid.start, grid.location(grid.height - 1, grid.width - 1), node_spacing=grid.node_spacing)
+        # A Grid spreads its nodes evenly between its corners, which can leave them slightly closer together than `node_spacing`, so nodes are matched up by position
+        for layer, state in ((grid.padding_layer & ~grid.obstacle_layer, PADDING), (grid.obstacle_layer, OBSTACLE)):
+            rows, columns = np.nonzero(layer)
+            quadtree.mark(*quadtree.nearest_indices(grid.locations(rows, columns)), state=state)
+        return quadtree
+
+    @property
+    def leaves(self):
+        return len(self._leaves)
+
+    def leaf_at(self, row, column):
+        """Finds the leaf containing a node
+
+        Parameters
+        ----------
+        row : int
+            the row of the node
+        column : int
+            the column of the node
+
+        Returns
+        -------
+        The (level, row, column) key of the leaf, or None if the node is off the map
+        """
+        if not (0 <= row < self.size and 0 <= column < self.size):
+            return None
+        leaves = self._leaves
+        for level in range(self.depth + 1):
+            key = (level, row >> level, column >> level)
+            if key in leaves:
+                return key
+        return None
+
+    def _split(self, row, column):
+        """Splits the leaf containing a node until the node is a leaf of its own, returning its key"""
+        leaf = self.leaf_at(row, column)
+        level, leaf_row, leaf_column = leaf
+        if level == 0:
+            return leaf
+        state = self._leaves.pop(leaf)
+        for level in range(level - 1, -1, -1):
+            parent_row, parent_column = row >> (level + 1), column >> (level + 1)
+            for child_row in (2 * parent_row, 2 * parent_row + 1):
+                for child_column in (2 * parent_column, 2 * parent_column + 1):
+                    self._leaves[(level, child_row, child_column)] = state
+            # The child holding the node is split further until level 0, where it stays a leaf
+            if level > 0:
+                del self._leaves[(level, row >> level, column >> level)]
+        return (0, row, column)
+
+    def mark(self, rows, columns, state=OBSTACLE):
+        """Marks nodes as obstacles or padding, splitting the leaves they fall in
+
+        Parameters
+        ----------
+        rows : array_like
+            the rows of the nodes
+        columns : array_like
+            the columns of the nodes
+        state : int
+            `OBSTACLE` or `PADDING`. A node that is already an obstacle stays one
+        """
+        rows = np.asarray(rows, dtype=np.intp).ravel()
+        columns = np.asarray(columns, dtype=np.intp).ravel()
+        on_map = (rows >= 0) & (rows < self.size) & (columns >= 0) & (columns < self.size)
+        leaves = self._leaves
+        for row, column in zip(rows[on_map].tolist(), columns[on_map].tolist()):
+            key = (0, row, column)
+            if leaves.get(key, FREE) >= state:
+                continue
+            if key not in leaves:
+                key = self._split(row, column)
+            leaves[key] = state
+
+    def mark_obstacles(self, rows, columns, inflator=None, keep_clear=None):
+        """Marks nodes as obstacles and pads them
+
+        Parameters
+        ----------
+        rows : array_like
+            the rows of the new obstacles
+        columns : array_like
+            the columns of the new obstacles
+        inflator : ObstacleInflator
+            if given, its kernel is stamped around every obstacle as padding
+        keep_clear : (int, int)
+            the row and column of a node, such as the one the rover is on, that must not become padding. A node that was already padding is left as it was
+        """
+        rows = np.asarray(rows, dtype=np.intp).reshape(-1, 1)
+        columns = np.asarray(columns, dtype=np.intp).reshape(-1, 1)
+        if inflator is not None:
+            padded_rows = (rows + inflator.row_offsets).ravel()
+            padded_columns = (columns + inflator.column_offsets).ravel()
+            if keep_clear is not None and self._leaves.get((0,) + tuple(keep_clear), FREE) == FREE:
+                keep = (padded_rows != keep_clear[0]) | (padded_columns != keep_clear[1])
+                padded_rows, padded_columns = padded_rows[keep], padded_columns[keep]
+            self.mark(padded_rows, padded_columns, state=PADDING)
+        self.mark(rows, columns)
+
+    def clear_obstacles(self):
+        """Forgets every obstacle and all padding, merging the map back into a single leaf"""
+        self._leaves = { (self.depth, 0, 0): FREE }
+
+    def nearest_indices(self, points):
+        """Finds the row and column of the node nearest to each of an array of points
+
+        Parameters
+        ----------
+        points : array_like
+            an (M, 2) array of (x, y) points
+
+        Returns
+        -------
+        A tuple of two integer arrays of length M. Points off the map are given the nearest node on its edge
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        rows = np.rint((points[:, 1] - self.start[1]) / self.node_spacing)
+        columns = np.rint((points[:, 0] - self.start[0]) / self.node_spacing)
+        return np.clip(rows, 0, self.size - 1).astype(np.intp), np.clip(columns, 0, self.size - 1).astype(np.intp)
+
+    def location(self, row, column):
+        """Finds the physical position of a node
+
+        Parameters
+        ----------
+        row : int
+            the row of the node
+        column : int
+            the column of the node
+
+        Returns
+        -------
+        A tuple containing the physical location of the node
+        """
+        return (self.start[0] + column * self.node_spacing, self.start[1] + row * self.node_spacing)
+
+    def leaf_centre(self, leaf):
+        """Finds the physical position of the centre of a leaf
+
+        Parameters
+        ----------
+        leaf : (int, int, int)
+            the (level, row, column) key of the leaf
+
+        Returns
+        -------
+        A tuple containing the physical location of the centre
+        """
+        level, row, column = leaf
+        # A leaf's nodes run from row * 2 ** level to one short of (row + 1) * 2 ** level, and its centre lies halfway between the first and last
+        offset = (2 ** level - 1) / 2.0
+        return self.location((row << level) + offset, (column << level) + offset)
+
+    def is_blocked(self, leaf):
+        """Determines whether a leaf is an obstacle or padding
+
+        Parameters
+        ----------
+        leaf : (int, int, int)
+            the (level, row, column) key of the leaf
+
+        Returns
+        -------
+        bool
+        """
+        return self._leaves[leaf] != FREE
+
+    def neighbours(self, leaf, include_diagonals=True):
+        """Lists the leaves that touch a leaf
+
+        Each side of the leaf is walked one neighbouring leaf at a time, so a large leaf beside open ground has only a few neighbours, while one beside finely split ground has one for every small leaf along its side.
+
+        Parameters
+        ----------
+        leaf : (int, int, int)
+            the (level, row, column) key of the leaf
+        include_diagonals : bool
+            whether or not leaves that only touch at a corner are included
+
+        Returns
+        -------
+        A list of the (level, row, column) keys of the neighbouring leaves
+        """
+        level, row, column = leaf
+        length = 2 ** level
+        first_row, first_column = row << level, column << level
+        last_row, last_column = first_row + length - 1, first_column + length - 1
+
+        found = []
+        # Each side is given by the node just beyond it and the direction to walk along it
+        for fixed_row, fixed_column, along_rows in ((first_row - 1, first_column, False), (last_row + 1, first_column, False),
+                                                    (first_row, first_column - 1, True), (first_row, last_column + 1, True)):
+            position = 0
+            while position < length:
+                neighbour = self.leaf_at(fixed_row + position, fixed_column) if along_rows else self.leaf_at(fixed_row, fixed_column + position)
+                if neighbour is None:
+                    break
+                found.append(neighbour)
+                # Skips to the first node beyond the end of the neighbour just found
+                neighbour_level, neighbour_row, neighbour_column = neighbour
+                if along_rows:
+                    position = ((neighbour_row + 1) << neighbour_level) - first_row
+                else:
+                    position = ((neighbour_column + 1) << neighbour_level) - first_column
+        if include_diagonals:
+            for corner_row, corner_column in ((first_row - 1, first_column - 1), (first_row - 1, last_column + 1),
+                                              (last_row + 1, first_column - 1), (last_row + 1, last_column + 1)):
+                neighbour = self.leaf_at(corner_row, corner_column)
+                if neighbour is not None:
+                    found.append(neighbour)
+        # A leaf larger than this one can touch it along a side and at a corner
+        return list(set(found)) if include_diagonals else found
+
+    def _leaf_box(self, leaf):
+        """Returns the lowest and highest x and y covered by a leaf"""
+        level, row, column = leaf
+        half = self.node_spacing / 2.0
+        low_x, low_y = self.location(row << level, column << level)
+        high_x, high_y = self.location(((row + 1) << level) - 1, ((column + 1) << level) - 1)
+        return low_x - half, low_y - half, high_x + half, high_y + half
+
+    def _line_of_sight(self, point1, point2):
+        """Checks whether a straight line between two points stays in free leaves, walking it one leaf at a time
+
+        The leaf the line starts in is not checked, since the rover may already be standing in padding when it sets off
+        """
+        start = np.array(point1, dtype=float)
+        change = np.array(point2, dtype=float) - start
+        length = float(np.hypot(*change))
+        if length == 0:
+            return True
+        # A small step past each leaf's edge lands the next point in the leaf beyond it
+        nudge = 1e-6 * self.node_spacing / length
+        fraction = 0.0
+        first = True
+        while fraction < 1.0:
+            x, y = start + fraction * change
+            rows, columns = self.nearest_indices((x, y))
+            leaf = self.leaf_at(int(rows[0]), int(columns[0]))
+            if not first and self._leaves[leaf] != FREE:
+                return False
+            first = False
+            low_x, low_y, high_x, high_y = self._leaf_box(leaf)
+            exits = [1.0]
+            if change[0] > 0:
+                exits.append((high_x - start[0]) / change[0])
+            elif change[0] < 0:
+                exits.append((low_x - start[0]) / change[0])
+            if change[1] > 0:
+                exits.append((high_y - start[1]) / change[1])
+            elif change[1] < 0:
+                exits.append((low_y - start[1]) / change[1])
+            fraction = max(min(exits), fraction) + nudge
+        # The end point itself must lie in a free leaf
+        rows, columns = self.nearest_indices(point2)
+        return self._leaves[self.leaf_at(int(rows[0]), int(columns[0]))] == FREE
+
+    def quickest_path(self, start_point, end_point, include_diagonals=True, verbose=False, stats=None):
+        """Finds a short route between two points through the free leaves
+
+        A* is run over the leaves, moving between the centres of neighbouring leaves and guided by the straight-line distance to the end point's leaf. Crossing open ground takes a single step per large leaf, so the search expands a number of leaves that follows the obstacles near the route rather than its length. The centres it passes through are then pulled tight, dropping every one that a straight line can skip without leaving the free leaves.
+
+        Parameters
+        ----------
+        start_point : (float, float)
+            the point the rover begins at, which may lie in padding
+        end_point : (float, float)
+            the point the rover should reach
+        include_diagonals : bool
+            whether or not the route may pass between leaves that only touch at a corner
+        verbose : bool
+            whether or not to log when a path is found
+        stats : dict
+            if given, the number of leaves expanded is added to its "expansions" entry, and its "peak_open_set" entry is raised to the largest number of entries the open set held
+
+        Returns
+        -------
+        list
+            A list of (x, y) points leading from `start_point` to `end_point`, excluding `start_point`, that can be driven between in straight lines
+
+        Raises
+        ------
+        NoValidPathError
+            If no viable path is found
+        """
+        (start_row, end_row), (start_column, end_column) = self.nearest_indices([start_point, end_point])
+        start = self.leaf_at(int(start_row), int(start_column))
+        goal = self.leaf_at(int(end_row), int(end_column))
+        goal_x, goal_y = self.leaf_centre(goal)
+        leaves = self._leaves
+
+        def heuristic(leaf):
+            x, y = self.leaf_centre(leaf)
+            return ((goal_x - x) ** 2 + (goal_y - y) ** 2) ** 0.5
+
+        start_dist = { start: 0.0 }
+        parents = {}
+        closed_set = set()
+        expansions = 0
+        peak_open_set = 1
+        counter = itertools.count()
+        open_heap = [(heuristic(start), next(counter), 0.0, start)]
+        found = leaves[goal] == FREE or goal == start
+
+        while open_heap and found:
+            if len(open_heap) > peak_open_set:
+                peak_open_set = len(open_heap)
+            _, _, g_value, current = heapq.heappop(open_heap)
+            if current in closed_set or g_value != start_dist[current]:
+                continue
+            if current == goal:
+                break
+
+            closed_set.add(current)
+            expansions += 1
+            x, y = self.leaf_centre(current)
+            for neighbour in self.neighbours(current, include_diagonals):
+                if leaves[neighbour] != FREE:
+                    continue
+                neighbour_x, neighbour_y = self.leaf_centre(neighbour)
+                neighbour_g = g_value + ((neighbour_x - x) ** 2 + (neighbour_y - y) ** 2) ** 0.5
+                if neighbour in start_dist and start_dist[neighbour] <= neighbour_g:
+                    continue
+                closed_set.discard(neighbour)
+                start_dist[neighbour] = neighbour_g
+                parents[neighbour] = current
+                heapq.heappush(open_heap, (neighbour_g + heuristic(neighbour), next(counter), neighbour_g, neighbour))
+
+        if stats is not None:
+            stats["expansions"] = stats.get("expansions", 0) + expansions
+            stats["peak_open_set"] = max(stats.get("peak_open_set", 0), peak_open_set)
+
+        if not found or (goal != start and goal not in parents):
+            print("Viable path was not found")
+            raise NoValidPathError
+
+        if verbose:
+            print("Found a valid path")
+
+        chain = [goal]
+        while chain[-1] != start:
+            chain.append(parents[chain[-1]])
+        # A line from a point inside a leaf to the centre of the next can clip a third leaf at a corner, so the route also passes through the centres of the start and goal leaves
+        corners = [self.leaf_centre(leaf) for leaf in reversed(chain)] + [tuple(end_point)]
+
+        # Extends the current line to the next corner for as long as it stays in free leaves, as `smooth_path` does on a Grid
+        waypoints = []
+        anchor = tuple(start_point)
+        for i in range(1, len(corners)):
+            if not self._line_of_sight(anchor, corners[i]):
+                waypoints.append(corners[i - 1])
+                anchor = corners[i - 1]
+        waypoints.append(corners[-1])
+        return waypoints
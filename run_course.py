@@ -1,12 +1,90 @@
-from pathfinding import quickest_path, stitch_colinear_nodes
-from move_rover import move_rover
-from locate_obstacles import locate_obstacles
-from grid_node import distance, neighbouring_nodes
+from pathfinding import quickest_path, smooth_path
+from incremental_planner import DStarLite
+from hierarchical_planner import HierarchicalPlanner
+from wavefront_planner import WavefrontPlanner
+from anytime_planner import AnytimePlanner
+from move_rover import move_rover, follow_path
+from locate_obstacles import ScanFilter
+from occupancy import OccupancyMap
+from obstacle_index import ClearanceFilter
+from inflation import ObstacleInflator
 from grid import Grid
+from chunked_grid import ChunkedGrid
 from math import ceil
-from errors import ObseleteGridError, NoValidPathError
+from instrumentation import NullStats
+from backup_routes import BackupRoutes, resume_route, route_coords, route_length
+import numpy as np
+from errors import ObseleteGridError, NoValidPathError, PlanningTimeoutError
 
-def run_course(rover, end_point, node_spacing=0.4, include_diagonals=True, euclidean=True, verbose=False, sensors_to_ignore=[7], obstacle_padding=0.4, buffer_distance=5.0):
+PLANNERS = ["astar", "jps", "bidirectional", "dstar_lite", "hpa", "wavefront", "anytime"]
+MAP_TYPES = ["fixed", "chunked"]
+MAPPINGS = ["binary", "log_odds"]
+CLEARANCES = ["cells", "exact"]
+CONTROLLERS = ["pure_pursuit", "stop_and_turn"]
+# How much longer than the blocked route a backup route may be before a fresh route is planned instead
+BACKUP_DETOUR = 1.1
+
+def make_planner(planner, grid, end_node, include_diagonals=True, euclidean=True, verbose=False, time_budget=None, stats=None):
+    """Creates a function that plans a path from any node on the grid to `end_node`
+
+    Parameters
+    ----------
+    planner : str
+        the name of the planner to use; one of `PLANNERS`
+    grid : Grid or ChunkedGrid
+        the grid on which paths are planned
+    end_node : GridNode
+        the node every path leads to
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    euclidean : bool
+        whether the "astar" planner uses the Euclidean distance (True) or the Manhattan distance (False) as its heuristic
+    verbose : bool
+        whether or not to log when a path is found
+    time_budget : float
+        the number of milliseconds each search may spend, which only the "anytime" planner can keep to
+    stats : dict
+        if given, the number of nodes each search expands is added to its "expansions" entry, and its "peak_open_set" entry is raised to the largest open set the planner has held
+
+    Returns
+    -------
+    A function that takes the node on which the rover is located and returns a list of nodes leading to `end_node`
+    """
+    if planner == "astar":
+        return lambda node: quickest_path(node, end_node, grid, include_diagonals=include_diagonals, euclidean=euclidean, verbose=verbose, stats=stats)
+    elif planner == "jps":
+        return lambda node: quickest_path(node, end_node, grid, include_diagonals=include_diagonals, verbose=verbose, algorithm="jps", stats=stats)
+    elif planner == "bidirectional":
+        return lambda node: quickest_path(node, end_node, grid, include_diagonals=include_diagonals, verbose=verbose, algorithm="bidirectional", stats=stats)
+    elif planner == "dstar_lite":
+        if not isinstance(grid, Grid):
+            raise ValueError("The dstar_lite planner requires a fixed-size Grid")
+        return _counting_expansions(DStarLite(grid, end_node, include_diagonals=include_diagonals), verbose, stats)
+    elif planner == "hpa":
+        if not isinstance(grid, Grid):
+            raise ValueError("The hpa planner requires a fixed-size Grid")
+        return _counting_expansions(HierarchicalPlanner(grid, end_node, include_diagonals=include_diagonals), verbose, stats)
+    elif planner == "wavefront":
+        if not isinstance(grid, Grid):
+            raise ValueError("The wavefront planner requires a fixed-size Grid")
+        return _counting_expansions(WavefrontPlanner(grid, end_node, include_diagonals=include_diagonals), verbose, stats)
+    elif planner == "anytime":
+        return _counting_expansions(AnytimePlanner(grid, end_node, include_diagonals=include_diagonals, time_budget=time_budget), verbose, stats)
+    raise ValueError("Unknown planner {!r}; expected one of {}".format(planner, PLANNERS))
+
+def _counting_expansions(stateful_planner, verbose, stats):
+    """Wraps a planner that keeps its own count of expansions, such as DStarLite, so that each search adds to `stats` as `quickest_path` does"""
+    def find_path(node):
+        expansions = stateful_planner.expansions
+        try:
+            return stateful_planner.quickest_path(node, verbose=verbose)
+        finally:
+            if stats is not None:
+                stats["expansions"] = stats.get("expansions", 0) + stateful_planner.expansions - expansions
+                stats["peak_open_set"] = max(stats.get("peak_open_set", 0), stateful_planner.peak_open_set)
+    return find_path
+
+def run_course(rover, end_point, node_spacing=0.4, include_diagonals=True, euclidean=True, verbose=False, sensors_to_ignore=[7], obstacle_padding=0.4, buffer_distance=5.0, planner="astar", map_type="fixed", controller="pure_pursuit", control_rate=20.0, obstacle_check_rate=5.0, realtime=True, backup_routes=2, mapping="binary", replan_budget=None, clearance="cells", grid=None, map_file=None, stats=None):
     """Navigates the rover from its current location to a specified endpoint
 
     Parameters
@@ -26,84 +104,245 @@ def run_course(rover, end_point, node_spacing=0.4, include_diagonals=True, eucli
     sensors_to_ignore : list of ints
         indices of LiDAR sensors to be ignored by the rover. This is set to [7] by default, as the Gazebo simulation of the QSET picks up erroneous readings from that specific sensor
     obstacle_padding : float
-        the amount of distance from each obstacle the rover should maintain. The higher this value, the higher the likelihood of the rover seeing no valid paths
+        the amount of distance from each obstacle the rover should maintain. With "cells" clearance, every node whose centre is within this distance (rounded up to a whole number of nodes) of the node an obstacle fell in is treated as padding, and with "exact" clearance the padding is measured from the obstacle itself. The higher this value, the higher the likelihood of the rover seeing no valid paths
     buffer_distance : float
-        the amount of distance in each direction by which the grid should be extended beyond what is necessary to fit both the rover and its destination
+        the amount of distance in each direction by which the grid should be extended beyond what is necessary to fit both the rover and its destination. This is ignored when `map_type` is "chunked"
+    planner : str
+        the algorithm used to plan routes. "astar" searches from scratch every time the route is recalculated. "jps" also searches from scratch, using Jump Point Search to find a shortest route with fewer expansions on open ground, and requires `include_diagonals`. "bidirectional" also searches from scratch, from the rover and the destination at once, and finds a shortest route while quickly giving up when the rover or the destination is boxed in by padding. "dstar_lite" keeps its search between recalculations and only repairs the parts affected by new obstacles. "hpa" plans over an abstract graph of grid clusters and only rebuilds the clusters that new obstacles fall in, which keeps recalculations fast on long courses at the cost of routes that are slightly longer than the shortest. "wavefront" keeps the distance from every node to the destination and updates it as obstacles appear, so that a route from wherever the rover ends up is read off without searching. "anytime" returns the best route it can find within `replan_budget`, starting from one at most three times as long as the shortest and improving it for as long as the budget allows, and like "dstar_lite" repairs its search as the rover moves and obstacles appear. "dstar_lite", "hpa" and "wavefront" require a "fixed" map
+    map_type : str
+        the kind of map the rover builds. "fixed" uses a Grid bounded by the start and end points plus `buffer_distance`, while "chunked" uses a ChunkedGrid that grows in tiles wherever the rover goes, so detours are never cut off by the edge of the map
+    controller : str
+        how the rover drives along its route. "pure_pursuit" follows the whole route at once, steering along curves through the waypoints without stopping at them, while "stop_and_turn" drives to one waypoint at a time, turning on the spot to face each one
+    control_rate : float
+        the number of commands per second sent to the rover by the "pure_pursuit" controller
+    obstacle_check_rate : float
+        the number of times per second the "pure_pursuit" controller checks the LiDAR for obstacles that are not yet on the grid
+    realtime : bool
+        whether or not the "pure_pursuit" controller waits between commands to hold `control_rate`. A simulated rover that advances its own clock with every command, such as SimulatedRover, can run faster than real time without it
+    backup_routes : int
+        the number of alternative routes to plan in the background after each route is found. When new obstacles appear, the rover keeps to its current route if they missed it, and otherwise switches to the first alternative that is still clear and at most `BACKUP_DETOUR` times as long as what remained of it, only stopping to plan a new route if all of them are blocked. If 0, a new route is planned whenever new obstacles are found
+    mapping : str
+        how LiDAR readings become obstacles. "binary" marks a node as an obstacle the first time a reading lands in it, and clears the whole map when no route can be found. "log_odds" keeps an OccupancyMap, which ray casts every sweep so that nodes the rays pass through lose evidence, removes readings that turn out to be spurious along with their padding, and only fades obstacles that have not been observed recently when no route can be found. "log_odds" requires a "fixed" map
+    replan_budget : float
+        the longest time in milliseconds the "anytime" planner may spend finding each route, which bounds how long the rover takes to react to new obstacles however large the map is. Whenever the budget runs out before any route has been found, the rover stops where it is and the search carries on in the next iteration, after the rover has looked for obstacles again. If None, the planner always finds a shortest route. Only the "anytime" planner accepts a budget
+    clearance : str
+        how the distance to obstacles is measured. "cells" pads every node within `obstacle_padding` of the node an obstacle fell in, rounded up to whole nodes, and smooths routes through nodes that are free of padding. "exact" keeps the raw position of every obstacle in an ObstacleIndex and pads the nodes whose centres are close enough to those positions that a step to or from them could come within `obstacle_padding`, so padding is no longer rounded up to whole nodes and gaps it would close stay open wherever every step through them keeps its clearance. That clearance is from the surfaces the LiDAR has seen, without the margin rounding up adds around them. Smoothed lines must then both stay out of padding and keep `obstacle_padding` from the obstacles themselves, and new obstacles seen while driving only stop the rover if they pad over the rest of its route or come within `obstacle_padding` of it, rather than whenever any are seen. "exact" requires a "fixed" map and "binary" mapping
+    grid : Grid or ChunkedGrid
+        a map to navigate on and record obstacles in, such as one kept from an earlier course so that its obstacles are known from the start. It must cover both the rover and `end_point`. If given, `map_type`, `node_spacing` and `buffer_distance` are ignored
+    map_file : MapFile
+        if given, every obstacle found and the padding around it are recorded in the file as soon as they are marked, so that a later run can start with them. Unless `grid` is given, the run also starts from the map stored in the file, which must cover both the rover and `end_point`. Grid resets after no route could be found are not recorded
+    stats : RunStats
+        if given, records the time spent in each phase of every iteration of the navigation loop, along with counts of replans, node expansions, obstacles and resets. A summary is printed at the end of the run if `verbose` is set
     """
+    if controller not in CONTROLLERS:
+        raise ValueError("Unknown controller {!r}; expected one of {}".format(controller, CONTROLLERS))
+    if mapping not in MAPPINGS:
+        raise ValueError("Unknown mapping {!r}; expected one of {}".format(mapping, MAPPINGS))
+    if replan_budget is not None and planner != "anytime":
+        raise ValueError("Only the anytime planner can keep to a replan budget, not {!r}".format(planner))
+    if clearance not in CLEARANCES:
+        raise ValueError("Unknown clearance {!r}; expected one of {}".format(clearance, CLEARANCES))
+    if clearance == "exact" and mapping != "binary":
+        raise ValueError("Exact clearance requires binary mapping, not {!r}".format(mapping))
+
+    print_summary = verbose and stats is not None
+    if stats is None:
+        stats = NullStats()
+
     recalculate_route = False
     start_point = (rover.x, rover.y)
 
-    # Grid is oversized in case obstacles force the rover's path away from a straight line
-    grid = Grid.oversized_grid(start_point, end_point, node_spacing=node_spacing, buffer_distance=buffer_distance)
+    stats.begin_iteration()
+    if grid is None and map_file is not None:
+        grid = map_file.load()
+    elif grid is None:
+        if map_type == "fixed":
+            # Grid is oversized in case obstacles force the rover's path away from a straight line
+            grid = Grid.oversized_grid(start_point, end_point, node_spacing=node_spacing, buffer_distance=buffer_distance)
+        elif map_type == "chunked":
+            grid = ChunkedGrid(start_point, node_spacing=node_spacing)
+        else:
+            raise ValueError("Unknown map type {!r}; expected one of {}".format(map_type, MAP_TYPES))
 
     start_node = grid.nearest_node(start_point)
     end_node = grid.nearest_node(end_point)
+    # Calculates the appropriate amount of padding to give each obstacle
+    inflator = ObstacleInflator(int(ceil(float(obstacle_padding) / grid.node_spacing)))
+    find_path = make_planner(planner, grid, end_node, include_diagonals=include_diagonals, euclidean=euclidean, verbose=verbose, time_budget=replan_budget, stats=stats.counters)
+    if mapping == "log_odds":
+        # Marks and pads obstacles itself, and also removes them, so it stands in for the scan filter
+        occupancy = OccupancyMap(grid, inflator, sensors_to_ignore=sensors_to_ignore)
+        scan_filter = occupancy
+    elif clearance == "exact":
+        # Marks and pads obstacles itself from their raw positions, which it keeps for checking routes against
+        occupancy = None
+        scan_filter = ClearanceFilter(grid, obstacle_padding, sensors_to_ignore=sensors_to_ignore, include_diagonals=include_diagonals)
+    else:
+        occupancy = None
+        scan_filter = ScanFilter(grid, sensors_to_ignore=sensors_to_ignore)
+    obstacle_index = scan_filter.index if clearance == "exact" else None
+    filter_marks = occupancy is not None or obstacle_index is not None
+    backups = BackupRoutes(grid, end_node, count=backup_routes, include_diagonals=include_diagonals) if backup_routes > 0 else None
+    try:
+        stats.record("build")
 
-    path = quickest_path(start_node, end_node, grid, include_diagonals=include_diagonals, euclidean=euclidean)
-    stitched_path = stitch_colinear_nodes(start_node, path)
-    force_loop_run = False
-
-    while len(stitched_path) != 0 or force_loop_run:
-
+        while True:
+            try:
+                path = find_path(start_node)
+                break
+            except PlanningTimeoutError:
+                # The rover has not moved yet, so the planner simply carries on with its search
+                stats.count("timeouts")
+        stats.record("plan")
+        if backups is not None:
+            main_route = route_coords(path)
+            backups.plan(start_node, path)
+        stitched_path = smooth_path(start_node, path, obstacle_index=obstacle_index, clearance=obstacle_padding)
+        stats.record("smooth")
         force_loop_run = False
-        obstacles = locate_obstacles(rover, sensors_to_ignore=sensors_to_ignore)
 
-        for obstacle in obstacles:
-            obstacle_node = grid.nearest_node(obstacle)
+        while len(stitched_path) != 0 or force_loop_run:
 
-            if not obstacle_node.is_obstacle:
+            stats.begin_iteration()
+            force_loop_run = False
+            # Only cells that are not yet marked get through, and sweeps that repeat one already seen are not processed at all
+            rows, columns = scan_filter.new_cells(rover)
+            stats.record("sense")
 
-                obstacle_node.is_obstacle = True
+            if len(rows) != 0 and filter_marks:
+                recalculate_route = True
+            elif len(rows) != 0:
+                grid.obstacle_layer[rows, columns] = True
                 recalculate_route = True
 
-                # Calculates the appropriate amount of padding to give each obstacle
-                padding_layers = int(ceil(float(obstacle_padding) / grid.node_spacing))
+                # The rover's own node is never padded, or it could not plan its way out
+                rover_node = grid.nearest_node((rover.x, rover.y))
+                inflator.inflate(grid, rows, columns, keep_clear=rover_node.coords)
+                if map_file is not None:
+                    map_file.record(grid, rows, margin=inflator.radius)
+                stats.count("obstacles_added", len(rows))
+            stats.record("mark")
 
-                for node in neighbouring_nodes(obstacle_node, grid, include_diagonals=include_diagonals, radius=padding_layers):
-                    if node is not grid.nearest_node((rover.x, rover.y)):
-                        node.is_padding = True
+            if recalculate_route:
+                if verbose:
+                    print("Found new obstacles, recalculating route")
+                # might want to create an entirely new grid based on the current rover's position
+                rover_node = grid.nearest_node((rover.x, rover.y))
+                path = None
+                if backups is not None:
+                    # Keeps to the current route if the new obstacles missed it, and otherwise switches to the first alternative that is still clear and not much longer
+                    main_rows, main_columns = main_route
+                    nearest = np.argmin(np.maximum(np.abs(main_rows - rover_node.coords[0]), np.abs(main_columns - rover_node.coords[1]))) if len(main_rows) else 0
+                    longest_backup = BACKUP_DETOUR * route_length(rover_node.coords, main_rows[nearest:], main_columns[nearest:])
+                    for route_number, (route_rows, route_columns) in enumerate([main_route] + backups.routes()):
+                        path = resume_route(grid, rover_node, route_rows, route_columns)
+                        if path is None:
+                            continue
+                        if route_number > 0 and route_length(rover_node.coords, *route_coords(path)) > longest_backup:
+                            path = None
+                            continue
+                        if route_number == 0:
+                            stats.count("routes_kept")
+                        else:
+                            if verbose: print("Switching to backup route {}".format(route_number))
+                            stats.count("backup_switches")
+                            main_route = (route_rows, route_columns)
+                            backups.plan(rover_node, path)
+                        break
+
+                if path is None:
+                    stats.count("replans")
+                    try:
+                        path = find_path(rover_node)
+                    except NoValidPathError:
+                        stats.record("plan")
+                        stats.count("resets")
+                        if occupancy is not None:
+                            if verbose: print("ERROR: NO ROUTE FOUND.\nFADING STALE OBSTACLES")
+                            occupancy.fade(keep_clear=rover_node.coords)
+                            continue
+                        if verbose: print("ERROR: NO ROUTE FOUND.\nREDRAWING GRID")
+                        grid.clear_obstacles()
+                        scan_filter.forget()
+                        continue
+                    except PlanningTimeoutError:
+                        # Waits where it is for the planner to finish its search, sensing between budgets as it does
+                        stats.record("plan")
+                        stats.count("timeouts")
+                        if verbose: print("No route found within the replan budget, stopping until one is")
+                        rover.send_command(0, 0)
+                        force_loop_run = True
+                        continue
+                    if backups is not None:
+                        main_route = route_coords(path)
+                        backups.plan(rover_node, path)
+                stats.record("plan")
+
+                stitched_path = smooth_path(rover_node, path, obstacle_index=obstacle_index, clearance=obstacle_padding)
+                stats.record("smooth")
+                recalculate_route = False
+        
+            if verbose:
+                grid.rover_coords = grid.nearest_node((rover.x, rover.y)).coords
+                grid.path_layer[:] = False
+                for node in stitched_path:
+                    node.on_path = True
+                print(grid)
+                stats.record("display")
 
+            if controller == "pure_pursuit":
+                waypoints = [grid.location(*node.coords) for node in stitched_path]
+                if verbose:
+                    print("Following {} waypoints from {}".format(len(waypoints), (round(rover.x, 2), round(rover.y, 2))))
+                try:
+                    follow_path(rover, waypoints, grid, control_rate=control_rate, obstacle_check_rate=obstacle_check_rate, sensors_to_ignore=sensors_to_ignore, realtime=realtime, scan_filter=scan_filter, obstacle_index=obstacle_index, clearance=obstacle_padding)
+                except ObseleteGridError:
+                    stats.record("move")
+                    if verbose: print("Encountered an obstacle while driving, recalculating route")
+                    recalculate_route = True
+                    force_loop_run = True
+                    continue
+                stats.record("move")
+                stitched_path = []
+                continue
 
-        if recalculate_route:
+            next_node = stitched_path.pop(0)
+            row, column = next_node.coords
+            next_location = grid.location(row, column)
             if verbose:
-                print("Found new obstacles, recalculating route")
-            # might want to create an entirely new grid based on the current rover's position
-            rover_node = grid.nearest_node((rover.x, rover.y))
+                print("Moving to location {} from {}".format((round(next_location[0], 2), round(next_location[1], 2)), (round(rover.x, 2), round(rover.y, 2))))
+
             try:
-                path = quickest_path(rover_node, end_node, grid, include_diagonals=include_diagonals, euclidean=euclidean, verbose=verbose)
-            except:
-                if verbose: print("ERROR: NO ROUTE FOUND.\nREDRAWING GRID")
-                for row in grid._array:
-                    for node in row:
-                        node.is_padding = False
-                        node.is_obstacle = False
+                move_rover(rover, next_location[0], next_location[1], grid, scan_filter=scan_filter, obstacle_index=obstacle_index, clearance=obstacle_padding)
+            except ObseleteGridError:
+                stats.record("move")
+                if verbose: print("Encountered an obstacle while turning, recalculating route")
+                recalculate_route = True
+                force_loop_run = True
                 continue
 
-            stitched_path = stitch_colinear_nodes(rover_node, path)
-            recalculate_route = False
-        
-        if verbose:
-            for row in grid._array:
-                for node in row:
-                    node.is_rover = grid.nearest_node((rover.x, rover.y)) is node
-                    node.on_path = node in stitched_path
-            print(grid)
-
-        next_node = stitched_path.pop(0)
-        row, column = next_node.coords
-        next_location = grid.location(row, column)
-        if verbose:
-            print("Moving to location {} from {}".format((round(next_location[0], 2), round(next_location[1], 2)), (round(rover.x, 2), round(rover.y, 2))))
+            stats.record("move")
 
-        try:
-            move_rover(rover, next_location[0], next_location[1], grid)
-        except:
-            if verbose: print("Encountered an obstacle while turning, recalculating route")
-            recalculate_route = True
-            force_loop_run = True
-            continue
-
-        if verbose:
-            print("Move completed, currently predicting {} more waypoints".format(len(stitched_path)))
+            if verbose:
+                print("Move completed, currently predicting {} more waypoints".format(len(stitched_path)))
     
-    rover.send_command(0, 0)
\ No newline at end of file
+        rover.send_command(0, 0)
+    finally:
+        # The background planning threads are always stopped, however the run ends
+        if backups is not None:
+            backups.close()
+    stats.count("sweeps", scan_filter.sweeps)
+    stats.count("sweeps_skipped", scan_filter.skipped_sweeps)
+    if filter_marks:
+        # Obstacles are also marked while driving, so they are counted at the end
+        stats.count("obstacles_added", scan_filter.cells_added)
+    if occupancy is not None:
+        stats.count("obstacles_removed", occupancy.cells_removed)
+    if map_file is not None and filter_marks:
+        # Obstacles are marked while driving as well, and with log-odds mapping removed anywhere on the map, so the whole of it is written
+        map_file.save(grid)
+    if map_file is not None:
+        map_file.flush()
+    stats.finish()
+    if print_summary:
+        print(stats.summary())
\ No newline at end of file
@@ -0,0 +1,246 @@
+from timeit import default_timer as timer
+import numpy as np
+from errors import ReplayFinishedError
+
+MAGIC = b"ROVERLOG"
+VERSION = 1
+# The log starts with this record, which gives the number of LiDAR rays and so the size of every frame after it
+HEADER = np.dtype([("magic", "S8"), ("version", "<u4"), ("num_lasers", "<u4")])
+
+def frame_dtype(num_lasers):
+    """Describes a single frame of a sensor log as a numpy structured type
+
+    Parameters
+    ----------
+    num_lasers : int
+        the number of LiDAR rays on the rover
+
+    Returns
+    -------
+    A dtype with the seconds since recording began ("timestamp"), the rover's pose ("x", "y" and "heading"), its LiDAR readings ("laser_distances") and the command it was then sent ("linear_speed" and "angular_speed")
+    """
+    return np.dtype([("timestamp", "<f8"), ("x", "<f8"), ("y", "<f8"), ("heading", "<f8"),
+                     ("laser_distances", "<f4", (num_lasers,)), ("linear_speed", "<f4"), ("angular_speed", "<f4")])
+
+class SensorRecorder:
+    """Stands in for a rover, passing everything through to it while logging what it reads each time it is sent a command
+
+    Every command is preceded by a frame holding the rover's pose and LiDAR readings at that moment, which is what the navigation code decided the command from, along with the command itself. Frames are collected in a structured array and written to the log a chunk at a time, each chunk preceded by the number of frames in it, so a log cut short by a crash loses at most its last chunk.
+
+    Attributes
+    ----------
+    rover : Rover
+        the rover being recorded
+    path : str
+        the location of the log
+    frames : int
+        the number of frames recorded so far
+
+    Methods
+    -------
+    send_command(linear_speed, angular_speed)
+        Logs a frame and sends a command to the rover
+    close()
+        Writes any frames still waiting to be logged and closes the log
+    """
+
+    def __init__(self, rover, path, chunk_size=256, clock=timer):
+        """Initializes a new SensorRecorder instance, replacing any log already at `path`.
+
+        Parameters
+        ----------
+        rover : Rover
+            the rover being recorded
+        path : str
+            the location of the log
+        chunk_size : int
+            the number of frames collected before they are written to the log
+        clock : function
+            returns the current time in seconds, from which the timestamps are measured
+        """
+        self.rover = rover
+        self.path = path
+        self.frames = 0
+        self._clock = clock
+        self._start_time = clock()
+        num_lasers = len(rover.laser_distances)
+        self._chunk = np.zeros(chunk_size, dtype=frame_dtype(num_lasers))
+        self._pending = 0
+
+        header = np.zeros(1, dtype=HEADER)
+        header["magic"] = MAGIC
+        header["version"] = VERSION
+        header["num_lasers"] = num_lasers
+        self._file = open(path, "wb")
+        header.tofile(self._file)
+
+    @property
+    def x(self):
+        return self.rover.x
+
+    @property
+    def y(self):
+        return self.rover.y
+
+    @property
+    def heading(self):
+        return self.rover.heading
+
+    @property
+    def laser_distances(self):
+        return self.rover.laser_distances
+
+    def _write_chunk(self):
+        np.array([self._pending], dtype="<u4").tofile(self._file)
+        self._chunk[:self._pending].tofile(self._file)
+        self._pending = 0
+
+    def send_command(self, linear_speed, angular_speed):
+        """Logs a frame and sends a command to the rover
+
+        Parameters
+        ----------
+        linear_speed : float
+            the forward speed in meters per second
+        angular_speed : float
+            the anticlockwise turning speed in radians per second
+        """
+        frame = self._chunk[self._pending]
+        frame["timestamp"] = self._clock() - self._start_time
+        frame["x"] = self.rover.x
+        frame["y"] = self.rover.y
+        frame["heading"] = self.rover.heading
+        frame["laser_distances"] = self.rover.laser_distances
+        frame["linear_speed"] = linear_speed
+        frame["angular_speed"] = angular_speed
+        self._pending += 1
+        self.frames += 1
+        if self._pending == len(self._chunk):
+            self._write_chunk()
+
+        self.rover.send_command(linear_speed, angular_speed)
+
+    def close(self):
+        """Writes any frames still waiting to be logged and closes the log"""
+        if self._file.closed:
+            return
+        if self._pending:
+            self._write_chunk()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+def read_frames(path):
+    """Reads every frame of a sensor log
+
+    Parameters
+    ----------
+    path : str
+        the location of the log
+
+    Returns
+    -------
+    A structured array of frames, with the type given by `frame_dtype`. A final chunk that was only partly written is left out
+
+    Raises
+    ------
+    ValueError
+        If the file is not a sensor log, or was written by an incompatible version
+    """
+    with open(path, "rb") as log:
+        header = np.fromfile(log, dtype=HEADER, count=1)
+        if len(header) != 1 or header["magic"][0] != MAGIC:
+            raise ValueError("{} is not a sensor log".format(path))
+        if header["version"][0] != VERSION:
+            raise ValueError("{} has sensor log version {}; expected {}".format(path, header["version"][0], VERSION))
+        dtype = frame_dtype(int(header["num_lasers"][0]))
+
+        chunks = []
+        while True:
+            count = np.fromfile(log, dtype="<u4", count=1)
+            if len(count) == 0:
+                break
+            chunk = np.fromfile(log, dtype=dtype, count=int(count[0]))
+            if len(chunk) < count[0]:
+                break
+            chunks.append(chunk)
+
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=dtype)
+
+class ReplayRover:
+    """A rover that plays back the frames of a sensor log, so that a recorded run can be driven through `run_course` again offline
+
+    The rover starts at the first frame and moves on to the next one every time it is sent a command, whatever the command is. Its pose and LiDAR readings therefore follow the recording exactly, and every planner, controller or setting sees identical input. Nothing waits for the recorded timestamps, so a replay runs as fast as the navigation code allows as long as `run_course` is not asked to hold its control rate in real time.
+
+    Attributes
+    ----------
+    frames : nparray
+        the frames being played back
+    x : float
+        the x coordinate of the rover in the current frame
+    y : float
+        the y coordinate of the rover in the current frame
+    heading : float
+        the direction the rover is facing in the current frame, in degrees anticlockwise from the x axis
+    laser_distances : list of float
+        the distance measured by each LiDAR ray in the current frame
+    time : float
+        the timestamp of the current frame
+    commands : int
+        the number of commands the rover has received
+
+    Methods
+    -------
+    send_command(linear_speed, angular_speed)
+        Moves on to the next frame
+    """
+
+    def __init__(self, frames):
+        """Initializes a new ReplayRover instance at the first frame.
+
+        Parameters
+        ----------
+        frames : nparray or str
+            the frames to play back, or the location of a sensor log to read them from
+        """
+        if isinstance(frames, str):
+            frames = read_frames(frames)
+        if len(frames) == 0:
+            raise ValueError("There are no frames to replay")
+        self.frames = frames
+        self.commands = 0
+        self._show(0)
+
+    def _show(self, index):
+        frame = self.frames[index]
+        self.x = float(frame["x"])
+        self.y = float(frame["y"])
+        self.heading = float(frame["heading"])
+        self.laser_distances = frame["laser_distances"].astype(float).tolist()
+        self.time = float(frame["timestamp"])
+
+    def send_command(self, linear_speed, angular_speed):
+        """Moves on to the next frame
+
+        Parameters
+        ----------
+        linear_speed : float
+            ignored, as the rover's movement was recorded
+        angular_speed : float
+            ignored, as the rover's movement was recorded
+
+        Raises
+        ------
+        ReplayFinishedError
+            if the rover has already been sent one command for every frame, as many as were recorded
+        """
+        if self.commands >= len(self.frames):
+            raise ReplayFinishedError
+        self.commands += 1
+        # The last command leaves the rover where the recording ended
+        if self.commands < len(self.frames):
+            self._show(self.commands)
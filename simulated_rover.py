@@ -0,0 +1,298 @@
+from math import pi, radians, degrees, atan2, sin, cos
+import random
+import numpy as np
+from errors import SimulationTimeoutError
+
+class World:
+    """A set of obstacles for a SimulatedRover to drive through, together with the points a course runs between
+
+    Attributes
+    ----------
+    rocks : nparray
+        an (N, 3) array whose rows are the x coordinate, y coordinate and radius of each circular rock
+    walls : nparray
+        an (M, 4) array whose rows are the x and y coordinates of the two ends of each straight wall
+    start : (float, float)
+        the point at which the rover begins
+    end : (float, float)
+        the point the rover should drive to
+    """
+
+    def __init__(self, rocks, walls, start, end):
+        """Initializes a new World instance.
+
+        Parameters
+        ----------
+        rocks : array_like
+            the x coordinate, y coordinate and radius of each circular rock
+        walls : array_like
+            the x and y coordinates of the two ends of each straight wall
+        start : (float, float)
+            the point at which the rover begins
+        end : (float, float)
+            the point the rover should drive to
+        """
+        self.rocks = np.asarray(rocks, dtype=float).reshape(-1, 3)
+        self.walls = np.asarray(walls, dtype=float).reshape(-1, 4)
+        self.start = start
+        self.end = end
+
+def rock_field(size=20.0, density=0.05, seed=0):
+    """Creates a square field of randomly placed rocks, crossed from one corner to the other
+
+    Parameters
+    ----------
+    size : float
+        the length of each side of the field in meters
+    density : float
+        the number of rocks per square meter
+    seed : int
+        the seed used to place the rocks
+
+    Returns
+    -------
+    A World whose course runs from (0, 0) to (size, size)
+    """
+    generator = random.Random(seed)
+    start = (0.0, 0.0)
+    end = (float(size), float(size))
+    rocks = []
+    while len(rocks) < int(density * size * size):
+        x = generator.uniform(1.0, size - 1.0)
+        y = generator.uniform(1.0, size - 1.0)
+        radius = generator.uniform(0.2, 0.5)
+        # The start and end points are always left clear
+        if min((x - point[0]) ** 2 + (y - point[1]) ** 2 for point in (start, end)) > (radius + 1.0) ** 2:
+            rocks.append((x, y, radius))
+    return World(rocks, [], start, end)
+
+def maze(size=20.0, cell_size=2.5, seed=0):
+    """Creates a square maze of walls with a single route between any two of its cells, generated by a randomised depth-first search
+
+    Parameters
+    ----------
+    size : float
+        the length of each side of the maze in meters. It is rounded down to a whole number of cells
+    cell_size : float
+        the width of each passage in meters
+    seed : int
+        the seed used to carve the passages
+
+    Returns
+    -------
+    A World whose course runs from the centre of the cell in one corner to the centre of the cell in the opposite corner
+    """
+    generator = random.Random(seed)
+    cells = max(int(size // cell_size), 2)
+
+    # Carves passages by knocking down the wall between each cell and an unvisited neighbour
+    open_walls = set()
+    visited = set([(0, 0)])
+    stack = [(0, 0)]
+    while stack:
+        column, row = stack[-1]
+        unvisited = [(column + column_offset, row + row_offset) for column_offset, row_offset in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                     if 0 <= column + column_offset < cells and 0 <= row + row_offset < cells and (column + column_offset, row + row_offset) not in visited]
+        if not unvisited:
+            stack.pop()
+            continue
+        neighbour = generator.choice(unvisited)
+        open_walls.add(frozenset(((column, row), neighbour)))
+        visited.add(neighbour)
+        stack.append(neighbour)
+
+    extent = cells * cell_size
+    walls = [(0, 0, extent, 0), (0, extent, extent, extent), (0, 0, 0, extent), (extent, 0, extent, extent)]
+    for column in range(cells):
+        for row in range(cells):
+            if column + 1 < cells and frozenset(((column, row), (column + 1, row))) not in open_walls:
+                x = (column + 1) * cell_size
+                walls.append((x, row * cell_size, x, (row + 1) * cell_size))
+            if row + 1 < cells and frozenset(((column, row), (column, row + 1))) not in open_walls:
+                y = (row + 1) * cell_size
+                walls.append((column * cell_size, y, (column + 1) * cell_size, y))
+
+    centre = cell_size / 2.0
+    return World([], walls, (centre, centre), (extent - centre, extent - centre))
+
+def corridor(length=20.0, width=3.0, baffle_spacing=3.0, seed=0):
+    """Creates a straight corridor partly blocked by baffles that alternate between its two walls, so the rover must weave between them
+
+    Parameters
+    ----------
+    length : float
+        the length of the corridor in meters
+    width : float
+        the distance between the corridor's walls in meters. Each baffle blocks half of it
+    baffle_spacing : float
+        the average distance between consecutive baffles in meters
+    seed : int
+        the seed used to jitter the positions of the baffles
+
+    Returns
+    -------
+    A World whose course runs along the centre of the corridor from (0, 0) to (length, 0)
+    """
+    generator = random.Random(seed)
+    half_width = width / 2.0
+    walls = [(-1.0, -half_width, length + 1.0, -half_width), (-1.0, half_width, length + 1.0, half_width)]
+
+    x = baffle_spacing
+    side = 1
+    while x < length - 1.0:
+        walls.append((x, side * half_width, x, 0.0))
+        x += baffle_spacing * generator.uniform(0.75, 1.25)
+        side = -side
+    return World([], walls, (0.0, 0.0), (float(length), 0.0))
+
+WORLDS = { "rocks": rock_field, "maze": maze, "corridor": corridor }
+
+class SimulatedRover:
+    """A kinematic stand-in for the Gazebo rover, which drives through a World and ray-casts its LiDAR against the obstacles in it
+
+    The rover has the same interface as `qset_lib.Rover`, so it can be passed to `run_course` directly. It moves as a unicycle: every command is applied for `time_step` seconds of simulated time, after which the position, heading and LiDAR readings are updated.
+
+    Attributes
+    ----------
+    world : World
+        the obstacles the rover drives through
+    x : float
+        the x coordinate of the rover
+    y : float
+        the y coordinate of the rover
+    heading : float
+        the direction the rover is facing, in degrees anticlockwise from the x axis
+    laser_distances : list of float
+        the distance measured by each LiDAR ray, or infinity for a ray that hits nothing within `max_range`. The rays are spread evenly across `sweep_angle`, from the rover's right to its left
+    time : float
+        the number of seconds of simulated time that have passed
+    commands : int
+        the number of commands the rover has received
+    min_clearance : float
+        the smallest distance there has been between the rover's centre and any obstacle. It is negative if the rover has driven into a rock
+    time_step : float
+        the simulated time for which each command is applied, in seconds
+    time_limit : float
+        the simulated time after which the rover refuses further commands, in seconds, or None for no limit
+
+    Methods
+    -------
+    send_command(linear_speed, angular_speed)
+        Drives the rover at the specified speeds for one time step
+    """
+
+    def __init__(self, world, num_lasers=15, sweep_angle=pi/2, max_range=8.0, time_step=0.05, time_limit=None):
+        """Initializes a new SimulatedRover instance at the start of a world, facing along the x axis.
+
+        Parameters
+        ----------
+        world : World
+            the obstacles the rover drives through
+        num_lasers : int
+            the number of LiDAR rays
+        sweep_angle : float
+            the angle through which the LiDAR rays sweep in radians
+        max_range : float
+            the furthest distance at which the LiDAR detects an obstacle
+        time_step : float
+            the simulated time for which each command is applied, in seconds
+        time_limit : float
+            the simulated time after which the rover refuses further commands, in seconds, or None for no limit
+        """
+        self.world = world
+        self.x, self.y = world.start
+        self.heading = 0.0
+        self.time = 0.0
+        self.commands = 0
+        self.min_clearance = float("inf")
+        self.time_step = time_step
+        self.time_limit = time_limit
+
+        self._max_range = max_range
+        self._laser_angles = sweep_angle * (-0.5 + np.arange(num_lasers) / float(max(num_lasers - 1, 1)))
+        self._update()
+
+    def _clearance(self):
+        """Finds the distance from the rover's centre to the nearest obstacle"""
+        clearance = float("inf")
+        rocks = self.world.rocks
+        if len(rocks):
+            clearance = np.min(np.hypot(rocks[:, 0] - self.x, rocks[:, 1] - self.y) - rocks[:, 2])
+        walls = self.world.walls
+        if len(walls):
+            starts = walls[:, :2]
+            directions = walls[:, 2:] - starts
+            lengths = np.maximum(np.sum(directions ** 2, axis=1), 1e-12)
+            # The closest point on each wall, as a fraction of the way along it
+            fractions = np.clip(np.sum((np.array([self.x, self.y]) - starts) * directions, axis=1) / lengths, 0, 1)
+            closest = starts + fractions[:, np.newaxis] * directions
+            clearance = min(clearance, np.min(np.hypot(closest[:, 0] - self.x, closest[:, 1] - self.y)))
+        return float(clearance)
+
+    def _cast_rays(self):
+        """Finds the distance along every LiDAR ray to the first obstacle it hits"""
+        angles = radians(self.heading) + self._laser_angles
+        ray_x = np.cos(angles)[:, np.newaxis]
+        ray_y = np.sin(angles)[:, np.newaxis]
+        hits = np.full(len(angles), np.inf)
+
+        rocks = self.world.rocks
+        if len(rocks):
+            # Solves |rover + t * ray - centre| = radius for the nearer t, with each ray against each rock
+            offset_x = (self.x - rocks[:, 0])[np.newaxis]
+            offset_y = (self.y - rocks[:, 1])[np.newaxis]
+            half_b = offset_x * ray_x + offset_y * ray_y
+            c = offset_x ** 2 + offset_y ** 2 - rocks[:, 2][np.newaxis] ** 2
+            discriminant = half_b ** 2 - c
+            with np.errstate(invalid="ignore"):
+                distances = -half_b - np.sqrt(discriminant)
+            distances[(discriminant < 0) | ~(distances > 0)] = np.inf
+            hits = np.minimum(hits, distances.min(axis=1))
+
+        walls = self.world.walls
+        if len(walls):
+            # Solves rover + t * ray = start + u * (end - start) for t >= 0 and 0 <= u <= 1, with each ray against each wall
+            wall_x = (walls[:, 2] - walls[:, 0])[np.newaxis]
+            wall_y = (walls[:, 3] - walls[:, 1])[np.newaxis]
+            offset_x = (walls[:, 0] - self.x)[np.newaxis]
+            offset_y = (walls[:, 1] - self.y)[np.newaxis]
+            denominator = ray_x * wall_y - ray_y * wall_x
+            with np.errstate(divide="ignore", invalid="ignore"):
+                distances = (offset_x * wall_y - offset_y * wall_x) / denominator
+                fractions = (offset_x * ray_y - offset_y * ray_x) / denominator
+            distances[(denominator == 0) | ~(distances > 0) | ~(fractions >= 0) | ~(fractions <= 1)] = np.inf
+            hits = np.minimum(hits, distances.min(axis=1))
+
+        hits[hits > self._max_range] = np.inf
+        return hits.tolist()
+
+    def _update(self):
+        self.laser_distances = self._cast_rays()
+        self.min_clearance = min(self.min_clearance, self._clearance())
+
+    def send_command(self, linear_speed, angular_speed):
+        """Drives the rover at the specified speeds for one time step
+
+        Parameters
+        ----------
+        linear_speed : float
+            the forward speed in meters per second
+        angular_speed : float
+            the anticlockwise turning speed in radians per second
+
+        Raises
+        ------
+        SimulationTimeoutError
+            if the rover has already driven for `time_limit` seconds
+        """
+        if self.time_limit is not None and self.time >= self.time_limit:
+            raise SimulationTimeoutError
+        self.commands += 1
+        self.time += self.time_step
+
+        heading = radians(self.heading) + angular_speed * self.time_step
+        heading = atan2(sin(heading), cos(heading))
+        self.heading = degrees(heading)
+        self.x += linear_speed * cos(heading) * self.time_step
+        self.y += linear_speed * sin(heading) * self.time_step
+        self._update()
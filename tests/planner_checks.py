@@ -0,0 +1,36 @@
+"""Helpers shared by the planner tests: random maps, and the reference answers of a flat breadth-first search"""
+import numpy as np
+from grid import Grid
+from wavefront_planner import distance_fields, UNREACHABLE
+
+def random_grid(generator, density=0.3, min_size=5, max_size=30):
+    """Creates a grid with 1 m nodes of a random size, each node of which is an obstacle with probability `density`"""
+    grid = Grid((0, 0), (generator.randint(min_size, max_size), generator.randint(min_size, max_size)), node_spacing=1.0)
+    grid.obstacle_layer[:] = generator.rand(grid.height, grid.width) < density
+    return grid
+
+def random_free_node(generator, grid):
+    """Picks a random node and clears it of obstacles"""
+    coords = (generator.randint(grid.height), generator.randint(grid.width))
+    grid.obstacle_layer[coords] = False
+    return coords
+
+def steps_between(grid, start, goal, include_diagonals=True):
+    """Returns the fewest moves from `start` to `goal`, or None if the goal cannot be reached"""
+    steps = distance_fields(grid.blocked_layer(), [start], include_diagonals)[0][goal]
+    if steps >= UNREACHABLE or grid.blocked_layer()[goal]:
+        return None
+    return int(steps)
+
+def assert_valid_path(grid, start, goal, path, include_diagonals=True):
+    """Checks that a list of nodes leads from `start` to `goal` one move at a time without entering a blocked node, and returns the number of moves"""
+    blocked = grid.blocked_layer()
+    previous = start
+    for node in path:
+        row_step, column_step = abs(node.coords[0] - previous[0]), abs(node.coords[1] - previous[1])
+        assert max(row_step, column_step) == 1
+        assert include_diagonals or row_step + column_step == 1
+        assert not blocked[node.coords]
+        previous = node.coords
+    assert previous == goal
+    return len(path)
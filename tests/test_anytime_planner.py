@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+from grid import Grid
+from anytime_planner import AnytimePlanner
+from errors import NoValidPathError, PlanningTimeoutError
+from planner_checks import random_grid, random_free_node, steps_between, assert_valid_path
+
+class TickingClock:
+    """A clock that moves on by a second every time it is read, so that a budget allows a fixed number of reads"""
+
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        self.time += 1.0
+        return self.time
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_finds_shortest_paths_without_a_budget_as_the_map_changes(include_diagonals):
+    generator = np.random.RandomState(1)
+    for _ in range(40):
+        grid = random_grid(generator)
+        goal = random_free_node(generator, grid)
+        planner = AnytimePlanner(grid, grid[goal], include_diagonals=include_diagonals)
+        for _ in range(5):
+            start = random_free_node(generator, grid)
+            steps = steps_between(grid, start, goal, include_diagonals)
+            if steps is None:
+                with pytest.raises(NoValidPathError):
+                    planner.quickest_path(grid[start])
+            else:
+                path = planner.quickest_path(grid[start])
+                assert assert_valid_path(grid, start, goal, path, include_diagonals) == steps
+                assert planner.bound == 1
+            row, column = generator.randint(grid.height), generator.randint(grid.width)
+            if (row, column) != goal:
+                grid.obstacle_layer[row, column] = not grid.obstacle_layer[row, column]
+
+def test_routes_found_within_a_budget_keep_to_their_bound():
+    generator = np.random.RandomState(2)
+    for _ in range(40):
+        grid = random_grid(generator, min_size=20, max_size=40)
+        goal = random_free_node(generator, grid)
+        start = random_free_node(generator, grid)
+        steps = steps_between(grid, start, goal)
+        if steps is None:
+            continue
+        # Each call has time for 64 expansions
+        planner = AnytimePlanner(grid, grid[goal], time_budget=2500, clock=TickingClock())
+        while True:
+            try:
+                path = planner.quickest_path(grid[start])
+                break
+            except PlanningTimeoutError:
+                pass
+        moves = assert_valid_path(grid, start, goal, path)
+        assert moves <= planner.bound * steps
+
+def test_calls_stop_at_the_budget_and_carry_on_where_they_stopped():
+    grid = Grid((0, 0), (60, 60), node_spacing=1.0)
+    grid.obstacle_layer[5:55, 30] = True
+    planner = AnytimePlanner(grid, grid[30, 59], initial_inflation=1.0, time_budget=2500, clock=TickingClock())
+    timeouts = 0
+    while True:
+        expansions = planner.expansions
+        try:
+            path = planner.quickest_path(grid[30, 0])
+            break
+        except PlanningTimeoutError:
+            timeouts += 1
+            assert planner.expansions - expansions <= 64
+    assert timeouts > 0
+    assert assert_valid_path(grid, (30, 0), (30, 59), path) == steps_between(grid, (30, 0), (30, 59))
+
+def test_keeps_its_search_when_the_rover_moves_and_the_map_changes():
+    grid = Grid((0, 0), (60, 60), node_spacing=1.0)
+    grid.obstacle_layer[5:55, 30] = True
+    planner = AnytimePlanner(grid, grid[30, 59])
+    path = planner.quickest_path(grid[30, 0])
+    first_search = planner.expansions
+
+    # Moving along the route needs next to no new expansions
+    start = path[10].coords
+    expansions = planner.expansions
+    path = planner.quickest_path(grid[start])
+    assert planner.expansions - expansions < first_search / 10
+    assert assert_valid_path(grid, start, (30, 59), path) == steps_between(grid, start, (30, 59))
+
+    # A new obstacle away from the goal only re-expands the nodes it cut off
+    grid.obstacle_layer[54:58, 30] = True
+    expansions = planner.expansions
+    path = planner.quickest_path(grid[start])
+    assert planner.expansions - expansions < first_search
+    assert assert_valid_path(grid, start, (30, 59), path) == steps_between(grid, start, (30, 59))
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+from grid import Grid
+from pathfinding import quickest_path, quickest_indices
+from errors import NoValidPathError
+from planner_checks import random_grid, random_free_node, steps_between, assert_valid_path
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+@pytest.mark.parametrize("euclidean", [True, False])
+def test_finds_a_valid_path_whenever_one_exists(include_diagonals, euclidean):
+    generator = np.random.RandomState(1)
+    for _ in range(60):
+        grid = random_grid(generator)
+        start, goal = random_free_node(generator, grid), random_free_node(generator, grid)
+        if steps_between(grid, start, goal, include_diagonals) is None:
+            with pytest.raises(NoValidPathError):
+                quickest_path(grid[start], grid[goal], grid, include_diagonals, euclidean)
+        else:
+            path = quickest_path(grid[start], grid[goal], grid, include_diagonals, euclidean)
+            assert_valid_path(grid, start, goal, path, include_diagonals)
+
+def test_paths_across_open_ground_are_shortest():
+    grid = Grid((0, 0), (20, 20), node_spacing=1.0)
+    for goal in [(19, 19), (0, 19), (7, 15), (19, 3)]:
+        assert len(quickest_path(grid[0, 0], grid[goal], grid)) == max(goal)
+        assert len(quickest_path(grid[0, 0], grid[goal], grid, include_diagonals=False)) == sum(goal)
+
+def test_records_parents_along_the_path():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    grid.obstacle_layer[5, :8] = True
+    path = quickest_path(grid[0, 0], grid[9, 0], grid)
+    previous = grid[0, 0]
+    for node in path:
+        assert node.parent == previous
+        previous = node
+
+def test_counts_expansions_into_stats():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    stats = {}
+    quickest_path(grid[0, 0], grid[9, 9], grid, stats=stats)
+    quickest_path(grid[0, 0], grid[9, 9], grid, stats=stats)
+    assert stats["expansions"] >= 2 * 9
+    assert stats["peak_open_set"] >= 1
+
+def test_indices_can_be_planned_on_a_copy_of_the_blocked_layer():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    blocked = grid.blocked_layer().ravel().copy()
+    blocked[grid.flat_index(0, 5):grid.flat_index(0, 8) + 1] = True
+    indices = quickest_indices(grid.flat_index(0, 0), grid.flat_index(0, 9), blocked, grid)
+    assert indices[0] == grid.flat_index(0, 0) and indices[-1] == grid.flat_index(0, 9)
+    assert not blocked[indices].any()
+    # The grid itself was left untouched
+    assert not grid.blocked_layer().any()
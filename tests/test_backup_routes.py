@@ -0,0 +1,41 @@
+import numpy as np
+import threading
+from grid import Grid
+from backup_routes import BackupRoutes, route_coords
+from pathfinding import quickest_path
+
+def test_alternatives_avoid_the_main_route():
+    grid = Grid((0, 0), (12, 12), node_spacing=1.0)
+    grid.obstacle_layer[3:9, 3:9] = True
+    backups = BackupRoutes(grid, grid[11, 11], count=2)
+    path = quickest_path(grid[0, 0], grid[11, 11], grid, algorithm="bidirectional")
+    backups.plan(grid[0, 0], path)
+    backups.wait()
+    alternatives = backups.routes()
+
+    assert len(alternatives) >= 1
+    main_rows, main_columns = route_coords(path)
+    main_nodes = set(zip(main_rows.tolist(), main_columns.tolist()))
+    for rows, columns in alternatives:
+        assert not (np.array_equal(rows, main_rows) and np.array_equal(columns, main_columns))
+        # Only the couple of nodes at either end may be shared with the main route
+        assert len(main_nodes & set(zip(rows[2:-2].tolist(), columns[2:-2].tolist()))) == 0
+
+def test_routes_too_short_to_block_give_no_alternatives():
+    grid = Grid((0, 0), (8, 8), node_spacing=1.0)
+    backups = BackupRoutes(grid, grid[0, 3], count=2)
+    path = quickest_path(grid[0, 0], grid[0, 3], grid, algorithm="bidirectional")
+    assert len(path) <= 4
+    backups.plan(grid[0, 0], path)
+    backups.wait()
+    assert backups.routes() == []
+
+def test_close_discards_alternatives_and_stops_the_threads():
+    grid = Grid((0, 0), (30, 30), node_spacing=1.0)
+    threads = threading.active_count()
+    backups = BackupRoutes(grid, grid[29, 29], count=3)
+    for start in [(0, 0), (1, 0), (2, 0)]:
+        backups.plan(grid[start], quickest_path(grid[start], grid[29, 29], grid, algorithm="bidirectional"))
+    backups.close()
+    assert threading.active_count() == threads
+    assert backups.routes() == []
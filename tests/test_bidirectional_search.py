@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from grid import Grid
+from pathfinding import quickest_path
+from errors import NoValidPathError
+from planner_checks import random_grid, random_free_node, steps_between, assert_valid_path
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+@pytest.mark.parametrize("density", [0.1, 0.35])
+def test_paths_are_as_short_as_a_flat_search(include_diagonals, density):
+    generator = np.random.RandomState(22)
+    for _ in range(80):
+        grid = random_grid(generator, density=density)
+        start, goal = random_free_node(generator, grid), random_free_node(generator, grid)
+        steps = steps_between(grid, start, goal, include_diagonals)
+        if steps is None:
+            with pytest.raises(NoValidPathError):
+                quickest_path(grid[start], grid[goal], grid, include_diagonals, algorithm="bidirectional")
+        else:
+            path = quickest_path(grid[start], grid[goal], grid, include_diagonals, algorithm="bidirectional")
+            assert assert_valid_path(grid, start, goal, path, include_diagonals) == steps
+
+def test_a_boxed_in_goal_is_given_up_on_quickly():
+    grid = Grid((0, 0), (60, 60), node_spacing=1.0)
+    grid.obstacle_layer[57, 56:61] = True
+    grid.obstacle_layer[57:, 56] = True
+    stats = {}
+    with pytest.raises(NoValidPathError):
+        quickest_path(grid[0, 0], grid[59, 59], grid, algorithm="bidirectional", stats=stats)
+    # Only the few nodes in the box are expanded, not the open ground around the start
+    assert stats["expansions"] < 20
+
+def test_a_start_on_the_goal_needs_no_moves():
+    grid = Grid((0, 0), (5, 5), node_spacing=1.0)
+    assert quickest_path(grid[2, 2], grid[2, 2], grid, algorithm="bidirectional") == []
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from chunked_grid import ChunkedGrid
+from anytime_planner import AnytimePlanner
+from pathfinding import quickest_path
+from planner_checks import assert_valid_path
+
+def walled_grid():
+    """A grid with a wall 256 nodes long that fills whole tiles, so the only way around it is through tiles that were never allocated"""
+    grid = ChunkedGrid((0, 0), node_spacing=1.0)
+    rows = np.arange(-128, 128)
+    grid.obstacle_layer[rows, np.full(len(rows), 10)] = True
+    return grid
+
+@pytest.mark.parametrize("algorithm", ["astar", "jps", "bidirectional"])
+def test_detours_around_everything_seen_are_found(algorithm):
+    grid = walled_grid()
+    start, goal = grid.nearest_node((0, 0)), grid.nearest_node((20, 0))
+    path = quickest_path(start, goal, grid, algorithm=algorithm)
+    moves = assert_valid_path(grid, start.coords, goal.coords, path)
+    assert moves >= 2 * 128
+
+def test_stateful_planners_find_detours_too():
+    grid = walled_grid()
+    start, goal = grid.nearest_node((0, 0)), grid.nearest_node((20, 0))
+    path = AnytimePlanner(grid, goal).quickest_path(start)
+    shortest = quickest_path(start, goal, grid, algorithm="bidirectional")
+    assert assert_valid_path(grid, start.coords, goal.coords, path) == len(shortest)
+
+def test_the_window_must_keep_a_margin():
+    with pytest.raises(ValueError):
+        ChunkedGrid((0, 0), search_margin=0)
@@ -0,0 +1,43 @@
+import contextlib
+import io
+import multiprocessing
+import pickle
+import pytest
+from fleet import SharedMap, run_fleet
+from simulated_rover import SimulatedRover, World
+
+def mark_in_another_process(shared_map):
+    shared_map.grid.obstacle_layer[2, 3] = True
+    shared_map.changed()
+    shared_map.close()
+
+def test_a_shared_map_is_attached_to_rather_than_copied():
+    shared_map = SharedMap((0, 0), (8, 8), node_spacing=1.0)
+    try:
+        copy = pickle.loads(pickle.dumps(shared_map))
+        assert copy.name == shared_map.name
+        copy.close()
+
+        process = multiprocessing.Process(target=mark_in_another_process, args=(shared_map,))
+        process.start()
+        process.join()
+        assert process.exitcode == 0
+        assert shared_map.grid.obstacle_layer[2, 3] and shared_map.version == 1
+    finally:
+        shared_map.close()
+        shared_map.unlink()
+
+def test_every_rover_reaches_its_own_end():
+    # A rock between two rovers crossing each other's paths
+    world = World([[4.0, 4.0, 0.5]], [], (0.0, 0.0), (8.0, 8.0))
+    rovers = [SimulatedRover(world, time_limit=600), SimulatedRover(World(world.rocks, [], (8.0, 0.0), (0.0, 8.0)), time_limit=600)]
+    end_points = [(8.0, 8.0), (0.0, 8.0)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_fleet(rovers, end_points, realtime=False)
+    for rover, end_point in zip(rovers, end_points):
+        assert ((rover.x - end_point[0]) ** 2 + (rover.y - end_point[1]) ** 2) ** 0.5 < 1.0
+        assert rover.min_clearance > 0
+
+def test_every_rover_needs_an_end():
+    with pytest.raises(ValueError):
+        run_fleet([SimulatedRover(World([], [], (0.0, 0.0), (1.0, 0.0)))], [])
@@ -0,0 +1,34 @@
+import pytest
+from grid import Grid
+from grid_node import GridNode
+
+def test_nodes_are_views_onto_their_grid():
+    grid = Grid((0, 0), (4, 4), node_spacing=1.0)
+    node = GridNode(grid, 1, 2)
+    node.is_obstacle = True
+    node.parent = grid[1, 1]
+    assert grid.obstacle_layer[1, 2]
+    assert grid[1, 2] == node and grid[1, 2].parent == grid[1, 1]
+    assert GridNode(grid=grid, row=1, column=2) == node
+
+def test_the_old_signature_still_builds_a_node_with_a_warning():
+    with pytest.warns(DeprecationWarning):
+        node = GridNode(1, 2, is_obstacle=True, on_path=True)
+    assert node.coords == (1, 2)
+    assert node.is_obstacle and node.on_path and not node.is_padding and not node.is_rover
+    assert repr(node) == "x"
+    with pytest.warns(DeprecationWarning):
+        parent = GridNode(row=1, column=1)
+    node.parent = parent
+    assert node.parent is parent
+    # Detached nodes keep their own state, so two built for the same cell are not the same node
+    with pytest.warns(DeprecationWarning):
+        assert GridNode(1, 2) != node
+
+def test_detached_nodes_can_be_copied_onto_a_grid():
+    grid = Grid((0, 0), (4, 4), node_spacing=1.0)
+    with pytest.warns(DeprecationWarning):
+        node = GridNode(2, 3, True, is_rover=True)
+    grid[2][3] = node
+    assert grid[2, 3].is_obstacle and grid[2, 3].is_rover
+    assert grid.rover_coords == (2, 3)
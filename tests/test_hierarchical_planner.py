@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+from grid import Grid
+import hierarchical_planner
+from hierarchical_planner import HierarchicalPlanner
+from errors import NoValidPathError
+from pathfinding import quickest_path
+from planner_checks import random_grid, random_free_node, steps_between, assert_valid_path
+
+def test_crossing_only_possible_diagonally_across_a_cluster_border():
+    grid = Grid((0, 0), (8, 8), node_spacing=1.0)
+    grid.obstacle_layer[3:5, :] = True
+    grid.obstacle_layer[3, 1] = False
+    grid.obstacle_layer[4, 2] = False
+    planner = HierarchicalPlanner(grid, grid[7, 7], cluster_size=4)
+    assert_valid_path(grid, (0, 0), (7, 7), planner.quickest_path(grid[0, 0]))
+
+def test_crossing_only_possible_diagonally_across_a_cluster_corner():
+    grid = Grid((0, 0), (8, 8), node_spacing=1.0)
+    grid.obstacle_layer[:] = True
+    grid.obstacle_layer[:4, :4] = False
+    grid.obstacle_layer[4:, 4:] = False
+    planner = HierarchicalPlanner(grid, grid[7, 7], cluster_size=4)
+    assert_valid_path(grid, (0, 0), (7, 7), planner.quickest_path(grid[0, 0]))
+
+def test_start_in_padding_beside_a_cluster_border():
+    grid = Grid((0, 0), (8, 8), node_spacing=1.0)
+    grid.obstacle_layer[:, 2] = True
+    grid.padding_layer[:, 3] = True
+    planner = HierarchicalPlanner(grid, grid[0, 7], cluster_size=4)
+    assert_valid_path(grid, (5, 3), (0, 7), planner.quickest_path(grid[5, 3]))
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_finds_a_path_whenever_one_exists_as_the_map_changes(include_diagonals):
+    generator = np.random.RandomState(0)
+    for _ in range(60):
+        grid = random_grid(generator)
+        goal = random_free_node(generator, grid)
+        planner = HierarchicalPlanner(grid, grid[goal], cluster_size=generator.choice([3, 4, 8]), include_diagonals=include_diagonals)
+        for _ in range(4):
+            start = random_free_node(generator, grid)
+            if steps_between(grid, start, goal, include_diagonals) is None:
+                with pytest.raises(NoValidPathError):
+                    planner.quickest_path(grid[start])
+            else:
+                assert_valid_path(grid, start, goal, planner.quickest_path(grid[start]), include_diagonals)
+            # Toggles a node between queries, so that the planner has to repair its clusters
+            row, column = generator.randint(grid.height), generator.randint(grid.width)
+            if (row, column) != goal:
+                grid.obstacle_layer[row, column] = not grid.obstacle_layer[row, column]
+
+def flat_search_that_never_finds_a_route(*args, **kwargs):
+    """Stands in for the flat search, which should only ever confirm that there is no route"""
+    with pytest.raises(NoValidPathError):
+        quickest_path(*args, **kwargs)
+    raise NoValidPathError
+
+def test_starts_in_padding_leave_it_through_the_abstract_graph(monkeypatch):
+    monkeypatch.setattr(hierarchical_planner, "quickest_path", flat_search_that_never_finds_a_route)
+    generator = np.random.RandomState(8)
+    for _ in range(60):
+        grid = random_grid(generator, density=0.15, min_size=10, max_size=30)
+        grid.padding_layer[:] = generator.rand(grid.height, grid.width) < 0.3
+        goal = random_free_node(generator, grid)
+        grid.padding_layer[goal] = False
+        cluster_size = generator.choice([3, 4, 8])
+        planner = HierarchicalPlanner(grid, grid[goal], cluster_size=cluster_size)
+        for _ in range(4):
+            # Starts on a cluster border inside padding, where the only way out may be into the next cluster
+            start = (generator.randint(grid.height), min(cluster_size * generator.randint(1, 4) - 1, grid.width - 1))
+            grid.obstacle_layer[start] = False
+            grid.padding_layer[start] = True
+            # A blocked start may step into any free neighbour, as the flat planners allow
+            reachable = [steps_between(grid, neighbour, goal) for neighbour in
+                         [(start[0] + i, start[1] + j) for i in (-1, 0, 1) for j in (-1, 0, 1)]
+                         if 0 <= neighbour[0] < grid.height and 0 <= neighbour[1] < grid.width and not grid.blocked_layer()[neighbour]]
+            if all(steps is None for steps in reachable) and start != goal:
+                with pytest.raises(NoValidPathError):
+                    planner.quickest_path(grid[start])
+            else:
+                assert_valid_path(grid, start, goal, planner.quickest_path(grid[start]))
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+from grid import Grid
+from incremental_planner import DStarLite
+from errors import NoValidPathError
+from planner_checks import random_grid, random_free_node, steps_between, assert_valid_path
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_paths_stay_shortest_as_the_map_changes(include_diagonals):
+    generator = np.random.RandomState(2)
+    for _ in range(40):
+        grid = random_grid(generator)
+        goal = random_free_node(generator, grid)
+        planner = DStarLite(grid, grid[goal], include_diagonals=include_diagonals)
+        for _ in range(6):
+            start = random_free_node(generator, grid)
+            steps = steps_between(grid, start, goal, include_diagonals)
+            if steps is None:
+                with pytest.raises(NoValidPathError):
+                    planner.quickest_path(grid[start])
+            else:
+                path = planner.quickest_path(grid[start])
+                assert assert_valid_path(grid, start, goal, path, include_diagonals) == steps
+            # Toggles a handful of nodes between queries, so that the planner has to repair its search
+            for _ in range(generator.randint(1, 6)):
+                row, column = generator.randint(grid.height), generator.randint(grid.width)
+                if (row, column) != goal:
+                    grid.obstacle_layer[row, column] = not grid.obstacle_layer[row, column]
+
+def test_a_new_wall_is_routed_around():
+    grid = Grid((0, 0), (12, 12), node_spacing=1.0)
+    planner = DStarLite(grid, grid[11, 6])
+    assert len(planner.quickest_path(grid[0, 6])) == 11
+    grid.obstacle_layer[5, 1:11] = True
+    path = planner.quickest_path(grid[1, 6])
+    assert assert_valid_path(grid, (1, 6), (11, 6), path) == steps_between(grid, (1, 6), (11, 6))
+    assert planner.expansions > 0
+
+def test_a_start_on_the_goal_needs_no_moves():
+    grid = Grid((0, 0), (5, 5), node_spacing=1.0)
+    assert DStarLite(grid, grid[2, 2]).quickest_path(grid[2, 2]) == []
@@ -0,0 +1,32 @@
+import numpy as np
+from grid import Grid
+from inflation import ObstacleInflator
+
+def padded_one_at_a_time(shape, rows, columns, radius):
+    """Every node whose centre lies within `radius` nodes of an obstacle other than itself, found node by node"""
+    padding = np.zeros(shape, dtype=bool)
+    for row in range(shape[0]):
+        for column in range(shape[1]):
+            for obstacle_row, obstacle_column in zip(rows, columns):
+                if (row, column) != (obstacle_row, obstacle_column) and (row - obstacle_row) ** 2 + (column - obstacle_column) ** 2 <= radius ** 2:
+                    padding[row, column] = True
+    return padding
+
+def test_pads_every_node_within_the_radius():
+    generator = np.random.RandomState(5)
+    for radius in [0, 1, 2, 3]:
+        grid = Grid((0, 0), (15, 12), node_spacing=1.0)
+        # Obstacles along the edges as well, whose kernels fall partly off the grid
+        rows = np.concatenate((generator.randint(grid.height, size=6), [0, grid.height - 1]))
+        columns = np.concatenate((generator.randint(grid.width, size=6), [grid.width - 1, 0]))
+        ObstacleInflator(radius).inflate(grid, rows, columns)
+        assert np.array_equal(grid.padding_layer, padded_one_at_a_time(grid.padding_layer.shape, rows, columns, radius))
+
+def test_keeps_the_rover_node_clear():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    inflator = ObstacleInflator(2)
+    inflator.inflate(grid, [5], [5], keep_clear=(5, 6))
+    assert not grid.padding_layer[5, 6] and grid.padding_layer[5, 7] and grid.padding_layer[5, 4]
+    # Padding that was there before is left alone
+    inflator.inflate(grid, [5], [8], keep_clear=(5, 7))
+    assert grid.padding_layer[5, 7]
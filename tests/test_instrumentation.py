@@ -0,0 +1,41 @@
+import contextlib
+import io
+from run_course import run_course
+from simulated_rover import SimulatedRover, rock_field
+from instrumentation import RunStats, PHASES, COUNTERS
+
+def test_phases_are_timed_per_iteration_and_counters_summed():
+    seen = []
+    stats = RunStats(callback=lambda run_stats, record: seen.append(dict(record)))
+    for _ in range(3):
+        stats.begin_iteration()
+        stats.record("sense")
+        stats.record("plan")
+        stats.record("plan")
+        stats.count("expansions", 5)
+    stats.finish()
+    stats.finish()
+
+    assert len(stats.iterations) == 3 and seen == stats.iterations
+    assert all(set(record) == {"sense", "plan"} for record in stats.iterations)
+    assert len(stats.phase_times("plan")) == 3 and stats.phase_times("move") == []
+    # The first record covers setup, so only the ones after it count as iterations of the loop
+    assert stats.counters["iterations"] == 2
+    assert stats.counters["expansions"] == 15
+    # Only the phases that ran get a row, between the header and the counters
+    assert [line.split()[0] for line in stats.summary().splitlines()[1:-1]] == ["sense", "plan"]
+
+def test_run_course_fills_in_every_phase_it_runs():
+    world = rock_field(size=10.0, density=0.05, seed=2)
+    stats = RunStats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_course(SimulatedRover(world, time_limit=600), world.end, realtime=False, backup_routes=0, stats=stats)
+
+    assert set(stats.counters) == set(COUNTERS)
+    assert stats.counters["iterations"] == len(stats.iterations) - 1 > 0
+    assert stats.counters["expansions"] > 0 and stats.counters["sweeps"] >= stats.counters["sweeps_skipped"]
+    assert set(stats.iterations[0]) >= {"build", "plan"}
+    for phase in ["sense", "mark", "move"]:
+        assert len(stats.phase_times(phase)) > 0
+    assert set().union(*stats.iterations) <= set(PHASES)
+    assert all(time >= 0 for record in stats.iterations for time in record.values())
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+from grid import Grid
+from pathfinding import quickest_path
+from errors import NoValidPathError
+from planner_checks import random_grid, random_free_node, steps_between, assert_valid_path
+
+@pytest.mark.parametrize("density", [0.1, 0.3, 0.45])
+def test_paths_are_as_short_as_a_flat_search(density):
+    generator = np.random.RandomState(7)
+    for _ in range(80):
+        grid = random_grid(generator, density=density)
+        start, goal = random_free_node(generator, grid), random_free_node(generator, grid)
+        steps = steps_between(grid, start, goal)
+        if steps is None:
+            with pytest.raises(NoValidPathError):
+                quickest_path(grid[start], grid[goal], grid, algorithm="jps")
+        else:
+            path = quickest_path(grid[start], grid[goal], grid, algorithm="jps")
+            assert assert_valid_path(grid, start, goal, path) == steps
+
+def test_jumps_are_filled_in_node_by_node():
+    grid = Grid((0, 0), (30, 30), node_spacing=1.0)
+    grid.obstacle_layer[15, 2:] = True
+    path = quickest_path(grid[29, 29], grid[0, 29], grid, algorithm="jps")
+    assert assert_valid_path(grid, (29, 29), (0, 29), path) == steps_between(grid, (29, 29), (0, 29))
+
+def test_expands_fewer_nodes_than_a_star_on_open_ground():
+    grid = Grid((0, 0), (60, 60), node_spacing=1.0)
+    grid.obstacle_layer[20:40, 30] = True
+    jps, astar = {}, {}
+    quickest_path(grid[30, 0], grid[30, 59], grid, algorithm="jps", stats=jps)
+    quickest_path(grid[30, 0], grid[30, 59], grid, algorithm="astar", stats=astar)
+    assert jps["expansions"] < astar["expansions"]
+
+def test_requires_diagonal_moves():
+    grid = Grid((0, 0), (5, 5), node_spacing=1.0)
+    with pytest.raises(ValueError):
+        quickest_path(grid[0, 0], grid[4, 4], grid, include_diagonals=False, algorithm="jps")
@@ -0,0 +1,45 @@
+from math import isinf, pi, sin, cos, radians
+import numpy as np
+from grid import Grid
+from locate_obstacles import locate_obstacles, locate_obstacles_array
+
+class StillRover:
+    def __init__(self, x, y, heading, laser_distances):
+        self.x, self.y, self.heading = x, y, heading
+        self.laser_distances = laser_distances
+
+def locate_one_at_a_time(rover, sweep_angle=pi/2, sensors_to_ignore=[7]):
+    """The obstacle positions worked out ray by ray, as they were before sweeps were located with array operations"""
+    obstacles = []
+    for i, distance in enumerate(rover.laser_distances):
+        if i in sensors_to_ignore or isinf(distance):
+            continue
+        obstacle_heading = radians(rover.heading) + sweep_angle * (-0.5 + float(i) / (len(rover.laser_distances) - 1))
+        obstacles.append((rover.x + distance * cos(obstacle_heading), rover.y + distance * sin(obstacle_heading)))
+    return obstacles
+
+def test_sweeps_are_located_as_they_were_ray_by_ray():
+    generator = np.random.RandomState(4)
+    for _ in range(50):
+        distances = (generator.rand(15) * 8).tolist()
+        for i in generator.choice(15, generator.randint(0, 15), replace=False):
+            distances[i] = float("inf")
+        rover = StillRover(generator.rand() * 20 - 10, generator.rand() * 20 - 10, generator.rand() * 360, distances)
+        ignored = [7, int(generator.randint(15))]
+        expected = locate_one_at_a_time(rover, sensors_to_ignore=ignored)
+        assert np.allclose(np.array(locate_obstacles(rover, sensors_to_ignore=ignored)).reshape(-1, 2), np.array(expected).reshape(-1, 2))
+        assert locate_obstacles_array(rover, sensors_to_ignore=ignored).shape == (len(expected), 2)
+
+def test_a_sweep_that_hits_nothing_locates_nothing():
+    rover = StillRover(0.0, 0.0, 0.0, [float("inf")] * 15)
+    assert locate_obstacles(rover) == []
+    assert locate_obstacles_array(rover).shape == (0, 2)
+
+def test_nearest_indices_agree_with_nearest_node():
+    generator = np.random.RandomState(5)
+    grid = Grid((-4.0, 3.0), (6.0, -5.0), node_spacing=0.4)
+    # Points on and between the nodes, and some well off the grid
+    points = np.vstack((generator.rand(300, 2) * 14 - 7, grid.locations(*np.nonzero(np.ones((grid.height, grid.width), dtype=bool)))))
+    rows, columns = grid.nearest_indices(points)
+    for point, row, column in zip(points, rows, columns):
+        assert grid.nearest_node(tuple(point)).coords == (row, column)
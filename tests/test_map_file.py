@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from grid import Grid
+from map_file import MapFile
+
+def random_layers(generator, grid):
+    grid.obstacle_layer[:] = generator.rand(grid.height, grid.width) < 0.2
+    grid.padding_layer[:] = generator.rand(grid.height, grid.width) < 0.3
+
+@pytest.mark.parametrize("corners", [((0, 0), (8, 8)), ((-3.5, 2.0), (10.0, -7.25)), ((0, 0), (37, 5))])
+def test_grids_survive_a_round_trip(tmp_path, corners):
+    grid = Grid(corners[0], corners[1], node_spacing=0.5)
+    random_layers(np.random.RandomState(17), grid)
+    path = str(tmp_path / "course.map")
+    MapFile.create(path, grid)
+
+    loaded = MapFile(path).load()
+    assert (loaded.height, loaded.width) == (grid.height, grid.width)
+    assert loaded.start == grid.start and loaded.node_spacing == grid.node_spacing
+    assert np.array_equal(loaded.obstacle_layer, grid.obstacle_layer)
+    assert np.array_equal(loaded.padding_layer, grid.padding_layer)
+
+def test_recorded_rows_reach_the_file_and_others_are_left_alone(tmp_path):
+    grid = Grid((0, 0), (20, 20), node_spacing=1.0)
+    path = str(tmp_path / "course.map")
+    map_file = MapFile.create(path, grid)
+
+    grid.obstacle_layer[5, 3] = True
+    grid.padding_layer[4:7, 2:5] = True
+    grid.obstacle_layer[15, 15] = True
+    map_file.record(grid, [5], margin=1)
+    map_file.flush()
+
+    loaded = MapFile(path).load()
+    assert np.array_equal(loaded.padding_layer, grid.padding_layer)
+    assert loaded.obstacle_layer[5, 3] and not loaded.obstacle_layer[15, 15]
+
+    map_file.save(grid)
+    map_file.flush()
+    assert np.array_equal(MapFile(path).load().obstacle_layer, grid.obstacle_layer)
+
+def test_other_files_and_mismatched_grids_are_rejected(tmp_path):
+    path = str(tmp_path / "course.map")
+    with open(path, "wb") as other:
+        other.write(b"not a map file at all, but long enough to have a header" * 4)
+    with pytest.raises(ValueError):
+        MapFile(path)
+
+    map_file = MapFile.create(path, Grid((0, 0), (8, 8), node_spacing=1.0))
+    with pytest.raises(ValueError):
+        map_file.save(Grid((0, 0), (9, 8), node_spacing=1.0))
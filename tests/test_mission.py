@@ -0,0 +1,50 @@
+import itertools
+import numpy as np
+from mission import path_cost_matrix, plan_visit_order
+from planner_checks import random_grid, random_free_node, steps_between
+
+def tour_cost(costs, stops):
+    return sum(costs[a, b] for a, b in zip(stops, stops[1:]))
+
+def test_cost_matrix_matches_a_flat_search():
+    generator = np.random.RandomState(3)
+    for _ in range(10):
+        grid = random_grid(generator, density=0.25, min_size=10, max_size=25)
+        coords = [random_free_node(generator, grid) for _ in range(5)]
+        points = [grid.location(*node) for node in coords]
+        costs = path_cost_matrix(grid, points)
+        for i, j in itertools.permutations(range(len(points)), 2):
+            if coords[i] == coords[j]:
+                continue
+            steps = steps_between(grid, coords[i], coords[j])
+            straight = np.hypot(points[i][0] - points[j][0], points[i][1] - points[j][1])
+            if steps is None:
+                assert costs[i, j] == np.inf
+            else:
+                assert costs[i, j] == max(steps * grid.node_spacing, straight)
+
+def test_visit_order_matches_the_best_tour_on_small_missions():
+    generator = np.random.RandomState(4)
+    for _ in range(30):
+        points = generator.rand(7, 2) * 20
+        costs = np.hypot(points[:, np.newaxis, 0] - points[np.newaxis, :, 0], points[:, np.newaxis, 1] - points[np.newaxis, :, 1])
+        order = plan_visit_order(costs, start=0, end=0)
+        assert sorted(order) == list(range(1, 7))
+        best = min(tour_cost(costs, [0] + list(tour) + [0]) for tour in itertools.permutations(range(1, 7)))
+        # Nearest neighbour with 2-opt is not always optimal, but stays close on missions this small
+        assert tour_cost(costs, [0] + order + [0]) <= 1.1 * best
+
+def test_visit_order_follows_points_around_a_circle():
+    angles = np.linspace(0, 2 * np.pi, 12, endpoint=False)
+    shuffled = np.random.RandomState(5).permutation(12)
+    points = np.column_stack((np.cos(angles[shuffled]), np.sin(angles[shuffled])))
+    costs = np.hypot(points[:, np.newaxis, 0] - points[np.newaxis, :, 0], points[:, np.newaxis, 1] - points[np.newaxis, :, 1])
+    order = [0] + plan_visit_order(costs, start=0, end=0) + [0]
+    # The only shortest round trip visits neighbouring points around the circle one after another
+    steps = [(shuffled[b] - shuffled[a]) % 12 for a, b in zip(order, order[1:])]
+    assert set(steps) in ({1}, {11})
+
+def test_open_tours_finish_at_the_far_end():
+    points = np.array([[0.0, 0.0], [3.0, 0.0], [1.0, 0.0], [2.0, 0.0]])
+    costs = np.abs(points[:, np.newaxis, 0] - points[np.newaxis, :, 0])
+    assert plan_visit_order(costs, start=0) == [2, 3, 1]
@@ -0,0 +1,62 @@
+import pytest
+from grid import Grid
+from move_rover import follow_path, PurePursuit
+from simulated_rover import SimulatedRover, World
+from errors import ObseleteGridError
+
+class PinnedRover:
+    """A rover that accepts every command without moving, as if it were pressed against an obstacle its LiDAR cannot see"""
+
+    def __init__(self):
+        self.x, self.y, self.heading = 0.0, 0.0, 0.0
+        self.laser_distances = [float("inf")] * 15
+        self.commands = 0
+
+    def send_command(self, linear_speed, angular_speed):
+        self.commands += 1
+
+def test_follows_a_path_to_its_end():
+    world = World([], [], (0.0, 0.0), (4.0, 2.0))
+    rover = SimulatedRover(world, time_limit=200)
+    grid = Grid((-1, -1), (5, 5), node_spacing=0.5)
+    follow_path(rover, [(2.0, 0.0), (4.0, 2.0)], grid, realtime=False)
+    assert abs(rover.x - 4.0) < 0.2 and abs(rover.y - 2.0) < 0.2
+
+def test_a_rover_that_stops_making_progress_asks_for_a_new_route():
+    rover = PinnedRover()
+    grid = Grid((-1, -1), (5, 5), node_spacing=0.5)
+    with pytest.raises(ObseleteGridError):
+        follow_path(rover, [(2.0, 0.0), (4.0, 2.0)], grid, realtime=False, control_rate=20.0, stuck_timeout=2.0)
+    # The rover is given the timeout's worth of commands and a final stop, rather than being driven forever
+    assert rover.commands <= 2.0 * 20.0 + 2
+
+def test_remaining_waypoints_drop_the_ones_passed():
+    controller = PurePursuit((0.0, 0.0), [(2.0, 0.0), (2.0, 2.0), (4.0, 2.0)])
+    assert controller.remaining_waypoints == [(2.0, 0.0), (2.0, 2.0), (4.0, 2.0)]
+    assert controller.distance_remaining(0.0, 0.0) == pytest.approx(6.0)
+    controller.command(2.0, 0.5, 90.0)
+    assert controller.remaining_waypoints == [(2.0, 2.0), (4.0, 2.0)]
+    assert controller.distance_remaining(2.0, 0.5) == pytest.approx(3.5)
+
+def drive(controller, rover, limit=2000):
+    """Steers a simulated rover with a controller until it arrives, returning every position it passed through"""
+    positions = [(rover.x, rover.y)]
+    for _ in range(limit):
+        command = controller.command(rover.x, rover.y, rover.heading)
+        if command is None:
+            return positions
+        rover.send_command(*command)
+        positions.append((rover.x, rover.y))
+    raise AssertionError("The rover never arrived")
+
+def test_corners_near_the_end_are_not_cut():
+    # A hairpin around the end of a thin wall. The end is within the lookahead distance of the rover long before it reaches the corners, which are not
+    wall_y, wall_end_x = 0.25, 2.2
+    rover = SimulatedRover(World([], [[0.5, wall_y, wall_end_x, wall_y]], (0.0, 0.0), (1.5, 0.5)))
+    controller = PurePursuit((0.0, 0.0), [(3.2, 0.0), (3.2, 0.5), (1.5, 0.5)])
+    positions = drive(controller, rover)
+    assert abs(rover.x - 1.5) < 0.15 and abs(rover.y - 0.5) < 0.15
+    for (x1, y1), (x2, y2) in zip(positions, positions[1:]):
+        if (y1 - wall_y) * (y2 - wall_y) < 0:
+            # The rover only crosses the line of the wall beyond its end
+            assert x1 + (x2 - x1) * (wall_y - y1) / (y2 - y1) > wall_end_x
@@ -0,0 +1,113 @@
+import contextlib
+import io
+import numpy as np
+import pytest
+from errors import NoValidPathError
+from grid import Grid
+from inflation import ObstacleInflator
+from obstacle_index import ClearanceFilter, ObstacleIndex
+from pathfinding import line_of_sight, quickest_path
+from run_course import run_course
+from simulated_rover import SimulatedRover, World, rock_field
+
+def segment_distances(points, start, end):
+    """The distance from every point to a line, measured one point at a time"""
+    start, end = np.array(start, dtype=float), np.array(end, dtype=float)
+    distances = []
+    for point in points:
+        change = end - start
+        along = 0.0 if not change.any() else min(max((point - start).dot(change) / change.dot(change), 0.0), 1.0)
+        distances.append(float(np.hypot(*(point - start - along * change))))
+    return np.array(distances)
+
+@pytest.mark.parametrize("bucket_size", [0.3, 1.0, 4.0])
+def test_distances_match_every_obstacle_checked_in_turn(bucket_size):
+    generator = np.random.RandomState(25)
+    index = ObstacleIndex(bucket_size=bucket_size)
+    points = np.zeros((0, 2))
+    for _ in range(5):
+        batch = generator.rand(40, 2) * 30 - 15
+        index.add(batch)
+        points = np.vstack((points, batch))
+    assert len(index) == 200
+
+    for _ in range(100):
+        point = generator.rand(2) * 40 - 20
+        nearest = np.hypot(*(points - point).T).min()
+        assert index.nearest_distance(point) == pytest.approx(nearest)
+        limit = generator.rand() * 3
+        assert index.nearest_distance(point, limit=limit) == (pytest.approx(nearest) if nearest <= limit else float("inf"))
+
+        end = point + generator.rand(2) * 10 - 5
+        nearest = segment_distances(points, point, end).min()
+        assert index.segment_distance(point, end, limit) == (pytest.approx(nearest) if nearest <= limit else float("inf"))
+
+def test_an_empty_index_is_clear_everywhere():
+    index = ObstacleIndex()
+    assert index.nearest_distance((0, 0)) == float("inf")
+    index.add([[1.0, 1.0]])
+    index.clear()
+    assert len(index) == 0 and index.segment_distance((0, 0), (2, 2), 1.0) == float("inf")
+    with pytest.raises(ValueError):
+        ObstacleIndex(bucket_size=0)
+
+def test_lines_keep_their_clearance_from_the_obstacles_themselves():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    index = ObstacleIndex()
+    # An obstacle just off the line between the two nodes, in a node the line does not cross
+    index.add([[5.0, 2.3]])
+    assert line_of_sight(grid, (2, 0), (2, 9))
+    assert not line_of_sight(grid, (2, 0), (2, 9), obstacle_index=index, clearance=0.5)
+    assert line_of_sight(grid, (2, 0), (2, 9), obstacle_index=index, clearance=0.2)
+
+def test_exact_clearance_keeps_the_rover_away_from_rocks():
+    world = rock_field(size=12.0, density=0.05, seed=6)
+    rover = SimulatedRover(world, time_limit=600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_course(rover, world.end, realtime=False, backup_routes=0, clearance="exact", obstacle_padding=0.4)
+    assert ((rover.x - world.end[0]) ** 2 + (rover.y - world.end[1]) ** 2) ** 0.5 < 1.0
+    assert rover.min_clearance >= 0.4
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_every_step_between_free_nodes_keeps_the_padding(include_diagonals):
+    generator = np.random.RandomState(25)
+    grid = Grid((0, 0), (10, 10), node_spacing=0.4)
+    clearance_filter = ClearanceFilter(grid, 0.5, include_diagonals=include_diagonals)
+    points = generator.rand(30, 2) * 10
+    clearance_filter.add_obstacles(points)
+
+    free = ~grid.blocked_layer()
+    steps = [(0, 1), (1, 0), (1, 1), (1, -1)] if include_diagonals else [(0, 1), (1, 0)]
+    for row, column in zip(*np.nonzero(free)):
+        for row_step, column_step in steps:
+            if grid.contains(row + row_step, column + column_step) and free[row + row_step, column + column_step]:
+                start, end = grid.location(row, column), grid.location(row + row_step, column + column_step)
+                assert segment_distances(points, start, end).min() >= 0.5
+
+def wall_with_a_gap(spacing):
+    """Points along the line y = 5, broken between x = 5.25 and x = 6.85"""
+    xs = np.concatenate((np.arange(-10, 5.25, spacing), [5.25], np.arange(6.85, 25, spacing)))
+    return np.column_stack((xs, np.full(len(xs), 5.0)))
+
+def test_padding_measured_from_the_obstacles_opens_gaps_whole_nodes_close():
+    # The gap is 1.6 m wide, enough to pass through keeping 0.5 m from both sides, but padding of 0.5 m rounds up to two whole nodes
+    exact = Grid.oversized_grid((6.0, 0.0), (6.0, 10.0), node_spacing=0.4, buffer_distance=5.0)
+    ClearanceFilter(exact, 0.5).add_obstacles(wall_with_a_gap(0.05))
+    path = quickest_path(exact.nearest_node((6.0, 0.0)), exact.nearest_node((6.0, 10.0)), exact)
+    locations = [exact.location(*node.coords) for node in path]
+    assert min(segment_distances(wall_with_a_gap(0.05), start, end).min() for start, end in zip(locations, locations[1:])) >= 0.5
+
+    cells = Grid.oversized_grid((6.0, 0.0), (6.0, 10.0), node_spacing=0.4, buffer_distance=5.0)
+    rows, columns = cells.nearest_indices(wall_with_a_gap(0.05))
+    cells.obstacle_layer[rows, columns] = True
+    ObstacleInflator(2).inflate(cells, rows, columns)
+    with pytest.raises(NoValidPathError):
+        quickest_path(cells.nearest_node((6.0, 0.0)), cells.nearest_node((6.0, 10.0)), cells)
+
+def test_exact_clearance_drives_through_a_gap_padding_would_close():
+    world = World([], [[-10.0, 5.0, 5.25, 5.0], [6.85, 5.0, 25.0, 5.0]], (6.0, 0.0), (6.0, 10.0))
+    rover = SimulatedRover(world, time_limit=300)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_course(rover, world.end, realtime=False, backup_routes=0, clearance="exact", obstacle_padding=0.5)
+    assert ((rover.x - world.end[0]) ** 2 + (rover.y - world.end[1]) ** 2) ** 0.5 < 1.0
+    assert rover.min_clearance >= 0.5
@@ -0,0 +1,58 @@
+import numpy as np
+from grid import Grid
+from inflation import ObstacleInflator
+from occupancy import OccupancyMap
+
+class StillRover:
+    def __init__(self, x, y, heading, laser_distances):
+        self.x, self.y, self.heading = x, y, heading
+        self.laser_distances = laser_distances
+
+def new_map(**options):
+    grid = Grid((-10, -10), (10, 10), node_spacing=0.5)
+    return grid, OccupancyMap(grid, ObstacleInflator(1), sensors_to_ignore=[], **options)
+
+def test_a_spurious_reading_is_removed_once_rays_pass_through_it():
+    grid, occupancy = new_map()
+    rover = StillRover(0.0, 0.0, 0.0, [float("inf")] * 15)
+    rover.laser_distances[7] = 2.0
+    rows, columns = occupancy.new_cells(rover)
+    assert len(rows) == 1 and grid.obstacle_layer[rows[0], columns[0]] and grid.padding_layer.any()
+
+    # The reading is not repeated, and the ray now sees further through the same spot
+    for distance in [5.0, 5.05, 5.1, 5.15]:
+        rover.laser_distances[7] = distance
+        occupancy.new_cells(rover)
+    assert not grid.obstacle_layer[rows[0], columns[0]]
+    assert occupancy.cells_removed >= 1
+    # The padding around the removed reading goes with it, while the obstacle now seen keeps its own
+    padded_rows, padded_columns = np.nonzero(grid.padding_layer)
+    far = grid.nearest_node((5.0, 0.0)).coords
+    assert all(max(abs(row - far[0]), abs(column - far[1])) <= 3 for row, column in zip(padded_rows, padded_columns))
+
+def test_log_odds_stay_within_their_limits():
+    grid, occupancy = new_map(maximum=2.0, minimum=-1.0)
+    rover = StillRover(0.0, 0.0, 0.0, [3.0] * 15)
+    for sweep in range(10):
+        # Tiny changes in range get each sweep past the check for unchanged sweeps
+        rover.laser_distances = [3.0 + 0.05 * (sweep % 2)] * 15
+        occupancy.new_cells(rover)
+    assert occupancy.log_odds.max() <= 2.0 and occupancy.log_odds.min() >= -1.0
+    assert occupancy.skipped_sweeps == 0
+
+def test_fading_removes_stale_obstacles_before_recent_ones():
+    grid, occupancy = new_map(stale_after=2)
+    rover = StillRover(0.0, 0.0, 0.0, [float("inf")] * 15)
+    rover.laser_distances[0] = 2.0
+    old_rows, old_columns = occupancy.new_cells(rover)
+    rover.laser_distances = [float("inf")] * 15
+    rover.heading = 180.0
+    for sweep in range(4):
+        rover.laser_distances[14] = 2.0 + 0.05 * sweep
+        occupancy.new_cells(rover)
+    recent = np.flatnonzero(grid.obstacle_layer.ravel() & (occupancy.last_observed.ravel() == occupancy.sweeps))
+    assert len(recent) > 0
+
+    assert occupancy.fade(amount=5.0) == 1
+    assert not grid.obstacle_layer[old_rows[0], old_columns[0]]
+    assert grid.obstacle_layer.flat[recent].all()
@@ -0,0 +1,26 @@
+import contextlib
+import io
+import threading
+import pytest
+from pipeline import run_course_pipelined
+from simulated_rover import SimulatedRover, World, rock_field
+from errors import SimulationTimeoutError
+
+@pytest.mark.parametrize("planner", ["astar", "dstar_lite"])
+def test_reaches_the_end_without_touching_anything(planner):
+    world = rock_field(size=10.0, density=0.05, seed=4)
+    rover = SimulatedRover(world, time_limit=600)
+    threads = threading.active_count()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_course_pipelined(rover, world.end, planner=planner, realtime=False)
+    assert ((rover.x - world.end[0]) ** 2 + (rover.y - world.end[1]) ** 2) ** 0.5 < 1.0
+    assert rover.min_clearance > 0
+    # The mapping and planning stages are stopped once the rover arrives
+    assert threading.active_count() == threads
+
+def test_stages_are_stopped_when_the_rover_fails():
+    rover = SimulatedRover(World([], [], (0.0, 0.0), (30.0, 0.0)), time_limit=1.0)
+    threads = threading.active_count()
+    with pytest.raises(SimulationTimeoutError):
+        run_course_pipelined(rover, (30.0, 0.0), realtime=False)
+    assert threading.active_count() == threads
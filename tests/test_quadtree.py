@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from grid import Grid
+from quadtree import QuadtreeMap
+from errors import NoValidPathError
+from planner_checks import random_free_node, steps_between
+
+def square_grid(generator, size, density):
+    """A grid exactly as large as the quadtree built from it, so that neither can route around the edge of the other"""
+    grid = Grid((0, 0), (size, size), node_spacing=1.0)
+    grid.obstacle_layer[:] = generator.rand(grid.height, grid.width) < density
+    return grid
+
+def assert_route_avoids(grid, start_point, waypoints):
+    """Checks that no straight leg of a route passes through the inside of a blocked node"""
+    blocked = grid.blocked_layer()
+    previous = np.array(start_point, dtype=float)
+    for point in waypoints:
+        point = np.array(point, dtype=float)
+        for fraction in np.linspace(0.0, 1.0, 200):
+            x, y = previous + fraction * (point - previous)
+            row, column = (y - grid.start[1]) / grid.node_spacing, (x - grid.start[0]) / grid.node_spacing
+            nearest = int(np.rint(row)), int(np.rint(column))
+            # Touching the corner or edge of a blocked node is allowed, as the line of sight checks are
+            inside = abs(row - nearest[0]) < 0.5 - 1e-6 and abs(column - nearest[1]) < 0.5 - 1e-6
+            assert not (inside and blocked[nearest])
+        previous = point
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_finds_a_valid_route_whenever_one_exists(include_diagonals):
+    generator = np.random.RandomState(24)
+    for _ in range(60):
+        grid = square_grid(generator, generator.choice([8, 16, 32]), generator.choice([0.05, 0.2, 0.35]))
+        start, goal = random_free_node(generator, grid), random_free_node(generator, grid)
+        quadtree = QuadtreeMap.from_grid(grid)
+        assert quadtree.size == grid.width == grid.height
+        start_point, end_point = grid.location(*start), grid.location(*goal)
+        if steps_between(grid, start, goal, include_diagonals) is None:
+            with pytest.raises(NoValidPathError):
+                quadtree.quickest_path(start_point, end_point, include_diagonals)
+        else:
+            waypoints = quadtree.quickest_path(start_point, end_point, include_diagonals)
+            assert tuple(waypoints[-1]) == tuple(end_point)
+            assert_route_avoids(grid, start_point, waypoints)
+
+def test_open_ground_is_kept_as_large_leaves():
+    grid = Grid((0, 0), (64, 64), node_spacing=1.0)
+    grid.obstacle_layer[10, 10] = True
+    grid.padding_layer[9:12, 9:12] = True
+    quadtree = QuadtreeMap.from_grid(grid)
+    assert quadtree.leaves < 64
+    stats = {}
+    waypoints = quadtree.quickest_path(grid.location(0, 0), grid.location(63, 63), stats=stats)
+    assert_route_avoids(grid, grid.location(0, 0), waypoints)
+    assert stats["expansions"] < 30
+
+def test_clearing_obstacles_merges_the_map_back_into_one_leaf():
+    quadtree = QuadtreeMap((0, 0), (15, 15))
+    quadtree.mark(np.array([3, 4]), np.array([5, 5]))
+    assert quadtree.is_blocked(quadtree.leaf_at(3, 5)) and not quadtree.is_blocked(quadtree.leaf_at(0, 0))
+    quadtree.clear_obstacles()
+    assert quadtree.leaves == 1
@@ -0,0 +1,51 @@
+import numpy as np
+from grid import Grid
+from locate_obstacles import ScanFilter, locate_obstacles_array
+
+class StillRover:
+    def __init__(self, x, y, heading, laser_distances):
+        self.x, self.y, self.heading = x, y, heading
+        self.laser_distances = laser_distances
+
+def test_only_cells_not_yet_marked_are_reported_once_each():
+    grid = Grid((-10, -10), (10, 10), node_spacing=1.0)
+    # Neighbouring rays at the same range land on the same cell close to the rover
+    rover = StillRover(0.0, 0.0, 0.0, [1.0] * 15)
+    scans = ScanFilter(grid)
+    rows, columns = scans.new_cells(rover)
+    cells = list(zip(rows.tolist(), columns.tolist()))
+    assert len(cells) == len(set(cells)) < 14
+    expected_rows, expected_columns = grid.nearest_indices(locate_obstacles_array(rover))
+    assert set(cells) == set(zip(expected_rows.tolist(), expected_columns.tolist()))
+
+    grid.obstacle_layer[rows[:2], columns[:2]] = True
+    rows, columns = scans.new_cells(rover)
+    assert set(zip(rows.tolist(), columns.tolist())) == set(cells[2:])
+
+def test_repeated_sweeps_are_skipped_until_something_changes():
+    grid = Grid((-10, -10), (10, 10), node_spacing=1.0)
+    rover = StillRover(0.0, 0.0, 0.0, [3.0] * 15)
+    scans = ScanFilter(grid)
+    rows, columns = scans.new_cells(rover)
+    grid.obstacle_layer[rows, columns] = True
+    # The first sweep to add nothing is remembered, and the ones that match it afterwards are skipped
+    assert len(scans.new_cells(rover)[0]) == 0
+    rover.x += 0.01
+    rover.laser_distances = [3.01] * 15
+    assert len(scans.new_cells(rover)[0]) == 0
+    assert (scans.sweeps, scans.skipped_sweeps) == (3, 1)
+
+    rover.laser_distances = [3.0] * 14 + [5.0]
+    assert len(scans.new_cells(rover)[0]) == 1
+    assert scans.skipped_sweeps == 1
+
+def test_forgetting_lets_cleared_obstacles_be_found_again():
+    grid = Grid((-10, -10), (10, 10), node_spacing=1.0)
+    rover = StillRover(0.0, 0.0, 0.0, [3.0] * 15)
+    scans = ScanFilter(grid)
+    rows, columns = scans.new_cells(rover)
+    grid.obstacle_layer[rows, columns] = True
+    scans.new_cells(rover)
+    grid.clear_obstacles()
+    scans.forget()
+    assert np.array_equal(scans.new_cells(rover)[0], rows)
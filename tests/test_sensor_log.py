@@ -0,0 +1,84 @@
+import contextlib
+import io
+import itertools
+import numpy as np
+import pytest
+from run_course import run_course
+from simulated_rover import SimulatedRover, World, rock_field
+from sensor_log import SensorRecorder, ReplayRover, read_frames
+from errors import ReplayFinishedError
+
+class CommandLog:
+    """Wraps a rover, keeping every command it is sent"""
+
+    def __init__(self, rover):
+        self.rover = rover
+        self.commands = []
+
+    def __getattr__(self, name):
+        return getattr(self.rover, name)
+
+    def send_command(self, linear_speed, angular_speed):
+        self.commands.append((linear_speed, angular_speed))
+        self.rover.send_command(linear_speed, angular_speed)
+
+def test_frames_survive_a_round_trip(tmp_path):
+    path = str(tmp_path / "run.log")
+    rover = SimulatedRover(World([[2.0, 0.5, 0.3]], [], (0.0, 0.0), (5.0, 0.0)))
+    clock = itertools.count(0.0, 0.05)
+    poses = []
+    with SensorRecorder(rover, path, chunk_size=4, clock=lambda: next(clock)) as recorder:
+        for step in range(10):
+            poses.append((rover.x, rover.y, rover.heading, list(rover.laser_distances)))
+            recorder.send_command(0.5, 0.1 * step)
+
+    frames = read_frames(path)
+    assert len(frames) == recorder.frames == 10
+    assert np.allclose(frames["timestamp"], 0.05 * np.arange(1, 11))
+    assert np.allclose(frames["angular_speed"], 0.1 * np.arange(10))
+    for frame, (x, y, heading, distances) in zip(frames, poses):
+        assert (frame["x"], frame["y"], frame["heading"]) == (x, y, heading)
+        assert np.allclose(frame["laser_distances"], distances)
+
+def test_a_log_cut_short_keeps_its_whole_chunks(tmp_path):
+    path = str(tmp_path / "run.log")
+    rover = SimulatedRover(World([], [], (0.0, 0.0), (5.0, 0.0)))
+    with SensorRecorder(rover, path, chunk_size=4) as recorder:
+        for _ in range(10):
+            recorder.send_command(0.5, 0.0)
+    with open(path, "rb") as log:
+        data = log.read()
+    with open(path, "wb") as log:
+        log.write(data[:-10])
+    assert len(read_frames(path)) == 8
+
+def test_replay_follows_the_recording_and_then_stops(tmp_path):
+    path = str(tmp_path / "run.log")
+    rover = SimulatedRover(World([], [], (0.0, 0.0), (5.0, 0.0)))
+    with SensorRecorder(rover, path) as recorder:
+        for _ in range(3):
+            recorder.send_command(1.0, 0.0)
+    replay = ReplayRover(path)
+    frames = read_frames(path)
+    for frame in frames:
+        assert (replay.x, replay.y, replay.heading) == (frame["x"], frame["y"], frame["heading"])
+        replay.send_command(0.0, 0.0)
+    with pytest.raises(ReplayFinishedError):
+        replay.send_command(0.0, 0.0)
+
+def test_a_replayed_run_sends_the_commands_recorded(tmp_path):
+    path = str(tmp_path / "run.log")
+    world = rock_field(size=8.0, density=0.05, seed=3)
+    rover = SimulatedRover(world, time_limit=200)
+    options = dict(realtime=False, backup_routes=0, planner="bidirectional")
+    with contextlib.redirect_stdout(io.StringIO()):
+        with SensorRecorder(rover, path) as recorder:
+            run_course(recorder, world.end, **options)
+        replay = CommandLog(ReplayRover(path))
+        run_course(replay, world.end, **options)
+
+    frames = read_frames(path)
+    assert len(frames) > 10
+    # Given the input seen at the time, the navigation code makes the same decisions, up to the precision commands are logged at
+    assert len(replay.commands) == len(frames)
+    assert np.allclose(np.array(replay.commands, dtype=np.float32), np.column_stack((frames["linear_speed"], frames["angular_speed"])), rtol=1e-5, atol=1e-6)
@@ -0,0 +1,43 @@
+import contextlib
+import io
+from math import pi
+import pytest
+from run_course import run_course
+from simulated_rover import SimulatedRover, World, WORLDS
+from benchmark import benchmark_scenarios
+from errors import SimulationTimeoutError
+
+def test_lidar_measures_the_distance_to_the_nearest_surface():
+    world = World([[5.0, 0.0, 1.0]], [[3.0, -10.0, 3.0, -1.0]], (0.0, 0.0), (10.0, 0.0))
+    rover = SimulatedRover(world, num_lasers=3, sweep_angle=pi / 2, max_range=8.0)
+    right, ahead, left = rover.laser_distances
+    assert ahead == pytest.approx(4.0)
+    # The wall crosses the right-hand ray, at 45 degrees, three meters along x
+    assert right == pytest.approx(3.0 * 2 ** 0.5)
+    assert left == float("inf")
+    # The end of the wall is nearer than the rock
+    assert rover.min_clearance == pytest.approx(10 ** 0.5)
+
+def test_commands_move_the_rover_as_a_unicycle():
+    rover = SimulatedRover(World([], [], (1.0, 2.0), (5.0, 2.0)), time_step=0.1, time_limit=0.95)
+    for _ in range(10):
+        rover.send_command(1.0, 0.0)
+    assert (rover.x, rover.y) == (pytest.approx(2.0), pytest.approx(2.0))
+    assert rover.time == pytest.approx(1.0) and rover.commands == 10
+    with pytest.raises(SimulationTimeoutError):
+        rover.send_command(1.0, 0.0)
+
+@pytest.mark.parametrize("world_name", sorted(WORLDS))
+def test_run_course_crosses_every_kind_of_world_without_touching_anything(world_name):
+    world = WORLDS[world_name](10.0, seed=1)
+    rover = SimulatedRover(world, time_limit=600)
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_course(rover, world.end, realtime=False, backup_routes=0)
+    assert ((rover.x - world.end[0]) ** 2 + (rover.y - world.end[1]) ** 2) ** 0.5 < 1.0
+    assert rover.min_clearance > 0
+
+def test_benchmark_reports_every_run():
+    results = benchmark_scenarios(worlds=("rocks",), sizes=(8,), planners=["astar", "bidirectional"], time_limit=600)
+    assert sorted(results) == [("rocks", 8, "astar"), ("rocks", 8, "bidirectional")]
+    for result in results.values():
+        assert result["finished"] and result["replans"] >= 0 and result["peak_memory_kb"] > 0
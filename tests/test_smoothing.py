@@ -0,0 +1,57 @@
+import numpy as np
+from grid import Grid
+from pathfinding import quickest_path, smooth_path, stitch_colinear_nodes
+from planner_checks import random_grid, random_free_node, steps_between
+
+def assert_leg_avoids(grid, start, end):
+    """Checks that a straight line between two node centres never enters the inside of an obstacle or padded node other than the one it starts on"""
+    blocked = grid.blocked_layer()
+    start, end = np.array(start, dtype=float), np.array(end, dtype=float)
+    for fraction in np.linspace(0.0, 1.0, 400):
+        position = start + fraction * (end - start)
+        nearest = tuple(np.rint(position).astype(int))
+        inside = np.all(np.abs(position - nearest) < 0.5 - 1e-6)
+        assert not (inside and blocked[nearest] and nearest != tuple(start.astype(int)))
+
+def test_smoothed_paths_keep_to_free_ground():
+    generator = np.random.RandomState(9)
+    for _ in range(60):
+        grid = random_grid(generator, density=0.2)
+        grid.padding_layer[:] = generator.rand(grid.height, grid.width) < 0.05
+        start, goal = random_free_node(generator, grid), random_free_node(generator, grid)
+        grid.padding_layer[goal] = False
+        if start == goal or steps_between(grid, start, goal) is None:
+            continue
+        path = quickest_path(grid[start], grid[goal], grid, algorithm="bidirectional")
+        smoothed = smooth_path(grid[start], path)
+
+        assert smoothed[-1] == grid[goal]
+        assert len(smoothed) <= len(stitch_colinear_nodes(grid[start], path))
+        # Every waypoint is a node of the original path, so smoothing never leads the rover somewhere new
+        assert set(node.coords for node in smoothed) <= set(node.coords for node in path)
+        previous = start
+        for node in smoothed:
+            assert_leg_avoids(grid, previous, node.coords)
+            previous = node.coords
+
+def test_a_long_staircase_becomes_a_single_line():
+    grid = Grid((0, 0), (3000, 1600), node_spacing=1.0)
+    # Alternates straight and diagonal steps, which stitching alone cannot merge
+    path = []
+    row = 0
+    for column in range(1, 3000):
+        row += column % 2
+        path.append(grid[row, column])
+    assert len(stitch_colinear_nodes(grid[0, 0], path)) > 1000
+    assert smooth_path(grid[0, 0], path) == [path[-1]]
+
+def test_waypoints_are_kept_where_the_path_turns_around_an_obstacle():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    grid.obstacle_layer[2:8, 5] = True
+    path = quickest_path(grid[5, 0], grid[5, 9], grid, algorithm="bidirectional")
+    smoothed = smooth_path(grid[5, 0], path)
+    assert 1 < len(smoothed) <= 3
+    previous = (5, 0)
+    for node in smoothed:
+        assert_leg_avoids(grid, previous, node.coords)
+        previous = node.coords
@@ -0,0 +1,86 @@
+import collections
+import numpy as np
+import pytest
+from grid import Grid
+from pathfinding import neighbour_offsets
+from wavefront_planner import WavefrontPlanner, distance_fields, UNREACHABLE
+from errors import NoValidPathError
+from planner_checks import random_grid, random_free_node, assert_valid_path
+
+def breadth_first_steps(blocked, source, include_diagonals=True):
+    """The number of moves from `source` to every node, found one node at a time so that it does not share any code with the wavefront"""
+    steps = {source: 0}
+    queue = collections.deque([source])
+    while queue:
+        row, column = queue.popleft()
+        for row_offset, column_offset in neighbour_offsets(include_diagonals):
+            neighbour = (row + row_offset, column + column_offset)
+            if 0 <= neighbour[0] < blocked.shape[0] and 0 <= neighbour[1] < blocked.shape[1] and not blocked[neighbour] and neighbour not in steps:
+                steps[neighbour] = steps[(row, column)] + 1
+                queue.append(neighbour)
+    return steps
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_distance_fields_match_a_breadth_first_search(include_diagonals):
+    generator = np.random.RandomState(15)
+    for _ in range(20):
+        grid = random_grid(generator)
+        sources = [random_free_node(generator, grid) for _ in range(3)]
+        blocked = grid.blocked_layer()
+        fields = distance_fields(blocked, sources, include_diagonals)
+        for field, source in zip(fields, sources):
+            steps = breadth_first_steps(blocked, source, include_diagonals)
+            for row in range(grid.height):
+                for column in range(grid.width):
+                    assert field[row, column] == steps.get((row, column), UNREACHABLE)
+
+@pytest.mark.parametrize("include_diagonals", [True, False])
+def test_paths_stay_shortest_as_the_map_changes(include_diagonals):
+    generator = np.random.RandomState(16)
+    for _ in range(40):
+        grid = random_grid(generator)
+        goal = random_free_node(generator, grid)
+        planner = WavefrontPlanner(grid, grid[goal], include_diagonals=include_diagonals)
+        for _ in range(6):
+            start = random_free_node(generator, grid)
+            blocked = grid.blocked_layer()
+            steps = None if blocked[goal] else breadth_first_steps(blocked, goal, include_diagonals).get(start)
+            if steps is None:
+                with pytest.raises(NoValidPathError):
+                    planner.quickest_path(grid[start])
+            else:
+                assert planner.steps_to_goal(grid[start]) == steps
+                path = planner.quickest_path(grid[start])
+                assert assert_valid_path(grid, start, goal, path, include_diagonals) == steps
+            # The goal itself is toggled now and then too, so that it is blocked and cleared again
+            for _ in range(generator.randint(1, 6)):
+                row, column = (generator.randint(grid.height), generator.randint(grid.width)) if generator.rand() < 0.8 else goal
+                grid.obstacle_layer[row, column] = not grid.obstacle_layer[row, column]
+
+def test_next_node_leads_out_of_padding():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    grid.padding_layer[4:7, 4:7] = True
+    planner = WavefrontPlanner(grid, grid[0, 0])
+    assert planner.steps_to_goal(grid[4, 5]) == 5
+    node = planner.next_node(grid[4, 5])
+    assert not node.is_padding and planner.steps_to_goal(node) == 4
+    assert planner.next_node(grid[0, 0]) is None
+
+def test_a_goal_that_was_blocked_can_be_reached_once_it_is_cleared():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    planner = WavefrontPlanner(grid, grid[7, 7])
+    assert len(planner.quickest_path(grid[0, 0])) == 7
+    grid.padding_layer[7, 7] = True
+    with pytest.raises(NoValidPathError):
+        planner.quickest_path(grid[0, 0])
+    grid.clear_obstacles()
+    assert assert_valid_path(grid, (0, 0), (7, 7), planner.quickest_path(grid[0, 0])) == 7
+
+def test_a_goal_blocked_from_the_start_cannot_be_planned_into():
+    grid = Grid((0, 0), (10, 10), node_spacing=1.0)
+    grid.padding_layer[7, 7] = True
+    planner = WavefrontPlanner(grid, grid[7, 7])
+    with pytest.raises(NoValidPathError):
+        planner.quickest_path(grid[0, 0])
+    grid.padding_layer[7, 7] = False
+    assert len(planner.quickest_path(grid[0, 0])) == 7
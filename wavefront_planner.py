@@ -0,0 +1,249 @@
+import numpy as np
+from errors import NoValidPathError
+from pathfinding import neighbour_offsets, path_from_indices
+
+# Stands in for the distance of nodes that cannot reach the goal. It is far below the int32 limit, so adding a step to it never overflows
+UNREACHABLE = np.iinfo(np.int32).max // 2
+
+def distance_fields(blocked, sources, include_diagonals=True, targets=None):
+    """Grows a wavefront from each of several nodes at once, all of them advancing together by one step per array operation
+
+    Parameters
+    ----------
+    blocked : nparray
+        a (height, width) boolean array marking the nodes the rover may not pass through, such as the one returned by `Grid.blocked_layer`
+    sources : list of (int, int)
+        the row and column of each node a wavefront is grown from
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    targets : list of (int, int)
+        if given, the wavefronts stop growing as soon as all of them have reached every one of these nodes, and the distances of nodes further away are left as `UNREACHABLE`
+
+    Returns
+    -------
+    A (len(sources), height, width) int32 array holding the number of steps from each source to every node, or `UNREACHABLE` for the nodes it cannot reach. Sources are given a distance of 0 even when they are blocked, so that one inside padding can still be left
+    """
+    height, width = blocked.shape
+    fields = np.full((len(sources), height, width), UNREACHABLE, dtype=np.int32)
+    frontier = np.zeros(fields.shape, dtype=bool)
+    for layer, (row, column) in enumerate(sources):
+        frontier[layer, row, column] = True
+    fields[frontier] = 0
+    reached = frontier.copy()
+    free = ~blocked
+    if targets is not None:
+        target_rows, target_columns = (np.array(indices, dtype=np.intp) for indices in zip(*targets))
+
+    steps = 0
+    while frontier.any():
+        if targets is not None and reached[:, target_rows, target_columns].all():
+            break
+        steps += 1
+        grown = np.zeros(fields.shape, dtype=bool)
+        for row_offset, column_offset in neighbour_offsets(include_diagonals):
+            grown[:, max(row_offset, 0):height + min(row_offset, 0), max(column_offset, 0):width + min(column_offset, 0)] |= \
+                frontier[:, max(-row_offset, 0):height - max(row_offset, 0), max(-column_offset, 0):width - max(column_offset, 0)]
+        frontier = grown & free & ~reached
+        fields[frontier] = steps
+        reached |= frontier
+
+    return fields
+
+class WavefrontPlanner:
+    """A planner that keeps the distance from every node of the grid to a fixed goal, so that a route from anywhere is read off rather than searched for
+
+    The distance field is grown outwards from the goal by a wavefront that advances every node at once with array operations. Afterwards, the next step from any node is simply the neighbour closest to the goal, so a rover pushed off its route can recover without a new search.
+
+    On every query the grid's obstacle and padding layers are compared against the ones the field was computed on. Nodes that have become blocked first invalidate every node whose distance depended on them, and the field is then relaxed from what remains until it settles again. Only the region behind new obstacles is recomputed, and nodes that have been cleared simply let shorter distances flow through them.
+
+    Attributes
+    ----------
+    grid : Grid
+        the grid on which paths are planned
+    goal : GridNode
+        the node every path leads to
+    include_diagonals : bool
+        whether or not the rover should be able to move diagonally between nodes
+    expansions : int
+        the number of times a node's distance has been assigned over the lifetime of the planner
+    peak_open_set : int
+        the largest number of nodes the wavefront has advanced in a single step over the lifetime of the planner
+
+    Methods
+    -------
+    quickest_path(start_node, verbose=False)
+        Finds the shortest path from a node to the goal by descending the distance field
+    next_node(node)
+        Finds the node one step closer to the goal than a node
+    steps_to_goal(node)
+        Reads the number of steps from a node to the goal
+    """
+
+    def __init__(self, grid, goal, include_diagonals=True):
+        """Initializes a new WavefrontPlanner instance and grows the distance field from the goal.
+
+        Parameters
+        ----------
+        grid : Grid
+            the grid on which paths are planned
+        goal : GridNode
+            the node every path leads to
+        include_diagonals : bool
+            whether or not the rover should be able to move diagonally between nodes
+        """
+        self.grid = grid
+        self.goal = goal
+        self.include_diagonals = include_diagonals
+        self.expansions = 0
+        self.peak_open_set = 0
+
+        self._offsets = neighbour_offsets(include_diagonals)
+        self._goal_coords = goal.coords
+        self._blocked = grid.blocked_layer()
+        # Distances are counted in steps, as every move between neighbouring nodes costs the same
+        self._field = np.full(self._blocked.shape, UNREACHABLE, dtype=np.int32)
+        self._seed_goal()
+        self._relax()
+
+    def _seed_goal(self):
+        """Starts the wavefront from the goal, which can only be reached while it is free"""
+        self._field[self._goal_coords] = UNREACHABLE if self._blocked[self._goal_coords] else 0
+
+    def _neighbour_minimum(self):
+        """Finds the smallest distance among the neighbours of every node"""
+        height, width = self._field.shape
+        padded = np.pad(self._field, 1, mode="constant", constant_values=UNREACHABLE)
+        minimum = np.full(self._field.shape, UNREACHABLE, dtype=np.int32)
+        for row_offset, column_offset in self._offsets:
+            np.minimum(minimum, padded[1 + row_offset:1 + row_offset + height, 1 + column_offset:1 + column_offset + width], out=minimum)
+        return minimum
+
+    def _relax(self):
+        """Advances the wavefront until no node can be given a shorter distance through one of its neighbours"""
+        free = ~self._blocked
+        while True:
+            candidates = self._neighbour_minimum() + 1
+            improved = free & (candidates < self._field)
+            count = int(np.count_nonzero(improved))
+            if count == 0:
+                return
+            self._field[improved] = candidates[improved]
+            self.expansions += count
+            self.peak_open_set = max(self.peak_open_set, count)
+
+    def _invalidate(self, newly_blocked):
+        """Forgets the distances of newly blocked nodes and of every node that can no longer reach the goal in the number of steps it had"""
+        field = self._field
+        field[newly_blocked] = UNREACHABLE
+        goal = np.zeros(field.shape, dtype=bool)
+        goal[self._goal_coords] = True
+        while True:
+            # A node's distance still holds as long as one of its neighbours is a step closer to the goal
+            unsupported = (field < UNREACHABLE) & ~goal & (self._neighbour_minimum() + 1 > field)
+            if not unsupported.any():
+                return
+            field[unsupported] = UNREACHABLE
+
+    def _apply_grid_changes(self):
+        """Brings the distance field up to date with the cells that have changed since the last query"""
+        blocked = self.grid.blocked_layer()
+        changed = blocked != self._blocked
+        if not changed.any():
+            return
+        self._blocked = blocked
+        newly_blocked = changed & blocked
+        if newly_blocked.any():
+            self._invalidate(newly_blocked)
+        # A goal that was blocked and has been cleared again restarts the wavefront
+        self._seed_goal()
+        self._relax()
+
+    def steps_to_goal(self, node):
+        """Reads the number of steps from a node to the goal
+
+        A blocked node is given the distance it would have if it were free, so that a rover that finds itself inside padding can still leave it.
+
+        Parameters
+        ----------
+        node : GridNode
+            the node whose distance is read
+
+        Returns
+        -------
+        int
+            the number of steps, or None if the goal cannot be reached from the node
+        """
+        self._apply_grid_changes()
+        row, column = node.coords
+        steps = int(self._field[row, column])
+        if self._blocked[row, column] and (row, column) != self._goal_coords:
+            neighbour = self._best_neighbour(row, column)
+            steps = UNREACHABLE if neighbour is None else int(self._field[neighbour]) + 1
+        return steps if steps < UNREACHABLE else None
+
+    def _best_neighbour(self, row, column):
+        """Finds the free neighbour of a node that is closest to the goal, or None if none of them can reach it"""
+        height, width = self._field.shape
+        best = None
+        best_steps = UNREACHABLE
+        for row_offset, column_offset in self._offsets:
+            neighbour_row = row + row_offset
+            neighbour_column = column + column_offset
+            if 0 <= neighbour_row < height and 0 <= neighbour_column < width and self._field[neighbour_row, neighbour_column] < best_steps:
+                best = (neighbour_row, neighbour_column)
+                best_steps = self._field[best]
+        return best
+
+    def next_node(self, node):
+        """Finds the node one step closer to the goal than a node
+
+        Parameters
+        ----------
+        node : GridNode
+            the node from which the step is taken
+
+        Returns
+        -------
+        GridNode
+            the neighbour of `node` that is closest to the goal, or None if `node` is the goal or the goal cannot be reached from it
+        """
+        if self.steps_to_goal(node) in (None, 0):
+            return None
+        return self.grid[self._best_neighbour(*node.coords)]
+
+    def quickest_path(self, start_node, verbose=False):
+        """Finds the shortest path from a node to the goal by descending the distance field
+
+        Parameters
+        ----------
+        start_node : GridNode
+            the node from which the rover begins
+        verbose : bool
+            whether or not to log when a path is found
+
+        Returns
+        -------
+        list
+            A list of nodes that forms the optimal path, excluding `start_node`
+
+        Raises
+        ------
+        NoValidPathError
+            If no viable path is found
+        """
+        steps = self.steps_to_goal(start_node)
+        if steps is None:
+            print("Viable path was not found\n" + repr(self.grid))
+            raise NoValidPathError
+
+        if verbose:
+            print("Found a valid path")
+
+        width = self.grid.width
+        row, column = start_node.coords
+        indices = [row * width + column]
+        for _ in range(steps):
+            row, column = self._best_neighbour(row, column)
+            indices.append(row * width + column)
+
+        return path_from_indices(self.grid, indices)